@@ -0,0 +1,113 @@
+"""
+Created on 2026-10-18
+
+@author: wf
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from lodstorage.query import Endpoint
+
+
+class SparqlTestServer:
+    """
+    local keep-alive HTTP server mimicking a SPARQL endpoint for offline tests
+    """
+
+    def __init__(self, responder: Optional[Callable] = None):
+        """
+        constructor
+
+        Args:
+            responder (Callable): function(query, headers) returning
+            a (status, headers, body) tuple - default: SparqlTestServer.json_response
+        """
+        self.responder = responder or self.json_response
+        self.queries: List[str] = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                params = parse_qs(urlparse(self.path).query)
+                self.respond(params.get("query", [""])[0])
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length).decode("utf-8")
+                self.respond(parse_qs(body).get("query", [""])[0])
+
+            def respond(self, query: str):
+                server.queries.append(query)
+                status, headers, body = server.responder(query, dict(self.headers))
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/sparql"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self) -> "SparqlTestServer":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *_args):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def endpoint(self, name: str = "test", database: str = "blazegraph") -> Endpoint:
+        """
+        get an endpoint configuration pointing to me
+        """
+        endpoint = Endpoint(
+            name=name, endpoint=self.url, database=database, method="POST"
+        )
+        return endpoint
+
+    @staticmethod
+    def sparql_json(lod: List[Dict[str, Tuple[str, Optional[str]]]]) -> bytes:
+        """
+        encode rows of (value, datatype) tuples as SPARQL JSON result
+        """
+        variables = []
+        bindings = []
+        for row in lod:
+            binding = {}
+            for var, (value, datatype) in row.items():
+                if var not in variables:
+                    variables.append(var)
+                binding[var] = {"type": "literal", "value": value}
+                if datatype:
+                    binding[var]["datatype"] = datatype
+            bindings.append(binding)
+        result = {"head": {"vars": variables}, "results": {"bindings": bindings}}
+        return json.dumps(result).encode("utf-8")
+
+    @classmethod
+    def json_response(cls, _query: str, _headers: dict):
+        """
+        default responder with a single typed row
+        """
+        xsd = "http://www.w3.org/2001/XMLSchema#"
+        lod = [
+            {
+                "label": ("Gare de Biarritz", None),
+                "count": ("42", f"{xsd}integer"),
+                "lat": ("43.4592", f"{xsd}double"),
+            }
+        ]
+        body = cls.sparql_json(lod)
+        return 200, {"Content-Type": "application/sparql-results+json"}, body
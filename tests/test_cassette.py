@@ -0,0 +1,169 @@
+"""
+Created on 2026-10-18
+
+@author: wf
+"""
+
+import asyncio
+import datetime
+import os
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
+
+import pandas as pd
+from ngwidgets.basetest import Basetest
+
+from tests.sparql_test_server import SparqlTestServer
+from velorail.cassette import Cassette
+from velorail.npq import NPQ_Handler
+from velorail.query_cache import QueryCache
+
+
+class TestCassette(Basetest):
+    """
+    test record/replay of query results
+    """
+
+    def setUp(self, debug=False, profile=True):
+        Basetest.setUp(self, debug=debug, profile=profile)
+        self.saved_cassette = NPQ_Handler.cassette, NPQ_Handler.cassette_from_env
+        self.saved_cache = NPQ_Handler.query_cache
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        NPQ_Handler.cassette, NPQ_Handler.cassette_from_env = self.saved_cassette
+        NPQ_Handler.query_cache = self.saved_cache
+        self.tmpdir.cleanup()
+        Basetest.tearDown(self)
+
+    def test_record_replay(self):
+        """
+        test recording results live and replaying them offline
+        """
+        with SparqlTestServer() as server:
+            endpoint = server.endpoint()
+            handler = NPQ_Handler("locations.yaml")
+            handler.endpoints["test"] = endpoint
+            NPQ_Handler.cassette = Cassette(self.tmpdir.name, mode="record")
+            for qid in ["Q1", "Q2"]:
+                handler.query_by_name(
+                    "WikidataGeo", param_dict={"qid": qid}, endpoint="test"
+                )
+            self.assertEqual(2, NPQ_Handler.cassette.recorded)
+        # the server is gone now
+        NPQ_Handler.cassette = Cassette(self.tmpdir.name, latency=0.1)
+        handler = NPQ_Handler("locations.yaml")
+        handler.endpoints["test"] = endpoint
+        start_time = time.monotonic()
+        lod = handler.query_by_name(
+            "WikidataGeo", param_dict={"qid": "Q1"}, endpoint="test"
+        )
+        self.assertGreaterEqual(time.monotonic() - start_time, 0.1)
+        self.assertEqual(42, lod[0]["count"])
+        rows = list(
+            handler.iter_query_by_name(
+                "WikidataGeo", param_dict={"qid": "Q2"}, endpoint="test"
+            )
+        )
+        self.assertEqual(lod, rows)
+        lod = asyncio.run(
+            handler.aquery_by_name(
+                "WikidataGeo", param_dict={"qid": "Q2"}, endpoint="test"
+            )
+        )
+        self.assertEqual("Gare de Biarritz", lod[0]["label"])
+        with self.assertRaises(ValueError):
+            handler.query_by_name(
+                "WikidataGeo", param_dict={"qid": "Q3"}, endpoint="test"
+            )
+
+    def test_format(self):
+        """
+        test typed values and the format version check
+        """
+        cassette = Cassette(self.tmpdir.name, mode="record")
+        day = datetime.date(2025, 2, 6)
+        cassette.record("test", "SELECT ?day", [{"day": day}], 10, 0.5)
+        lod, size = Cassette(self.tmpdir.name).play("test", "SELECT ?day")
+        self.assertEqual([{"day": day}], lod)
+        self.assertEqual(10, size)
+        with open(cassette.meta_path, "w") as meta_file:
+            meta_file.write('{"format": 0}')
+        with self.assertRaises(ValueError):
+            Cassette(self.tmpdir.name)
+        with self.assertRaises(ValueError):
+            Cassette(self.tmpdir.name, mode="rewind")
+
+    def test_record_df(self):
+        """
+        test that replayed DataFrames have the dtypes of live ones
+        """
+
+        def response(_query, _headers):
+            xsd = "http://www.w3.org/2001/XMLSchema#"
+            lod = [
+                {
+                    "label": (f"S{i}", None),
+                    "count": (str(i), f"{xsd}integer"),
+                    "lat": (f"43.{i}", f"{xsd}double"),
+                    "day": (f"2025-02-0{i + 1}T10:00:00Z", f"{xsd}dateTime"),
+                }
+                for i in range(3)
+            ]
+            body = SparqlTestServer.sparql_json(lod)
+            return 200, {"Content-Type": "application/sparql-results+json"}, body
+
+        query = "SELECT ?label ?count ?lat ?day WHERE {}"
+        with SparqlTestServer(response) as server:
+            handler = NPQ_Handler("locations.yaml")
+            handler.endpoints["test"] = server.endpoint()
+            NPQ_Handler.cassette = Cassette(self.tmpdir.name, mode="record")
+            live_df = handler.query_df(query, endpoint="test")
+            self.assertEqual(1, NPQ_Handler.cassette.recorded)
+        NPQ_Handler.cassette = Cassette(self.tmpdir.name)
+        df = handler.query_df(query, endpoint="test")
+        self.assertEqual("float64", str(df["lat"].dtype))
+        pd.testing.assert_frame_equal(live_df, df)
+
+    def test_record_cached(self):
+        """
+        test that results in the query cache are recorded and replayed
+        """
+        with tempfile.TemporaryDirectory() as cache_dir:
+            NPQ_Handler.query_cache = QueryCache(Path(cache_dir) / "cache.db")
+            with SparqlTestServer() as server:
+                handler = NPQ_Handler("locations.yaml")
+                handler.endpoints["test"] = server.endpoint()
+                handler.query_by_name(
+                    "WikidataGeo", param_dict={"qid": "Q1"}, endpoint="test"
+                )
+                NPQ_Handler.cassette = Cassette(self.tmpdir.name, mode="record")
+                handler.query_by_name(
+                    "WikidataGeo", param_dict={"qid": "Q1"}, endpoint="test"
+                )
+                self.assertEqual(1, NPQ_Handler.cassette.recorded)
+                self.assertEqual(2, len(server.queries))
+            NPQ_Handler.cassette = Cassette(self.tmpdir.name)
+            lod = handler.query_by_name(
+                "WikidataGeo", param_dict={"qid": "Q1"}, endpoint="test"
+            )
+            self.assertEqual(42, lod[0]["count"])
+            self.assertEqual(1, NPQ_Handler.cassette.replayed)
+
+    def test_from_env(self):
+        """
+        test that the cassette of the environment is looked up at first use
+        """
+        NPQ_Handler.cassette, NPQ_Handler.cassette_from_env = None, False
+        missing = os.path.join(self.tmpdir.name, "missing")
+        with mock.patch.dict(os.environ, {"VELORAIL_CASSETTE": missing}):
+            with self.assertRaises(ValueError):
+                NPQ_Handler.get_cassette()
+        NPQ_Handler.cassette_from_env = False
+        env = {"VELORAIL_CASSETTE": self.tmpdir.name, "VELORAIL_CASSETTE_MODE": "record"}
+        with mock.patch.dict(os.environ, env):
+            cassette = NPQ_Handler.get_cassette()
+        self.assertTrue(cassette.recording)
+        self.assertIs(cassette, NPQ_Handler.get_cassette())
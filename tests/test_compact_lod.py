@@ -0,0 +1,115 @@
+"""
+Created on 2026-10-18
+
+@author: wf
+"""
+
+import datetime
+import tracemalloc
+
+from ngwidgets.basetest import Basetest
+
+from tests.sparql_test_server import SparqlTestServer
+from velorail.compact_lod import CompactLod
+from velorail.npq import NPQ_Handler
+from velorail.prefix_index import PrefixIndex
+
+
+class TestCompactLod(Basetest):
+    """
+    test the compact result container
+    """
+
+    def setUp(self, debug=False, profile=True):
+        Basetest.setUp(self, debug=debug, profile=profile)
+        self.prefix_index = PrefixIndex(
+            {
+                "wd": "http://www.wikidata.org/entity/",
+                "wdt": "http://www.wikidata.org/prop/direct/",
+            }
+        )
+
+    def get_osm_lod(self, rows: int) -> list:
+        """
+        get an OSM like exploration result with the given number of rows
+        """
+        osm = "https://www.openstreetmap.org"
+        keys = ["name", "highway"]
+        lod = [
+            {
+                "node": f"{osm}/node/{1000000000 + i}",
+                "p": f"{osm}/wiki/Key:{keys[i % 2]}",
+                "o": f"value {i % 10}",
+            }
+            for i in range(rows)
+        ]
+        return lod
+
+    def test_list_behavior(self):
+        """
+        test that a CompactLod behaves like the list of dicts it was built from
+        """
+        lod = [
+            {
+                "item": "http://www.wikidata.org/entity/Q80",
+                "p": "http://www.wikidata.org/prop/direct/P31",
+                "count": 42,
+            },
+            {"item": "https://example.org/x#y", "day": datetime.date(2025, 2, 6)},
+            {"label": "http is not a URI"},
+        ]
+        compact_lod = CompactLod.from_lod(lod, self.prefix_index)
+        self.assertEqual(lod, compact_lod)
+        self.assertEqual(lod, list(compact_lod))
+        self.assertEqual(3, len(compact_lod))
+        self.assertEqual(lod[-1], compact_lod[-1])
+        self.assertEqual(lod[1:], compact_lod[1:])
+        self.assertEqual(
+            ["http://www.wikidata.org/entity/", "http://www.wikidata.org/prop/direct/"],
+            compact_lod.namespaces[:2],
+        )
+        self.assertEqual("https://example.org/x#", compact_lod.namespaces[2])
+        with self.assertRaises(IndexError):
+            compact_lod[3]
+        # pages keep their namespaces when joined
+        pages = {0: CompactLod.from_lod(lod[:2]), 1: CompactLod.from_lod(lod[2:])}
+        joined = CompactLod.join(pages, None)
+        self.assertEqual(lod, joined)
+        self.assertEqual(lod[:2], CompactLod.join(pages, 0))
+
+    def test_memory(self):
+        """
+        test the memory footprint compared to the list of dicts
+        """
+        rows = 20000
+        tracemalloc.start()
+        try:
+            base_size, _peak = tracemalloc.get_traced_memory()
+            lod = self.get_osm_lod(rows)
+            lod_size = tracemalloc.get_traced_memory()[0] - base_size
+            compact_lod = CompactLod.from_lod(lod)
+            del lod
+            compact_size = tracemalloc.get_traced_memory()[0] - base_size
+        finally:
+            tracemalloc.stop()
+        if self.debug:
+            print(f"list of dicts: {lod_size} bytes compact: {compact_size} bytes")
+        self.assertEqual(rows, len(compact_lod))
+        self.assertLess(compact_size, lod_size / 3)
+
+    def test_compact_results(self):
+        """
+        test compact query results of the NPQ_Handler
+        """
+        saved = NPQ_Handler.compact_results
+        try:
+            NPQ_Handler.compact_results = True
+            with SparqlTestServer() as server:
+                handler = NPQ_Handler("locations.yaml")
+                handler.endpoints["test"] = server.endpoint()
+                lod = handler.query("SELECT ?label WHERE {}", endpoint="test")
+                self.assertIsInstance(lod, CompactLod)
+                self.assertEqual(42, lod[0]["count"])
+                self.assertEqual("Gare de Biarritz", lod[0]["label"])
+        finally:
+            NPQ_Handler.compact_results = saved
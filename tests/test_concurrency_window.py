@@ -0,0 +1,140 @@
+"""
+Created on 2026-10-18
+
+@author: wf
+"""
+
+import asyncio
+import threading
+import time
+
+from ngwidgets.basetest import Basetest
+
+from tests.sparql_test_server import SparqlTestServer
+from velorail.concurrency_window import ConcurrencyWindow
+from velorail.sparql_client import SparqlClientPool, SparqlHttpError
+
+
+class TestConcurrencyWindow(Basetest):
+    """
+    test the adaptive per endpoint concurrency window
+    """
+
+    def setUp(self, debug=False, profile=True):
+        Basetest.setUp(self, debug=debug, profile=profile)
+
+    def test_aimd(self):
+        """
+        test additive increase and multiplicative decrease
+        """
+        window = ConcurrencyWindow(max_window=8, initial_window=2)
+        for _i in range(20):
+            window.acquire()
+            window.release(ConcurrencyWindow.SUCCESS)
+        stats = window.stats()
+        self.assertEqual(6, stats["limit"])
+        window.acquire()
+        window.release(ConcurrencyWindow.THROTTLE)
+        self.assertEqual(3, window.stats()["limit"])
+        # a burst of failures of the same window decreases only once
+        window.acquire()
+        window.release(ConcurrencyWindow.TIMEOUT)
+        self.assertEqual(3, window.stats()["limit"])
+        window.acquire()
+        window.release(ConcurrencyWindow.ERROR)
+        stats = window.stats()
+        if self.debug:
+            print(stats)
+        self.assertEqual(20, stats["success"])
+        self.assertEqual(1, stats["error"])
+        self.assertEqual(0, stats["active"])
+
+    def test_retry_after(self):
+        """
+        test that Retry-After blocks new requests
+        """
+        self.assertEqual(2.0, ConcurrencyWindow.parse_retry_after("2"))
+        self.assertEqual(
+            0.0,
+            ConcurrencyWindow.parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"),
+        )
+        self.assertIsNone(ConcurrencyWindow.parse_retry_after("soon"))
+        window = ConcurrencyWindow(max_window=4, initial_window=4)
+        window.acquire()
+        window.release(ConcurrencyWindow.THROTTLE, retry_after=0.2)
+        self.assertEqual(2, window.stats()["limit"])
+        start_time = time.monotonic()
+        window.acquire()
+        self.assertGreaterEqual(time.monotonic() - start_time, 0.15)
+        window.release(ConcurrencyWindow.SUCCESS)
+
+    def test_fifo(self):
+        """
+        test that waiting threads and tasks get their slots in order
+        """
+        window = ConcurrencyWindow(max_window=1, initial_window=1)
+        order = []
+        window.acquire()
+
+        def worker(i: int):
+            window.acquire()
+            order.append(i)
+            window.release(ConcurrencyWindow.SUCCESS)
+
+        threads = []
+        for i in range(5):
+            thread = threading.Thread(target=worker, args=(i,))
+            thread.start()
+            threads.append(thread)
+            while window.stats()["waiting"] <= i:
+                time.sleep(0.001)
+        window.release(ConcurrencyWindow.SUCCESS)
+        for thread in threads:
+            thread.join()
+        self.assertEqual(list(range(5)), order)
+
+        async def run_tasks():
+            await window.aacquire()
+            tasks = []
+            for i in range(5, 10):
+                tasks.append(asyncio.create_task(worker_task(i)))
+                await asyncio.sleep(0)
+            window.release(ConcurrencyWindow.SUCCESS)
+            await asyncio.gather(*tasks)
+
+        async def worker_task(i: int):
+            await window.aacquire()
+            order.append(i)
+            await asyncio.sleep(0.001)
+            window.release(ConcurrencyWindow.SUCCESS)
+
+        asyncio.run(run_tasks())
+        self.assertEqual(list(range(10)), order)
+        self.assertEqual(0, window.stats()["waiting"])
+
+    def test_throttled_endpoint(self):
+        """
+        test that a 429 response shrinks the pooled window of the endpoint
+        """
+
+        def responder(query, _headers):
+            if "throttle" in query:
+                return 429, {"Retry-After": "1"}, b"slow down"
+            return SparqlTestServer.json_response(query, _headers)
+
+        with SparqlTestServer(responder) as server:
+            pool = SparqlClientPool(max_concurrency=8)
+            client = pool.get_client("test", server.endpoint())
+            for _i in range(8):
+                client.query("SELECT * WHERE { ?s ?p ?o }")
+            limit = pool.stats()["test"]["window"]["limit"]
+            with self.assertRaises(SparqlHttpError) as context:
+                client.query("SELECT * WHERE { ?s ?p 'throttle' }")
+            self.assertEqual(429, context.exception.status_code)
+            self.assertEqual(1.0, context.exception.retry_after)
+            stats = pool.stats()["test"]["window"]
+            if self.debug:
+                print(stats)
+            self.assertEqual(max(1, limit // 2), stats["limit"])
+            self.assertEqual(1, stats["throttle"])
+            self.assertGreater(stats["blocked_for"], 0)
@@ -0,0 +1,138 @@
+"""
+Created on 2026-10-18
+
+@author: wf
+"""
+
+from ngwidgets.basetest import Basetest
+
+from tests.sparql_test_server import SparqlTestServer
+from velorail.endpoint_health import (
+    EndpointHealth,
+    EndpointUnavailableError,
+    HealthProber,
+)
+from velorail.npq import NPQ_Handler
+from velorail.sparql_client import SparqlHttpError
+
+
+class TestEndpointHealth(Basetest):
+    """
+    test endpoint health probing, circuit breaking and routing
+    """
+
+    def setUp(self, debug=False, profile=True):
+        Basetest.setUp(self, debug=debug, profile=profile)
+        self.now = 0.0
+        self.saved_health = EndpointHealth.instance
+        self.saved_route = NPQ_Handler.route_endpoints
+        EndpointHealth.instance = EndpointHealth(
+            failure_threshold=2, reset_timeout=10, clock=lambda: self.now
+        )
+        self.health = EndpointHealth.instance
+
+    def tearDown(self):
+        EndpointHealth.instance = self.saved_health
+        NPQ_Handler.route_endpoints = self.saved_route
+        Basetest.tearDown(self)
+
+    @staticmethod
+    def error_response(_query, _headers):
+        return 500, {"Content-Type": "text/plain"}, b"error"
+
+    def test_circuit_breaker(self):
+        """
+        test opening, half-opening and closing the circuit
+        """
+        health = self.health
+        group = ["a", "b"]
+        self.assertEqual("a", health.choose(group))
+        health.record_failure("a", "down")
+        self.assertEqual("a", health.choose(group))
+        health.record_failure("a", "down")
+        self.assertFalse(health.is_available("a"))
+        self.assertEqual("b", health.choose(group))
+        self.now = 10
+        # a single trial passes after the reset timeout
+        self.assertEqual("a", health.choose(group))
+        self.assertEqual(EndpointHealth.HALF_OPEN, health.stats()["a"]["state"])
+        self.assertEqual("b", health.choose(group))
+        health.record_failure("a", "still down")
+        self.assertEqual(2, health.stats()["a"]["opened"])
+        self.assertEqual("b", health.choose(group))
+        self.now = 20
+        self.assertEqual("a", health.choose(group))
+        health.record_success("a")
+        self.assertEqual(EndpointHealth.CLOSED, health.stats()["a"]["state"])
+        for endpoint in group:
+            for _i in range(2):
+                health.record_failure(endpoint)
+        self.assertIsNone(health.choose(group))
+
+    def test_latency_routing(self):
+        """
+        test choosing the endpoint with the lowest probe latency
+        """
+        health = self.health
+        health.record_success("a", 2.0, probe=True)
+        health.record_success("b", 0.5, probe=True)
+        self.assertEqual("b", health.choose(["a", "b", "c"]))
+        # query outcomes do not change the latency
+        health.record_success("a", 0.1)
+        self.assertEqual("b", health.choose(["a", "b"]))
+        health.record_success("a", 0.1, probe=True)
+        self.assertAlmostEqual(1.43, health.stats()["a"]["latency"])
+        self.assertFalse(EndpointHealth.is_failure(SparqlHttpError("bad", 400)))
+        self.assertTrue(EndpointHealth.is_failure(SparqlHttpError("busy", 503)))
+        self.assertTrue(EndpointHealth.is_failure(TimeoutError()))
+
+    def test_prober(self):
+        """
+        test probing a healthy and a broken endpoint
+        """
+        with SparqlTestServer() as server, SparqlTestServer(
+            self.error_response
+        ) as broken:
+            endpoints = {"good": server.endpoint("good"), "bad": broken.endpoint("bad")}
+            prober = HealthProber(endpoints, health=self.health, interval=0.05)
+            outcomes = prober.probe_all()
+            self.assertEqual({"good": True, "bad": False}, outcomes)
+            prober.start()
+            while self.health.stats()["bad"]["probes"] < 3:
+                prober.stop_event.wait(0.01)
+            prober.stop()
+            stats = self.health.stats()
+            self.assertEqual(EndpointHealth.CLOSED, stats["good"]["state"])
+            self.assertIsNotNone(stats["good"]["latency"])
+            self.assertEqual(EndpointHealth.OPEN, stats["bad"]["state"])
+            self.assertEqual(HealthProber.probe_query, server.queries[0])
+
+    def test_routing(self):
+        """
+        test failing over named queries to a healthy mirror
+        """
+        with SparqlTestServer() as server, SparqlTestServer(
+            self.error_response
+        ) as broken:
+            handler = NPQ_Handler("locations.yaml")
+            handler.endpoints["primary"] = broken.endpoint("primary")
+            handler.endpoints["mirror"] = server.endpoint("mirror")
+            handler.endpoint_mirrors = {"primary": ("mirror",), "mirror": ()}
+            NPQ_Handler.route_endpoints = True
+            for _i in range(2):
+                with self.assertRaises(SparqlHttpError):
+                    handler.query_by_name(
+                        "WikidataGeo", param_dict={"qid": "Q1"}, endpoint="primary"
+                    )
+            lod = handler.query_by_name(
+                "WikidataGeo", param_dict={"qid": "Q1"}, endpoint="primary"
+            )
+            self.assertEqual(42, lod[0]["count"])
+            self.assertEqual(2, len(broken.queries))
+            self.assertEqual(1, len(server.queries))
+            self.health.record_failure("mirror")
+            self.health.record_failure("mirror")
+            with self.assertRaises(EndpointUnavailableError):
+                handler.query_by_name(
+                    "WikidataGeo", param_dict={"qid": "Q2"}, endpoint="primary"
+                )
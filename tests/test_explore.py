@@ -72,7 +72,7 @@ class TestExplorer(Basetest):
         # Test case 1: No duplicates
         query = """PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
 SELECT ?s ?p ?o
-WHERE { ?s ?p ?o }"""
+WHERE { ?s a owl:Class; ?p ?o FILTER(datatype(?o) = xsd:string) }"""
 
         endpoint_prefixes = """PREFIX owl: <http://www.w3.org/2002/07/owl#>
 PREFIX xsd: <http://www.w3.org/2001/XMLSchema#>"""
@@ -98,8 +98,13 @@ WHERE { ?s ?p ?o }"""
         self.assertEqual(merged3, query)
 
         # Test case 4: Query without prefixes
-        query4 = "SELECT ?s ?p ?o WHERE { ?s ?p ?o }"
+        query4 = "SELECT ?s ?p ?o WHERE { ?s a owl:Class; ?p ?o }"
         merged4 = self.handler.merge_prefixes(query4, endpoint_prefix_dict)
         self.assertTrue("PREFIX owl:" in merged4)
-        self.assertTrue("PREFIX xsd:" in merged4)
         self.assertTrue("SELECT ?s" in merged4)
+
+        # Test case 5: unused endpoint prefixes are not added
+        self.assertFalse("PREFIX xsd:" in merged4)
+        query5 = """SELECT ?s WHERE { ?s <http://schema.org/name> "xsd:string" }"""
+        merged5 = self.handler.merge_prefixes(query5, endpoint_prefix_dict)
+        self.assertEqual(merged5, query5)
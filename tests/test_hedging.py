@@ -0,0 +1,168 @@
+"""
+Created on 2026-10-18
+
+@author: wf
+"""
+
+import asyncio
+import time
+
+from ngwidgets.basetest import Basetest
+
+from tests.sparql_test_server import SparqlTestServer
+from velorail.hedging import Hedger
+from velorail.npq import NPQ_Handler
+
+
+class TestHedging(Basetest):
+    """
+    test hedged requests across mirror endpoints
+    """
+
+    def setUp(self, debug=False, profile=True):
+        Basetest.setUp(self, debug=debug, profile=profile)
+        self.saved_hedger = Hedger.instance
+        Hedger.instance = Hedger(default_delay=0.05)
+
+    def tearDown(self):
+        Hedger.instance = self.saved_hedger
+        Basetest.tearDown(self)
+
+    @staticmethod
+    def slow_response(query, headers):
+        time.sleep(1.0)
+        return SparqlTestServer.json_response(query, headers)
+
+    def get_handler(self, slow, fast) -> NPQ_Handler:
+        handler = NPQ_Handler("locations.yaml")
+        handler.endpoints["slow"] = slow.endpoint("slow")
+        handler.endpoints["fast"] = fast.endpoint("fast")
+        handler.endpoint_mirrors = {"slow": ("fast",)}
+        handler.hedge_queries = {"WikidataGeo"}
+        return handler
+
+    def test_mirrors(self):
+        """
+        test the mirrors configured in endpoints.yaml
+        """
+        handler = NPQ_Handler("locations.yaml")
+        self.assertEqual(("wikidata",), handler.endpoint_mirrors["wikidata-qlever"])
+        # sophox and the osm2rdf based qlever endpoint differ in data and prefixes
+        self.assertEqual((), handler.endpoint_mirrors["osm-sophox"])
+        self.assertIsNone(handler.get_mirror("osm-sophox", "BikeNodes4Bounds", True))
+        self.assertIsNone(handler.get_mirror("wikidata", "WikidataGeo", None))
+        self.assertEqual(
+            "wikidata-qlever", handler.get_mirror("wikidata", "WikidataGeo", True)
+        )
+
+    def test_hedged_query(self):
+        """
+        test that the mirror answers a slow query
+        """
+        with SparqlTestServer(self.slow_response) as slow, SparqlTestServer() as fast:
+            handler = self.get_handler(slow, fast)
+            start_time = time.monotonic()
+            lod = handler.query_by_name(
+                "WikidataGeo", param_dict={"qid": "Q1"}, endpoint="slow"
+            )
+            elapsed = time.monotonic() - start_time
+            self.assertEqual(42, lod[0]["count"])
+            self.assertLess(elapsed, 0.9)
+            self.assertEqual(1, len(fast.queries))
+            # not hedged by default
+            lod = handler.query_by_name(
+                "WikidataGeo", param_dict={"qid": "Q1"}, endpoint="fast"
+            )
+            self.assertEqual(2, len(fast.queries))
+            stats = Hedger.get_instance().stats()
+            self.assertEqual(1, stats["hedged"])
+            self.assertEqual(1, stats["secondary_wins"])
+
+    def test_hedged_aquery(self):
+        """
+        test that the async hedge cancels the slow primary
+        """
+        with SparqlTestServer(self.slow_response) as slow, SparqlTestServer() as fast:
+            handler = self.get_handler(slow, fast)
+            start_time = time.monotonic()
+            lod = asyncio.run(
+                handler.aquery_by_name(
+                    "WikidataGeo", param_dict={"qid": "Q1"}, endpoint="slow"
+                )
+            )
+            elapsed = time.monotonic() - start_time
+            self.assertEqual(42, lod[0]["count"])
+            self.assertLess(elapsed, 0.9)
+            self.assertEqual(1, Hedger.get_instance().stats()["secondary_wins"])
+
+    def test_busy_workers(self):
+        """
+        test that requests are not hedged while all workers are busy
+        """
+        hedger = Hedger(default_delay=0.05, max_workers=1)
+
+        def slow(result: str) -> str:
+            time.sleep(0.3)
+            return result
+
+        result = hedger.run(lambda: slow("primary"), lambda: "secondary", delay=0.05)
+        self.assertEqual("primary", result)
+        blocker = hedger.submit(lambda: slow("blocker"))
+        self.assertIsNone(hedger.submit(lambda: "busy"))
+        result = hedger.run(lambda: "primary", lambda: "secondary", delay=0.05)
+        self.assertEqual("primary", result)
+        self.assertEqual("blocker", blocker.result())
+        hedger.executor.shutdown(wait=True)
+        stats = hedger.stats()
+        self.assertEqual(0, stats["hedged"])
+        self.assertEqual(2, stats["skipped"])
+        self.assertEqual(0, stats["running"])
+
+    def test_cancelled_arun(self):
+        """
+        test that the requests of a cancelled caller are cancelled
+        """
+        hedger = Hedger(default_delay=1.0)
+        cancelled = []
+
+        async def request(name: str):
+            try:
+                await asyncio.sleep(2)
+            except asyncio.CancelledError:
+                cancelled.append(name)
+                raise
+            return name
+
+        async def run(delay: float):
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(
+                    hedger.arun(
+                        lambda: request("primary"),
+                        lambda: request("secondary"),
+                        delay=delay,
+                    ),
+                    timeout=0.1,
+                )
+            await asyncio.sleep(0.01)
+            # checked before asyncio.run cancels the remaining tasks
+            return sorted(cancelled)
+
+        self.assertEqual(["primary"], asyncio.run(run(delay=1.0)))
+        cancelled.clear()
+        self.assertEqual(["primary", "secondary"], asyncio.run(run(delay=0.05)))
+
+    def test_failover(self):
+        """
+        test that a failing primary is answered by the mirror right away
+        """
+
+        def error_response(_query, _headers):
+            return 503, {"Content-Type": "text/plain"}, b"overloaded"
+
+        with SparqlTestServer(error_response) as broken, SparqlTestServer() as fast:
+            handler = self.get_handler(broken, fast)
+            Hedger.get_instance().default_delay = 10.0
+            lod = handler.query(
+                "SELECT ?s WHERE { ?s ?p ?o }", endpoint="slow", hedge=True
+            )
+            self.assertEqual(42, lod[0]["count"])
@@ -0,0 +1,72 @@
+"""
+Created on 2026-10-18
+
+@author: wf
+"""
+
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from ngwidgets.basetest import Basetest
+
+from velorail.locfind import LocFinder
+from velorail.npq import NPQ_Handler
+from velorail.npq_registry import NPQ_Registry
+
+
+class TestNPQRegistry(Basetest):
+    """
+    test the process wide registry of parsed yaml files
+    """
+
+    def setUp(self, debug=False, profile=True):
+        Basetest.setUp(self, debug=debug, profile=profile)
+
+    def test_shared(self):
+        """
+        test that handlers share the parsed configuration
+        """
+        registry = NPQ_Registry.get_instance()
+        LocFinder()
+        loads = registry.loads
+        locfinder1 = LocFinder()
+        locfinder2 = LocFinder()
+        explorer = NPQ_Handler("sparql-explore.yaml")
+        self.assertIs(locfinder1.query_manager, locfinder2.query_manager)
+        self.assertIs(locfinder1.endpoint_prefixes, explorer.endpoint_prefixes)
+        # only the sparql-explore.yaml queries might be new
+        self.assertLessEqual(registry.loads - loads, 1)
+        with self.assertRaises(TypeError):
+            explorer.endpoint_prefixes["wikidata"]["wd"] = "http://example.org/"
+        # handler local endpoint additions do not leak
+        locfinder1.endpoints["local"] = locfinder1.endpoints["wikidata"]
+        self.assertNotIn("local", locfinder2.endpoints)
+
+    def test_mtime_reload(self):
+        """
+        test that a modified query file is reloaded
+        """
+        registry = NPQ_Registry()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            handler_yaml = Path(__file__).parent.parent / "velorail" / "resources"
+            query_yaml = Path(tmpdir) / "locations.yaml"
+            shutil.copy(handler_yaml / "queries" / "locations.yaml", query_yaml)
+            qm1 = registry.get_query_manager(query_yaml)
+            qm2 = registry.get_query_manager(query_yaml)
+            self.assertIs(qm1, qm2)
+            self.assertIn("WikidataGeo", qm1.queriesByName)
+            # the shared queries can not be replaced by a handler
+            with self.assertRaises(TypeError):
+                qm1.queriesByName["WikidataGeo"] = None
+            with open(query_yaml, "a") as yaml_file:
+                yaml_file.write(
+                    "\nExtraQuery:\n  sparql: |\n    SELECT ?s WHERE { ?s ?p ?o }\n"
+                )
+            stat = os.stat(query_yaml)
+            os.utime(query_yaml, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+            qm3 = registry.get_query_manager(query_yaml)
+            self.assertIsNot(qm1, qm3)
+            self.assertIn("ExtraQuery", qm3.queriesByName)
+            self.assertEqual(2, registry.loads)
@@ -6,10 +6,12 @@ Created on 2025-02-04
 
 import json
 import os
+import tempfile
 from argparse import Namespace
 
 from ngwidgets.basetest import Basetest
 
+from tests.sparql_test_server import SparqlTestServer
 from velorail.locfind import NPQ_Handler
 from velorail.osm2wiki import Osm2WikiConverter
 
@@ -133,3 +135,52 @@ class TestOsm2wiki(Basetest):
 
             self.assertTrue(node_count >= expected_nodes,node_count)
             self.assertTrue(os.path.exists(converter.wiki_file))
+
+    def testStreamingConverter(self):
+        """
+        test the streaming conversion against a local endpoint
+        """
+        rows = [
+            {
+                "rel_pos": (str(i), None),
+                "node": (f"https://www.openstreetmap.org/node/{i}", None),
+                "loc": (f"POINT(2.0 {42.0 + (i * 0.004491)})", None),
+            }
+            for i in range(10)
+        ]
+
+        def response(_query, _headers):
+            body = SparqlTestServer.sparql_json(rows)
+            return 200, {"Content-Type": "application/sparql-results+json"}, body
+
+        with SparqlTestServer(response) as server, tempfile.TemporaryDirectory() as tmp:
+            args = Namespace(
+                debug=False,
+                tmp=tmp,
+                endpoint_name="test",
+                zoom=8,
+                min_lat=42.0,
+                max_lat=44.0,
+                min_lon=-9.0,
+                max_lon=4.0,
+                transport="bike",
+                loc_type="bike-waypoint",
+                role="member",
+                country="Spanien",
+                category="Spain2025",
+                min_node_distance=1000,
+            )
+            converter = Osm2WikiConverter(args=args)
+            converter.query_handler.endpoints["test"] = server.endpoint()
+            converter.test = True
+            lod = converter.process_osm_items(["relation/1"])
+            self.assertEqual(4, len(lod))
+            json_file = os.path.join(tmp, "osm_relation_1.json")
+            with open(json_file) as f:
+                content = f.read()
+            expected_lod = [
+                {key: value for key, (value, _datatype) in row.items()} for row in rows
+            ]
+            expected = json.dumps(expected_lod, indent=2)
+            self.assertEqual(expected, content)
+            self.assertTrue(os.path.exists(converter.wiki_file))
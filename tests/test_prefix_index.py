@@ -0,0 +1,89 @@
+"""
+Created on 2026-10-18
+
+@author: wf
+"""
+
+from ngwidgets.basetest import Basetest
+
+from velorail.npq import NPQ_Handler
+from velorail.prefix_index import PrefixIndex
+from velorail.querygen import QueryGen
+
+
+class TestPrefixIndex(Basetest):
+    """
+    test longest match URI compaction and expansion
+    """
+
+    def setUp(self, debug=False, profile=True):
+        Basetest.setUp(self, debug=debug, profile=profile)
+        self.prefixes = {
+            "osm2rdf": "https://osm2rdf.cs.uni-freiburg.de/rdf/",
+            "osm2rdf_geom": "https://osm2rdf.cs.uni-freiburg.de/rdf/geom#",
+            "osmkey": "https://www.openstreetmap.org/wiki/Key:",
+            "rdf": "http://www.w3.org/1999/02/22-rdf-syntax-ns#",
+            "rdf2": "http://www.w3.org/1999/02/22-rdf-syntax-ns#",
+        }
+        self.index = PrefixIndex(self.prefixes)
+
+    def test_compact_expand(self):
+        """
+        test that the longest namespace wins and expand inverts compact
+        """
+        uris = [
+            "https://osm2rdf.cs.uni-freiburg.de/rdf/geom#convex_hull",
+            "https://osm2rdf.cs.uni-freiburg.de/rdf/member#role",
+            "https://www.openstreetmap.org/wiki/Key:ref",
+            "http://www.w3.org/1999/02/22-rdf-syntax-ns#type",
+            "http://example.org/unknown",
+            "https://osm2rdf.cs.uni-freiburg.de/rdf/geom#convex_hull",
+        ]
+        qnames = self.index.compact(uris)
+        self.assertEqual(
+            [
+                "osm2rdf_geom:convex_hull",
+                "osm2rdf:member#role",
+                "osmkey:ref",
+                "rdf:type",
+                None,
+                "osm2rdf_geom:convex_hull",
+            ],
+            qnames,
+        )
+        self.assertEqual(uris[:4], self.index.expand(qnames[:4]))
+        self.assertEqual([None, None], self.index.expand(["foaf:name", "type"]))
+
+    def test_querygen(self):
+        """
+        test that QueryGen compacts with the index
+        """
+        query_gen = QueryGen(self.prefixes, prefix_index=self.index)
+        for prop, expected in [
+            ("https://www.openstreetmap.org/wiki/Key:ref", "osmkey:ref"),
+            ("http://example.org/p", "<http://example.org/p>"),
+        ]:
+            with self.subTest(prop=prop):
+                self.assertEqual(expected, query_gen.get_prefixed_property(prop))
+
+    def test_endpoint_index(self):
+        """
+        test the shared index of an endpoint
+        """
+        handler = NPQ_Handler("sparql-explore.yaml")
+        prefix_index = handler.get_prefix_index("wikidata-qlever")
+        self.assertIs(
+            prefix_index,
+            NPQ_Handler("locations.yaml").get_prefix_index("wikidata-qlever"),
+        )
+        self.assertEqual(
+            ["wdt:P31", "wd:Q80", "p:P31"],
+            prefix_index.compact(
+                [
+                    "http://www.wikidata.org/prop/direct/P31",
+                    "http://www.wikidata.org/entity/Q80",
+                    "http://www.wikidata.org/prop/P31",
+                ]
+            ),
+        )
+        self.assertEqual(0, len(handler.get_prefix_index("unknown")))
@@ -0,0 +1,51 @@
+"""
+Created on 2026-10-18
+
+@author: wf
+"""
+
+from ngwidgets.basetest import Basetest
+
+from velorail.prefix_scanner import PrefixScanner
+
+
+class TestPrefixScanner(Basetest):
+    """
+    test finding the prefixes a query references
+    """
+
+    def setUp(self, debug=False, profile=True):
+        Basetest.setUp(self, debug=debug, profile=profile)
+
+    def test_scan(self):
+        """
+        test that literals, IRIs, comments and variables are skipped
+        """
+        for sparql, expected in [
+            ("SELECT ?s WHERE { ?s ?p ?o }", set()),
+            ("SELECT ?s WHERE { ?s wdt:P31 wd:Q55488 }", {"wdt", "wd"}),
+            ('SELECT ?s WHERE { ?s rdfs:label "osm:node 12:30"@en }', {"rdfs"}),
+            ("SELECT ?s WHERE { ?s <http://schema.org/name> ?o }", set()),
+            ("SELECT ?s WHERE { ?s ?p ?o } # geo:wktLiteral", set()),
+            ("SELECT ?s WHERE { ?s :p '''it's a:b''' }", {""}),
+            (
+                'FILTER(?lat > "1"^^xsd:double && ?s = osm2rdf:way)',
+                {"xsd", "osm2rdf"},
+            ),
+            ("SELECT ?s WHERE { ?s a schema:Article.node }", {"schema"}),
+        ]:
+            with self.subTest(sparql=sparql):
+                self.assertEqual(expected, set(PrefixScanner.scan(sparql)))
+        PrefixScanner.scan("SELECT ?s WHERE { ?s wdt:P31 wd:Q55488 }")
+        self.assertGreater(PrefixScanner.scan.cache_info().hits, 0)
+
+    def test_mask(self):
+        """
+        test blanking comments and string literals at the same positions
+        """
+        sparql = 'SELECT ?s WHERE { ?s rdfs:label "a } b" } # LIMIT 10\nORDER BY ?s'
+        masked = PrefixScanner.mask(sparql)
+        self.assertEqual(len(sparql), len(masked))
+        self.assertEqual(masked.rfind("}"), sparql.index("} #"))
+        self.assertNotIn("LIMIT", masked)
+        self.assertIn('"a } b"', PrefixScanner.mask(sparql, literals=False))
@@ -0,0 +1,116 @@
+"""
+Created on 2026-10-18
+
+@author: wf
+"""
+
+from ngwidgets.basetest import Basetest
+
+from tests.sparql_test_server import SparqlTestServer
+from velorail.npq import NPQ_Handler
+from velorail.query_batch import QueryBatcher
+
+
+class TestQueryBatch(Basetest):
+    """
+    test VALUES coalescing of named parameterized queries
+    """
+
+    def setUp(self, debug=False, profile=True):
+        Basetest.setUp(self, debug=debug, profile=profile)
+
+    def get_batcher(self, yaml_file: str, query_name: str, endpoint: str):
+        handler = NPQ_Handler(yaml_file)
+        query = handler.get_query(query_name)
+        sparql_query = handler.merge_prefixes_by_endpoint_name(query.query, endpoint)
+        return QueryBatcher(sparql_query)
+
+    def test_batch_query(self):
+        """
+        test rewriting the different parameter positions
+        """
+        for yaml_file, query_name, param_dicts, expected in [
+            (
+                "locations.yaml",
+                "WikidataGeo",
+                [{"qid": "Q1"}, {"qid": "Q2"}],
+                ["(0 wd:Q1)", "(1 wd:Q2)", "?npq_t0 wdt:P625"],
+            ),
+            (
+                "osmplanet.yaml",
+                "ItemNodesGeo",
+                [{"relid": "1", "role": "stop"}, {"relid": "2", "role": "stop"}],
+                ["VALUES (?npq_batch ?rel ?role)", '(1 osmrel:2 "stop")'],
+            ),
+            (
+                "locations.yaml",
+                "BikeNodes4Bounds",
+                [{"south": 1, "west": 2, "north": 3, "east": 4}],
+                ["?lat >= ?npq_t0", "SELECT DISTINCT ?npq_batch"],
+            ),
+            (
+                "sparql-explore.yaml",
+                "ExploreFromSubjectSummary",
+                [{"start_node": "wd:Q80"}],
+                ["GROUP BY ?npq_batch ?p"],
+            ),
+        ]:
+            with self.subTest(query_name=query_name):
+                batcher = self.get_batcher(yaml_file, query_name, "osm-qlever")
+                self.assertTrue(batcher.can_batch, batcher.reason)
+                batch_query = batcher.batch_query(param_dicts)
+                if self.debug:
+                    print(batch_query)
+                self.assertNotIn("{{", batch_query)
+                for part in expected:
+                    self.assertIn(part, batch_query)
+
+    def test_not_batchable(self):
+        """
+        test templates that need to be run per parameter set
+        """
+        for query in [
+            "SELECT ?s WHERE { ?s ?p ?o }",
+            "SELECT ?p WHERE { {{node}} ?p ?o } LIMIT 10",
+            "SELECT (COUNT(?o) AS ?c) WHERE { {{node}} ?p ?o }",
+        ]:
+            with self.subTest(query=query):
+                self.assertFalse(QueryBatcher(query).can_batch)
+
+    def test_audit(self):
+        """
+        test that bound values are audited like single queries
+        """
+        batcher = QueryBatcher("SELECT ?p WHERE { wd:{{qid}} ?p ?o }")
+        with self.assertRaises(ValueError):
+            batcher.batch_query([{"qid": "Q1> } ; DROP ALL"}])
+
+    def test_query_by_name_many(self):
+        """
+        test splitting the batch results back per input
+        """
+
+        def batch_response(query, _headers):
+            xsd = "http://www.w3.org/2001/XMLSchema#"
+            lod = []
+            for i in (0, 1, 1):
+                lod.append(
+                    {
+                        "npq_batch": (str(i), f"{xsd}integer"),
+                        "npq_t0": (f"Q{i}", None),
+                        "lat": ("1.0", None),
+                    }
+                )
+            body = SparqlTestServer.sparql_json(lod)
+            return 200, {"Content-Type": "application/sparql-results+json"}, body
+
+        with SparqlTestServer(batch_response) as server:
+            handler = NPQ_Handler("locations.yaml")
+            handler.endpoints["test"] = server.endpoint()
+            param_dicts = [{"qid": f"Q{i}"} for i in range(5)]
+            lods = handler.query_by_name_many(
+                "WikidataGeo", param_dicts, endpoint="test", batch_size=3
+            )
+            self.assertEqual(2, len(server.queries))
+            self.assertEqual([1, 2, 0, 1, 2], [len(lod) for lod in lods])
+            self.assertEqual({"lat": "1.0"}, lods[0][0])
@@ -0,0 +1,104 @@
+"""
+Created on 2026-10-18
+
+@author: wf
+"""
+
+import datetime
+import tempfile
+import time
+from pathlib import Path
+
+from ngwidgets.basetest import Basetest
+
+from velorail.locfind import LocFinder
+from velorail.query_cache import QueryCache
+
+
+class TestQueryCache(Basetest):
+    """
+    test the persistent SPARQL query result cache
+    """
+
+    def setUp(self, debug=False, profile=True):
+        Basetest.setUp(self, debug=debug, profile=profile)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = Path(self.tmpdir.name) / "cache.db"
+
+    def tearDown(self):
+        Basetest.tearDown(self)
+        self.tmpdir.cleanup()
+
+    def test_key(self):
+        """
+        test that the key ignores indentation but not the parameters
+        """
+        cache = QueryCache(self.db_path)
+        key1 = cache.get_key("wikidata", "SELECT ?s\n  WHERE { ?s ?p ?o }", {"a": 1})
+        key2 = cache.get_key("wikidata", "  SELECT ?s\nWHERE { ?s ?p ?o }\n", {"a": 1})
+        key3 = cache.get_key("wikidata", "SELECT ?s\nWHERE { ?s ?p ?o }", {"a": 2})
+        key4 = cache.get_key("osm-qlever", "SELECT ?s\nWHERE { ?s ?p ?o }", {"a": 1})
+        self.assertEqual(key1, key2)
+        self.assertNotEqual(key1, key3)
+        self.assertNotEqual(key1, key4)
+
+    def test_put_get(self):
+        """
+        test roundtrip, ttl expiry and hit/miss counters
+        """
+        cache = QueryCache(self.db_path)
+        lod = [
+            {"qid": "Q1", "count": 3, "date": datetime.date(2025, 2, 1)},
+            {"qid": "Q2", "when": datetime.datetime(2025, 2, 1, 12, 30)},
+        ]
+        cache.put("k1", lod, query_name="Test")
+        self.assertEqual(lod, cache.get("k1", "Test"))
+        self.assertIsNone(cache.get("k2", "Test"))
+        cache.put("k3", lod, query_name="Short", ttl=0.05)
+        time.sleep(0.1)
+        self.assertIsNone(cache.get("k3", "Short"))
+        stats = cache.stats()
+        if self.debug:
+            print(stats)
+        self.assertEqual(1, stats["hits"])
+        self.assertEqual(2, stats["misses"])
+        self.assertEqual(1, stats["entries"])
+
+    def test_lru_eviction(self):
+        """
+        test that the least recently used entries are evicted
+        """
+        cache = QueryCache(self.db_path, max_entries=2)
+        for i in range(2):
+            cache.put(f"k{i}", [{"i": i}])
+            time.sleep(0.01)
+        # touch k0 so that k1 becomes the least recently used
+        self.assertIsNotNone(cache.get("k0"))
+        cache.put("k2", [{"i": 2}])
+        self.assertIsNone(cache.get("k1"))
+        self.assertIsNotNone(cache.get("k0"))
+        self.assertIsNotNone(cache.get("k2"))
+
+    def test_query_from_cache(self):
+        """
+        test that a cached named query does not hit the endpoint
+        """
+        locfinder = LocFinder()
+        locfinder.query_cache = QueryCache(self.db_path)
+        query = locfinder.query_manager.queriesByName["WikidataGeo"]
+        sparql_query = locfinder.merge_prefixes_by_endpoint_name(
+            query.query, "wikidata-qlever"
+        )
+        param_dict = {"qid": "Q1959795"}
+        key = locfinder.query_cache.get_key("wikidata-qlever", sparql_query, param_dict)
+        record = {
+            "lat": "43.4592",
+            "lon": "-1.5459",
+            "label": "Gare de Biarritz",
+            "description": "railway station in Biarritz, France",
+        }
+        locfinder.query_cache.put(key, [record], query_name="WikidataGeo")
+        wd_item = locfinder.get_wikidata_geo("Q1959795")
+        self.assertEqual("Gare de Biarritz", wd_item.label)
+        self.assertAlmostEqual(43.4592, wd_item.lat)
+        self.assertEqual(1, locfinder.query_cache.stats()["hits"])
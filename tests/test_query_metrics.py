@@ -0,0 +1,96 @@
+"""
+Created on 2026-10-18
+
+@author: wf
+"""
+
+import tempfile
+
+from ngwidgets.basetest import Basetest
+
+from tests.sparql_test_server import SparqlTestServer
+from velorail.npq import NPQ_Handler
+from velorail.query_cache import QueryCache
+from velorail.query_metrics import QueryMetrics
+
+
+class TestQueryMetrics(Basetest):
+    """
+    test the per named query metrics
+    """
+
+    def setUp(self, debug=False, profile=True):
+        Basetest.setUp(self, debug=debug, profile=profile)
+        self.saved_metrics = QueryMetrics.instance
+        QueryMetrics.instance = QueryMetrics()
+
+    def tearDown(self):
+        QueryMetrics.instance = self.saved_metrics
+        NPQ_Handler.query_cache = None
+        Basetest.tearDown(self)
+
+    def test_histogram(self):
+        """
+        test the cumulative wall time buckets
+        """
+        metrics = QueryMetrics(buckets=(0.1, 1.0))
+        for seconds in (0.05, 0.1, 0.5, 2.0):
+            metrics.record("WikidataGeo", "wikidata", seconds, rows=2, size=100)
+        metrics.record_error(None, "wikidata")
+        records = metrics.to_json()
+        self.assertEqual(["WikidataGeo", "adhoc"], [r["query"] for r in records])
+        geo = records[0]
+        self.assertEqual({"0.1": 2, "1.0": 3, "+Inf": 4}, geo["buckets"])
+        self.assertEqual(8, geo["rows"])
+        self.assertEqual(400, geo["bytes"])
+        self.assertEqual(1, records[1]["errors"])
+        text = metrics.to_prometheus()
+        if self.debug:
+            print(text)
+        self.assertIn(
+            'velorail_query_duration_seconds_bucket{query="WikidataGeo",endpoint="wikidata",le="+Inf"} 4',
+            text,
+        )
+        self.assertIn(
+            'velorail_query_errors_total{query="adhoc",endpoint="wikidata"} 1', text
+        )
+
+    def test_npq_handler(self):
+        """
+        test the metrics recorded by NPQ_Handler
+        """
+
+        def error_response(_query, _headers):
+            return 500, {"Content-Type": "text/plain"}, b"error"
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            NPQ_Handler.query_cache = QueryCache(f"{tmpdir}/cache.db")
+            with SparqlTestServer() as server, SparqlTestServer(
+                error_response
+            ) as broken:
+                handler = NPQ_Handler("locations.yaml")
+                handler.endpoints["test"] = server.endpoint()
+                handler.endpoints["broken"] = broken.endpoint("broken")
+                for _i in range(3):
+                    handler.query_by_name(
+                        "WikidataGeo", param_dict={"qid": "Q1"}, endpoint="test"
+                    )
+                rows = list(
+                    handler.iter_query_by_name(
+                        "WikidataGeo", param_dict={"qid": "Q2"}, endpoint="test"
+                    )
+                )
+                self.assertEqual(1, len(rows))
+                with self.assertRaises(Exception):
+                    handler.query_by_name(
+                        "WikidataGeo", param_dict={"qid": "Q1"}, endpoint="broken"
+                    )
+        records = {
+            (r["query"], r["endpoint"]): r for r in QueryMetrics.get_instance().to_json()
+        }
+        test = records[("WikidataGeo", "test")]
+        self.assertEqual(2, test["count"])
+        self.assertEqual(2, test["cache_hits"])
+        self.assertEqual(2, test["rows"])
+        self.assertGreater(test["bytes"], 100)
+        self.assertEqual(1, records[("WikidataGeo", "broken")]["errors"])
@@ -0,0 +1,196 @@
+"""
+Created on 2026-10-18
+
+@author: wf
+"""
+
+import asyncio
+import re
+import threading
+import time
+
+from ngwidgets.basetest import Basetest
+
+from tests.sparql_test_server import SparqlTestServer
+from velorail.npq import NPQ_Handler
+from velorail.query_pager import QueryPager
+
+
+class TestQueryPager(Basetest):
+    """
+    test LIMIT/OFFSET pagination of named queries
+    """
+
+    def setUp(self, debug=False, profile=True):
+        Basetest.setUp(self, debug=debug, profile=profile)
+        self.total = 25
+        self.lock = threading.Lock()
+        self.pages = []
+
+    def page_response(self, query, _headers):
+        """
+        respond with the requested slice of self.total rows
+        """
+        limit = int(re.search(r"LIMIT (\d+)", query).group(1))
+        offset = int(re.search(r"OFFSET (\d+)", query).group(1))
+        with self.lock:
+            self.pages.append(offset // limit)
+        xsd = "http://www.w3.org/2001/XMLSchema#"
+        lod = [
+            {"item": (f"Q{i}", None), "lat": (str(i), f"{xsd}integer")}
+            for i in range(offset, min(offset + limit, self.total))
+        ]
+        body = SparqlTestServer.sparql_json(lod)
+        return 200, {"Content-Type": "application/sparql-results+json"}, body
+
+    def test_page_query(self):
+        """
+        test the stable ORDER BY of the page queries
+        """
+        handler = NPQ_Handler("locations.yaml")
+        for query_name, expected in [
+            ("AllTrainStations", "ORDER BY ?item ?itemLabel ?lat ?long"),
+            ("BikeNodes4Bounds", "ORDER BY ?nodeLabel ?node ?name"),
+        ]:
+            with self.subTest(query_name=query_name):
+                pager = QueryPager(handler.get_query(query_name).query)
+                self.assertTrue(pager.can_page, pager.reason)
+                page_query = pager.page_query(2, 100)
+                self.assertIn(expected, page_query)
+                self.assertTrue(page_query.endswith("LIMIT 100\nOFFSET 200"))
+        pager = QueryPager("SELECT ?p (COUNT(?o) AS ?c) WHERE { ?s ?p ?o } GROUP BY ?p")
+        self.assertEqual(["p", "c"], pager.variables)
+        for query in [
+            "SELECT * WHERE { ?s ?p ?o }",
+            "SELECT ?s WHERE { ?s ?p ?o } LIMIT 10",
+            "SELECT ?s WHERE { ?s ?p ?o }\nORDER BY ?s # by subject\nLIMIT 10",
+        ]:
+            with self.subTest(query=query):
+                self.assertFalse(QueryPager(query).can_page)
+        # comments and literals after the body are not part of the modifiers
+        for query, expected in [
+            (
+                "SELECT ?s WHERE { ?s ?p ?o }\nORDER BY DESC(?s) # newest first }",
+                "SELECT ?s WHERE { ?s ?p ?o }\nORDER BY DESC(?s) ?s",
+            ),
+            (
+                'SELECT ?s WHERE { ?s ?p "}" }\n# no LIMIT here',
+                'SELECT ?s WHERE { ?s ?p "}" }\nORDER BY ?s',
+            ),
+        ]:
+            with self.subTest(query=query):
+                pager = QueryPager(query)
+                self.assertTrue(pager.can_page, pager.reason)
+                self.assertEqual(expected, pager.ordered_query())
+
+    def test_fetch_in_flight(self):
+        """
+        test that no page request outlives the fetch
+        """
+        started, finished = [], []
+
+        # the short page answers first and the pages after it take longest
+        delays = {0: 0.1, 1: 0.1, 2: 0.01}
+
+        def get_rows(page: int):
+            rows = [{"row": i} for i in range(page * 10, min(page * 10 + 10, 25))]
+            return rows
+
+        def fetch_page(page: int):
+            started.append(page)
+            time.sleep(delays.get(page, 0.3))
+            finished.append(page)
+            return get_rows(page)
+
+        async def afetch_page(page: int):
+            started.append(page)
+            try:
+                await asyncio.sleep(delays.get(page, 0.3))
+            finally:
+                finished.append(page)
+            return get_rows(page)
+
+        lod = QueryPager.fetch(fetch_page, page_size=10, parallelism=4)
+        self.assertEqual(list(range(25)), [record["row"] for record in lod])
+        self.assertEqual([0, 1, 2, 3], sorted(started))
+        self.assertEqual(sorted(started), sorted(finished))
+        started.clear()
+        finished.clear()
+        lod = asyncio.run(QueryPager.afetch(afetch_page, page_size=10, parallelism=4))
+        self.assertEqual(25, len(lod))
+        self.assertEqual(sorted(started), sorted(finished))
+        # no page past the known last page is requested
+        started.clear()
+        QueryPager.fetch(fetch_page, page_size=10, parallelism=1, max_pages=2)
+        self.assertEqual([0, 1], started)
+
+    def test_query_by_name_paged(self):
+        """
+        test fetching and stitching the pages
+        """
+        with SparqlTestServer(self.page_response) as server:
+            handler = NPQ_Handler("locations.yaml")
+            handler.endpoints["test"] = server.endpoint()
+            lod = handler.query_by_name_paged(
+                "AllTrainStations", endpoint="test", page_size=10, parallelism=2
+            )
+            self.assertEqual(list(range(25)), [record["lat"] for record in lod])
+            # page 2 is short - at most one more page might have been requested
+            self.assertLessEqual(max(self.pages), 3)
+            self.pages.clear()
+            lod = handler.query_by_name_paged(
+                "AllTrainStations", endpoint="test", page_size=10, max_pages=2
+            )
+            self.assertEqual(20, len(lod))
+            self.assertEqual([0, 1], sorted(self.pages))
+
+    def test_prefixed_params(self):
+        """
+        test that paged and batched queries declare the prefixes
+        of prefixed names in their parameter values
+        """
+
+        def empty_response(_query, _headers):
+            body = SparqlTestServer.sparql_json([])
+            return 200, {"Content-Type": "application/sparql-results+json"}, body
+
+        with SparqlTestServer(empty_response) as server:
+            handler = NPQ_Handler("sparql-explore.yaml")
+            handler.endpoints["test"] = server.endpoint()
+            handler.endpoint_prefixes = dict(handler.endpoint_prefixes)
+            handler.endpoint_prefixes["test"] = handler.endpoint_prefixes["wikidata"]
+            param_dict = {"start_node": "wd:Q80"}
+            handler.query_by_name_paged(
+                "ExploreFromObject", param_dict, endpoint="test", page_size=10
+            )
+            asyncio.run(
+                handler.aquery_by_name_paged(
+                    "ExploreFromObject", param_dict, endpoint="test", page_size=10
+                )
+            )
+            handler.query_df_by_name(
+                "ExploreFromObject", param_dict, endpoint="test", page_size=10
+            )
+            handler.query_by_name_many(
+                "ExploreFromObject",
+                [{"start_node": "wd:Q80"}, {"start_node": "wd:Q81"}],
+                endpoint="test",
+            )
+            self.assertTrue(any("OFFSET 0" in query for query in server.queries))
+            self.assertIn("VALUES", server.queries[-1])
+            for query in server.queries:
+                self.assertIn("PREFIX wd: <http://www.wikidata.org/entity/>", query)
+
+    def test_aquery_by_name_paged(self):
+        """
+        test async page fetching
+        """
+        with SparqlTestServer(self.page_response) as server:
+            handler = NPQ_Handler("locations.yaml")
+            handler.endpoints["test"] = server.endpoint()
+            lod = asyncio.run(
+                handler.aquery_by_name_paged(
+                    "AllTrainStations", endpoint="test", page_size=5
+                )
+            )
+            self.assertEqual(list(range(25)), [record["lat"] for record in lod])
@@ -0,0 +1,137 @@
+"""
+Created on 2026-10-18
+
+@author: wf
+"""
+
+import tempfile
+
+from ngwidgets.basetest import Basetest
+from rdflib import Graph, Literal, URIRef
+
+from velorail.predicate_catalog import PredicateCatalog
+from velorail.query_planner import QueryPlan, QueryPlanner
+from velorail.querygen import QueryGen
+
+
+class TestQueryPlanner(Basetest):
+    """
+    test the predicate catalog and the cost based query planner
+    """
+
+    def setUp(self, debug=False, profile=True):
+        Basetest.setUp(self, debug=debug, profile=profile)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.catalog = PredicateCatalog(f"{self.tmpdir.name}/catalog.db")
+        self.ns = "https://www.openstreetmap.org/wiki/Key:"
+        self.prefixes = {
+            "osmkey": self.ns,
+            "osmrel": "https://www.openstreetmap.org/relation/",
+        }
+
+    def tearDown(self):
+        self.catalog.connection.close()
+        self.tmpdir.cleanup()
+        Basetest.tearDown(self)
+
+    def test_catalog(self):
+        """
+        test gathering the statistics from summary results
+        """
+        for node, counts in [("r1", {"name": 2, "ref": 1}), ("r2", {"name": 4})]:
+            lod = [{"p": f"{self.ns}{key}", "count": c} for key, c in counts.items()]
+            self.catalog.observe_summary("osm", node, "subject", lod)
+        # repeating an exploration does not inflate the statistics
+        self.catalog.observe_summary(
+            "osm", "r1", "subject", [{"p": f"{self.ns}name", "count": 2}]
+        )
+        self.catalog.observe_summary(
+            "osm", f"{self.ns}name", "predicate", [{"s": "r3", "count": 6}]
+        )
+        self.catalog.observe_summary(
+            "osm", "n1", "object", [{"p": f"{self.ns}name", "count": 5}]
+        )
+        stats = self.catalog.get_stats("osm", [f"{self.ns}name", f"{self.ns}ref"])
+        name_stats = stats[f"{self.ns}name"]
+        self.assertEqual(3, name_stats.subjects)
+        self.assertEqual(12, name_stats.subject_triples)
+        self.assertEqual(6, name_stats.max_per_subject)
+        self.assertEqual(4, name_stats.values_per_subject)
+        self.assertEqual(1, name_stats.objects)
+        self.assertEqual(5, name_stats.max_per_object)
+        self.assertEqual(1, stats[f"{self.ns}ref"].values_per_subject)
+        self.assertEqual({}, self.catalog.get_stats("wikidata", [f"{self.ns}ref"]))
+        self.assertEqual(
+            {"osm": {"predicates": 2, "observations": 5}}, self.catalog.stats()
+        )
+
+    def test_plan(self):
+        """
+        test estimating, splitting and refusing generated queries
+        """
+        card_by_key = {"ref": 1, "name": 3, "route": 2, "member": 150, "way": 300}
+        self.catalog.observe_summary(
+            "osm",
+            "https://www.openstreetmap.org/relation/1",
+            "subject",
+            [{"p": f"{self.ns}{key}", "count": c} for key, c in card_by_key.items()],
+        )
+        # records of a non summary exploration have no counts
+        lod = [{"p": f"{self.ns}{key}"} for key in card_by_key]
+        query_gen = QueryGen(self.prefixes)
+        planner = QueryPlanner(self.catalog, "osm")
+        plan = planner.plan(query_gen, lod, "rel", "osmrel:1")
+        if self.debug:
+            print(plan.summary)
+        self.assertEqual(1, plan.rows)
+        self.assertEqual(1 + 3 + 2 + 2 + 2, plan.values)
+        self.assertEqual(6 * 3 + 150 + 300, plan.cost)
+        self.assertEqual([plan.sparql_query], plan.sparql_queries)
+        self.assertIn("1 query", plan.summary)
+
+        planner = QueryPlanner(self.catalog, "osm", split_cost=200)
+        plan = planner.plan(query_gen, lod, "rel", "osmrel:1")
+        self.assertEqual(2, len(plan.sparql_queries))
+        graph = Graph()
+        rel = URIRef("https://www.openstreetmap.org/relation/1")
+        for key, card in card_by_key.items():
+            for i in range(card):
+                graph.add((rel, URIRef(f"{self.ns}{key}"), Literal(f"{key}{i}")))
+        lods = [
+            [row.asdict() for row in graph.query(sparql_query)]
+            for sparql_query in plan.sparql_queries
+        ]
+        records = plan.merge(lods)
+        self.assertEqual(1, len(records))
+        self.assertEqual(300, records[0]["way_count"].toPython())
+        self.assertEqual("ref0", str(records[0]["ref"]))
+
+        planner = QueryPlanner(self.catalog, "osm", split_cost=200, max_cost=250)
+        plan = planner.plan(query_gen, lod, "rel", "osmrel:1")
+        self.assertTrue(plan.refused)
+        self.assertEqual([], plan.sparql_queries)
+        self.assertIn("exceeds 250", plan.summary)
+
+    def test_merge(self):
+        """
+        test joining the parts of a split query on the main variable
+        """
+        plan = QueryPlan(sparql_query="", main_var="rel")
+        lods = [
+            [{"rel": "r1", "ref": "a"}, {"rel": "r2", "ref": "b"}],
+            # more rows than estimated for r1
+            [
+                {"rel": "r1", "name": "n1"},
+                {"rel": "r2", "name": "n3"},
+                {"rel": "r1", "name": "n2"},
+            ],
+            [{"rel": "r3", "way": "w"}],
+        ]
+        expected = [
+            {"rel": "r1", "ref": "a", "name": "n1"},
+            {"rel": "r1", "ref": "a", "name": "n2"},
+            {"rel": "r2", "ref": "b", "name": "n3"},
+            {"rel": "r3", "way": "w"},
+        ]
+        self.assertEqual(expected, plan.merge(lods))
+        self.assertEqual([], plan.merge([]))
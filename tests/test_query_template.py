@@ -0,0 +1,108 @@
+"""
+Created on 2026-10-18
+
+@author: wf
+"""
+
+from lodstorage.params import Params
+from ngwidgets.basetest import Basetest
+
+from velorail.npq import NPQ_Handler
+from velorail.query_template import QueryTemplate
+
+
+class TestQueryTemplate(Basetest):
+    """
+    test precompiled query templates
+    """
+
+    def setUp(self, debug=False, profile=True):
+        Basetest.setUp(self, debug=debug, profile=profile)
+        self.handler = NPQ_Handler("locations.yaml")
+
+    def test_same_as_params(self):
+        """
+        test that binding gives the same query as lodstorage Params
+        """
+        param_dict = {"south": 52.8, "west": "5.3", "north": 53, "east": 5.8}
+        template = self.handler.get_template(
+            self.handler.get_query("BikeNodes4Bounds").query,
+            "osm-qlever",
+            True,
+            "BikeNodes4Bounds",
+        )
+        expected = Params(template.sparql_query).apply_parameters_with_check(
+            param_dict
+        )
+        self.assertEqual(expected, template.bind(param_dict))
+        self.assertEqual(["south", "north", "west", "east"], template.param_names)
+        self.assertEqual(52.8349, template.defaults["south"])
+
+    def test_cached(self):
+        """
+        test that named queries are compiled once
+        """
+        query = self.handler.get_query("WikidataGeo").query
+        template1 = self.handler.get_template(query, "wikidata", True, "WikidataGeo")
+        template2 = NPQ_Handler("locations.yaml").get_template(
+            query, "wikidata", True, "WikidataGeo"
+        )
+        self.assertIs(template1, template2)
+        self.assertIsNot(
+            template1,
+            self.handler.get_template(query, "osm-qlever", True, "WikidataGeo"),
+        )
+        # ad hoc queries are not cached
+        adhoc = self.handler.get_template(query, "wikidata", True)
+        self.assertIsNot(template1, adhoc)
+        self.assertEqual(template1.sparql_query, adhoc.sparql_query)
+        _endpoint, _query, final_query = self.handler.prepare_query(
+            query, {}, "wikidata", True, "WikidataGeo"
+        )
+        self.assertIn("wd:Q300706", final_query)
+
+    def test_validation(self):
+        """
+        test validation of the bound values
+        """
+        template = self.handler.get_template(
+            self.handler.get_query("BikeNodes4Bounds").query,
+            "osm-qlever",
+            True,
+            "BikeNodes4Bounds",
+        )
+        for param_dict in [
+            {"south": "1 } ; DROP ALL"},
+            {"south": "north"},
+        ]:
+            with self.subTest(param_dict=param_dict):
+                with self.assertRaises(ValueError):
+                    template.bind(param_dict)
+        template = QueryTemplate("SELECT ?p WHERE { {{node}} ?p {{value}} }")
+        with self.assertRaises(Exception):
+            template.bind({})
+        with self.assertRaises(ValueError):
+            template.bind({"node": "wd:Q80"})
+        with self.assertRaises(ValueError):
+            template.bind({"node": "<http://example.org>", "value": 1})
+        self.assertEqual(
+            "SELECT ?p WHERE { wd:Q80 ?p 1 }",
+            template.bind({"node": "wd:Q80", "value": 1}),
+        )
+
+    def test_value_prefixes(self):
+        """
+        test that prefixes of bound prefixed names are declared
+        """
+        handler = NPQ_Handler("sparql-explore.yaml")
+        query = handler.get_query("ExploreFromSubject").query
+        template = handler.get_template(
+            query, "wikidata-qlever", True, "ExploreFromSubject"
+        )
+        self.assertNotIn("PREFIX wd:", template.sparql_query)
+        final_query = template.bind({"start_node": "wd:Q80"})
+        self.assertEqual(1, final_query.count("PREFIX wd:"))
+        self.assertEqual(1, final_query.count("PREFIX rdfs:"))
+        final_query = template.bind({"start_node": "rdfs:Class"})
+        self.assertEqual(1, final_query.count("PREFIX rdfs:"))
+        self.assertNotIn("PREFIX wd:", final_query)
@@ -7,6 +7,7 @@ Created on 2025-02-09
 import json
 
 from ngwidgets.basetest import Basetest
+from rdflib import Graph, Literal, URIRef
 
 from velorail.explore import Explorer, TriplePos
 from velorail.npq import NPQ_Handler
@@ -85,6 +86,50 @@ class TestQueryGen(Basetest):
                 expected = f"{prefix}:{prop}"
                 self.assertEqual(short_prop, expected)
 
+    def test_gen_shapes(self):
+        """
+        test that the query shape is chosen by the cardinality of the properties
+        and that the generated query returns a single row
+        """
+        osmkey = self.prefixes["osmkey"]
+        osmrel = URIRef(f"{self.prefixes['osmrel']}10492086")
+        card_by_key = {"ref": 1, "name": 3, "route": 2, "note": 0, "member": 150}
+        graph = Graph()
+        for key, card in card_by_key.items():
+            for i in range(card):
+                graph.add((osmrel, URIRef(f"{osmkey}{key}"), Literal(f"{key}{i}")))
+        lod = [
+            {"p": f"{osmkey}{key}", "count": card}
+            for key, card in card_by_key.items()
+        ]
+        query_gen = QueryGen(self.prefixes)
+        query_gen.max_join_rows = 4
+        sparql_query = query_gen.gen(lod, main_var="rel", main_value="osmrel:10492086")
+        if self.debug:
+            print(sparql_query)
+        self.assertIn("(SAMPLE(?ref_value) AS ?ref)", sparql_query)
+        self.assertIn(
+            '(GROUP_CONCAT(DISTINCT STR(?route_value); separator="|") AS ?route)',
+            sparql_query,
+        )
+        self.assertIn("(COUNT(?member_value) AS ?member_count)", sparql_query)
+        rows = list(graph.query(sparql_query))
+        self.assertEqual(1, len(rows))
+        record = rows[0].asdict()
+        self.assertEqual("ref0", str(record["ref"]))
+        self.assertEqual({"name0", "name1", "name2"}, set(record["name"].split("|")))
+        self.assertEqual({"route0", "route1"}, set(record["route"].split("|")))
+        self.assertNotIn("note", record)
+        self.assertEqual(150, record["member_count"].toPython())
+        # only single valued properties need no aggregation
+        sparql_query = query_gen.gen(
+            lod, main_var="rel", main_value="osmrel:10492086", max_cardinality=1
+        )
+        self.assertNotIn("\nGROUP BY", sparql_query)
+        self.assertIn("  #OPTIONAL {", sparql_query)
+        rows = list(graph.query(sparql_query))
+        self.assertEqual(1, len(rows))
+
     def testQueryGenSanitize(self):
         """
         Test QueryGen functions for correct prefix handling and variable sanitization.
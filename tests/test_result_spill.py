@@ -0,0 +1,210 @@
+"""
+Created on 2026-10-18
+
+@author: wf
+"""
+
+import asyncio
+import datetime
+import os
+import re
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from ngwidgets.basetest import Basetest
+
+from tests.sparql_test_server import SparqlTestServer
+from velorail.npq import NPQ_Handler
+from velorail.query_cache import QueryCache
+from velorail.result_spill import ResultBudget, SpilledLod
+from velorail.single_flight import SingleFlight
+
+
+class TestResultSpill(Basetest):
+    """
+    test spilling query results beyond the memory budget to disk
+    """
+
+    def setUp(self, debug=False, profile=True):
+        Basetest.setUp(self, debug=debug, profile=profile)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.lod = [
+            {"item": f"Q{i}", "count": i, "day": datetime.date(2025, 1, 1 + i % 28)}
+            for i in range(25)
+        ]
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+        Basetest.tearDown(self)
+
+    def test_spill(self):
+        """
+        test that spilled results behave like the list they replace
+        """
+        budget = ResultBudget(max_rows=10, spill_dir=self.tmpdir.name)
+        lod = budget.collect(iter(self.lod))
+        self.assertIsInstance(lod, SpilledLod)
+        self.assertEqual(10, len(lod.head))
+        self.assertEqual(15, lod.spilled)
+        self.assertFalse(lod.truncated)
+        self.assertEqual(self.lod, list(lod))
+        self.assertEqual(self.lod[8:13], lod[8:13])
+        self.assertEqual(self.lod[-1], lod[-1])
+        self.assertEqual(self.lod[::5], lod[::5])
+        with self.assertRaises(IndexError):
+            lod[25]
+        db_path = lod.db_path
+        self.assertTrue(os.path.exists(db_path))
+        lod.close()
+        self.assertFalse(os.path.exists(db_path))
+        # within the budget the result stays a plain list
+        self.assertEqual(self.lod, ResultBudget().collect(self.lod))
+
+    def test_byte_budget(self):
+        """
+        test spilling by size
+        """
+        record_size = ResultBudget.get_size(self.lod[0])
+        budget = ResultBudget(max_bytes=record_size * 3, spill_dir=self.tmpdir.name)
+        lod = budget.collect(self.lod)
+        self.assertLessEqual(len(lod.head), 3)
+        self.assertEqual(self.lod, list(lod))
+
+    def test_truncation(self):
+        """
+        test that the stream is closed when the total rows are exceeded
+        """
+        closed = []
+
+        def records():
+            try:
+                yield from self.lod
+            finally:
+                closed.append(True)
+
+        budget = ResultBudget(max_rows=5, max_total_rows=20, spill_dir=self.tmpdir.name)
+        lod = budget.collect(records())
+        self.assertTrue(lod.truncated)
+        self.assertEqual(20, len(lod))
+        self.assertEqual([True], closed)
+        # exactly max_total_rows rows are not truncated
+        lod = ResultBudget(max_total_rows=25).collect(self.lod)
+        self.assertEqual(self.lod, lod)
+
+    def test_paged_budget(self):
+        """
+        test that paged results beyond the budget stay spilled
+        """
+
+        def page_response(query, _headers):
+            limit = int(re.search(r"LIMIT (\d+)", query).group(1))
+            offset = int(re.search(r"OFFSET (\d+)", query).group(1))
+            lines = ["?item\t?itemLabel\t?lat\t?long"]
+            for i in range(offset, min(offset + limit, 45)):
+                lines.append(f'<http://example.org/Q{i}>\t"S{i}"\t{i}.5\t1.0')
+            body = ("\n".join(lines) + "\n").encode("utf-8")
+            return 200, {"Content-Type": "text/tab-separated-values"}, body
+
+        saved_budget = NPQ_Handler.result_budget
+        try:
+            NPQ_Handler.result_budget = ResultBudget(
+                max_rows=15, spill_dir=self.tmpdir.name
+            )
+            with SparqlTestServer(page_response) as server:
+                handler = NPQ_Handler("locations.yaml")
+                handler.endpoints["test"] = server.endpoint("test", database="qlever")
+                for lod in [
+                    handler.query_by_name_paged(
+                        "AllTrainStations", endpoint="test", page_size=10
+                    ),
+                    asyncio.run(
+                        handler.aquery_by_name_paged(
+                            "AllTrainStations", endpoint="test", page_size=10
+                        )
+                    ),
+                ]:
+                    self.assertIsInstance(lod, SpilledLod)
+                    self.assertEqual(15, len(lod.head))
+                    self.assertEqual(
+                        [i + 0.5 for i in range(45)], [record["lat"] for record in lod]
+                    )
+        finally:
+            NPQ_Handler.result_budget = saved_budget
+
+    def test_concurrent_paged_budget(self):
+        """
+        test identical concurrent paged queries sharing spilled pages
+        """
+
+        def page_response(query, _headers):
+            time.sleep(0.2)
+            limit = int(re.search(r"LIMIT (\d+)", query).group(1))
+            offset = int(re.search(r"OFFSET (\d+)", query).group(1))
+            lines = ["?item\t?itemLabel\t?lat\t?long"]
+            for i in range(offset, min(offset + limit, 45)):
+                lines.append(f'<http://example.org/Q{i}>\t"S{i}"\t{i}.5\t1.0')
+            body = ("\n".join(lines) + "\n").encode("utf-8")
+            return 200, {"Content-Type": "text/tab-separated-values"}, body
+
+        saved_budget = NPQ_Handler.result_budget
+        try:
+            NPQ_Handler.result_budget = ResultBudget(
+                max_rows=5, spill_dir=self.tmpdir.name
+            )
+            with SparqlTestServer(page_response) as server:
+                handler = NPQ_Handler("locations.yaml")
+                handler.endpoints["test"] = server.endpoint("test", database="qlever")
+
+                def query(_i):
+                    lod = handler.query_by_name_paged(
+                        "AllTrainStations", endpoint="test", page_size=20
+                    )
+                    return [record["lat"] for record in lod]
+
+                shared = SingleFlight.get_instance().stats()["shared"]
+                with ThreadPoolExecutor(max_workers=2) as executor:
+                    results = list(executor.map(query, range(2)))
+                # the pages were shared by both queries
+                shared = SingleFlight.get_instance().stats()["shared"] - shared
+                self.assertGreater(shared, 0)
+            expected = [i + 0.5 for i in range(45)]
+            self.assertEqual([expected, expected], results)
+        finally:
+            NPQ_Handler.result_budget = saved_budget
+
+    def test_query_budget(self):
+        """
+        test query results beyond the budget of the NPQ_Handler
+        """
+
+        def response(_query, _headers):
+            lines = ["?item\t?count"]
+            lines.extend(f"<http://example.org/Q{i}>\t{i}" for i in range(50))
+            body = ("\n".join(lines) + "\n").encode("utf-8")
+            return 200, {"Content-Type": "text/tab-separated-values"}, body
+
+        saved_budget = NPQ_Handler.result_budget
+        saved_cache = NPQ_Handler.query_cache
+        try:
+            NPQ_Handler.result_budget = ResultBudget(
+                max_rows=20, max_total_rows=40, spill_dir=self.tmpdir.name
+            )
+            NPQ_Handler.query_cache = QueryCache(Path(self.tmpdir.name) / "cache.db")
+            with SparqlTestServer(response) as server:
+                handler = NPQ_Handler("locations.yaml")
+                handler.endpoints["test"] = server.endpoint("test", database="qlever")
+                lod = handler.query("SELECT ?item ?count WHERE {}", endpoint="test")
+                self.assertIsInstance(lod, SpilledLod)
+                self.assertTrue(lod.truncated)
+                self.assertEqual(list(range(40)), [record["count"] for record in lod])
+                lod = asyncio.run(
+                    handler.aquery("SELECT ?item ?count WHERE {}", endpoint="test")
+                )
+                self.assertEqual(40, len(lod))
+                # spilled results are not cached
+                self.assertEqual(2, len(server.queries))
+        finally:
+            NPQ_Handler.result_budget = saved_budget
+            NPQ_Handler.query_cache = saved_cache
@@ -0,0 +1,139 @@
+"""
+Created on 2026-10-18
+
+@author: wf
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from ngwidgets.basetest import Basetest
+
+from tests.sparql_test_server import SparqlTestServer
+from velorail.npq import NPQ_Handler
+from velorail.single_flight import SingleFlight
+
+
+class TestSingleFlight(Basetest):
+    """
+    test the deduplication of concurrent identical queries
+    """
+
+    def setUp(self, debug=False, profile=True):
+        Basetest.setUp(self, debug=debug, profile=profile)
+
+    @staticmethod
+    def slow_response(query, headers):
+        time.sleep(0.3)
+        return SparqlTestServer.json_response(query, headers)
+
+    def test_threads(self):
+        """
+        test that concurrent threads share one request
+        """
+        with SparqlTestServer(self.slow_response) as server:
+            handler = NPQ_Handler("locations.yaml")
+            handler.endpoints["test"] = server.endpoint()
+
+            def query(qid: str):
+                lod = handler.query_by_name(
+                    "WikidataGeo", param_dict={"qid": qid}, endpoint="test"
+                )
+                return lod
+
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                qids = ["Q1"] * 6 + ["Q2"] * 2
+                lods = list(executor.map(query, qids))
+            self.assertEqual(2, len(server.queries))
+            for lod in lods:
+                self.assertEqual(42, lod[0]["count"])
+            # shared results are independent copies
+            lods[0][0]["count"] = 0
+            self.assertEqual(42, lods[1][0]["count"])
+
+    def test_tasks(self):
+        """
+        test that concurrent asyncio tasks share one request
+        """
+
+        async def run_queries(handler):
+            tasks = [
+                handler.aquery_by_name(
+                    "WikidataGeo", param_dict={"qid": "Q1"}, endpoint="test"
+                )
+                for _i in range(5)
+            ]
+            return await asyncio.gather(*tasks)
+
+        with SparqlTestServer(self.slow_response) as server:
+            handler = NPQ_Handler("locations.yaml")
+            handler.endpoints["test"] = server.endpoint()
+            lods = asyncio.run(run_queries(handler))
+            self.assertEqual(1, len(server.queries))
+            self.assertEqual(5, len(lods))
+
+    def test_copies(self):
+        """
+        test that every caller may modify its own copy of the result
+        """
+        flight = SingleFlight()
+
+        def fetch():
+            time.sleep(0.2)
+            return [{"qid": None, "count": 42}]
+
+        def call(i):
+            lod = flight.do("lod", fetch)
+            # e.g. to_wikidata_geo_item sets the qid of the first record
+            lod[0]["qid"] = f"Q{i}"
+            lod[0].pop("count")
+            df = flight.do("df", lambda: pd.DataFrame(fetch()))
+            df["qid"] = f"Q{i}"
+            return lod, df
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(call, range(4)))
+        self.assertEqual(2, flight.stats()["calls"])
+        for i, (lod, df) in enumerate(results):
+            self.assertEqual([{"qid": f"Q{i}"}], lod)
+            self.assertEqual([f"Q{i}"], df["qid"].tolist())
+            self.assertEqual([42], df["count"].tolist())
+
+        async def acall(i):
+            lod = await flight.ado("lod", afetch)
+            lod[0]["qid"] = f"Q{i}"
+            return lod
+
+        async def afetch():
+            await asyncio.sleep(0.1)
+            return fetch()
+
+        async def run_calls():
+            return await asyncio.gather(*[acall(i) for i in range(4)])
+
+        lods = asyncio.run(run_calls())
+        self.assertEqual([[{"qid": f"Q{i}", "count": 42}] for i in range(4)], lods)
+
+    def test_error(self):
+        """
+        test that an error is raised for all waiting callers
+        """
+        flight = SingleFlight()
+
+        def fail():
+            time.sleep(0.2)
+            raise ValueError("endpoint down")
+
+        def call():
+            try:
+                flight.do("key", fail)
+            except ValueError as ex:
+                return str(ex)
+
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            results = list(executor.map(lambda _i: call(), range(3)))
+        self.assertEqual(["endpoint down"] * 3, results)
+        self.assertEqual(1, flight.stats()["calls"])
+        self.assertEqual(0, flight.stats()["in_flight"])
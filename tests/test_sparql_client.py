@@ -0,0 +1,124 @@
+"""
+Created on 2026-10-18
+
+@author: wf
+"""
+
+import asyncio
+import threading
+import time
+
+from ngwidgets.basetest import Basetest
+
+from tests.sparql_test_server import SparqlTestServer
+from velorail.npq import NPQ_Handler
+from velorail.sparql_client import SparqlClientPool
+
+
+class TestSparqlClient(Basetest):
+    """
+    test the pooled keep-alive SPARQL client
+    """
+
+    def setUp(self, debug=False, profile=True):
+        Basetest.setUp(self, debug=debug, profile=profile)
+
+    def test_pooled_query(self):
+        """
+        test that repeated queries reuse the pooled connection
+        """
+        with SparqlTestServer() as server:
+            pool = SparqlClientPool(max_connections=2)
+            endpoint = server.endpoint()
+            for _i in range(5):
+                client = pool.get_client("test", endpoint)
+                lod = client.query("SELECT * WHERE { ?s ?p ?o }")
+                self.assertEqual(
+                    [{"label": "Gare de Biarritz", "count": 42, "lat": "43.4592"}],
+                    lod,
+                )
+            stats = pool.stats()["test"]
+            if self.debug:
+                print(stats)
+            self.assertEqual(5, stats["requests"])
+            self.assertEqual(1, stats["connections"])
+            self.assertEqual(4, stats["reused"])
+            self.assertEqual(1, stats["idle"])
+            self.assertEqual(0, stats["active"])
+
+    def test_replaced_clients(self):
+        """
+        test that clients replaced by a changed endpoint url are closed
+        """
+        with SparqlTestServer() as server, SparqlTestServer() as moved:
+            pool = SparqlClientPool()
+            client = pool.get_client("test", server.endpoint())
+            client.query("SELECT * WHERE { ?s ?p ?o }")
+            self.assertEqual(1, pool.stats()["test"]["idle"])
+            new_client = pool.get_client("test", moved.endpoint())
+            self.assertIsNot(client, new_client)
+            self.assertEqual(0, client.stats()["idle"])
+
+            async def replace():
+                async_client = pool.get_async_client("test", server.endpoint())
+                new_client = pool.get_async_client("test", moved.endpoint())
+                self.assertIsNot(async_client, new_client)
+                await asyncio.gather(*pool.closing)
+                return async_client
+
+            async_client = asyncio.run(replace())
+            self.assertTrue(async_client.client.is_closed)
+
+    def test_npq_handler(self):
+        """
+        test that NPQ_Handler applies parameters and uses the shared pool
+        """
+        with SparqlTestServer() as server:
+            handler = NPQ_Handler("locations.yaml")
+            handler.endpoints["test"] = server.endpoint()
+            lod = handler.query_by_name(
+                "WikidataGeo", param_dict={"qid": "Q1959795"}, endpoint="test"
+            )
+            self.assertEqual(1, len(lod))
+            self.assertIn("wd:Q1959795", server.queries[0])
+            client = SparqlClientPool.get_instance().clients["test"]
+            self.assertEqual(1, client.requests)
+
+    def test_aquery(self):
+        """
+        test concurrent async queries limited by the endpoint semaphore
+        """
+        lock = threading.Lock()
+        counts = {"active": 0, "max_active": 0}
+
+        def slow_response(query, headers):
+            with lock:
+                counts["active"] += 1
+                counts["max_active"] = max(counts["max_active"], counts["active"])
+            time.sleep(0.05)
+            with lock:
+                counts["active"] -= 1
+            return SparqlTestServer.json_response(query, headers)
+
+        async def run_queries(handler):
+            tasks = [
+                handler.aquery_by_name(
+                    "WikidataGeo", param_dict={"qid": f"Q{i}"}, endpoint="test"
+                )
+                for i in range(6)
+            ]
+            return await asyncio.gather(*tasks)
+
+        saved_pool = SparqlClientPool.instance
+        SparqlClientPool.instance = SparqlClientPool(max_concurrency=2)
+        try:
+            with SparqlTestServer(slow_response) as server:
+                handler = NPQ_Handler("locations.yaml")
+                handler.endpoints["test"] = server.endpoint()
+                results = asyncio.run(run_queries(handler))
+        finally:
+            SparqlClientPool.instance = saved_pool
+        self.assertEqual(6, len(results))
+        for lod in results:
+            self.assertEqual(42, lod[0]["count"])
+        self.assertLessEqual(counts["max_active"], 2)
@@ -0,0 +1,168 @@
+"""
+Created on 2026-10-18
+
+@author: wf
+"""
+
+import datetime
+import importlib.util
+import re
+import tempfile
+import unittest
+from pathlib import Path
+
+import pandas as pd
+from ngwidgets.basetest import Basetest
+
+from tests.sparql_test_server import SparqlTestServer
+from velorail.npq import NPQ_Handler
+from velorail.query_cache import QueryCache
+from velorail.sparql_client import SparqlClient
+from velorail.sparql_columns import SparqlColumnDecoder
+
+
+class TestSparqlColumns(Basetest):
+    """
+    test decoding SPARQL results into typed columns
+    """
+
+    def setUp(self, debug=False, profile=True):
+        Basetest.setUp(self, debug=debug, profile=profile)
+        xsd = "http://www.w3.org/2001/XMLSchema#"
+        self.tsv = (
+            "?item\t?label\t?count\t?lat\t?day\t?flag\t?when\n"
+            f'<http://www.wikidata.org/entity/Q1>\t"Gare de Biarritz"@fr\t42\t"43.4592"^^<{xsd}double>\t"2025-02-06"^^<{xsd}date>\ttrue\t"2025-02-06T10:00:00Z"^^<{xsd}dateTime>\n'
+            f'<http://www.wikidata.org/entity/Q2>\t\t"7"^^<{xsd}integer>\t1.5\t\t"false"^^<{xsd}boolean>\t"-13798000000-00-00T00:00:00Z"^^<{xsd}dateTime>\n'
+        )
+
+    def test_tsv_columns(self):
+        """
+        test the typed columns of a TSV result
+        """
+        decoder = SparqlColumnDecoder(SparqlClient.convert)
+        decoder.add_tsv(self.tsv)
+        df = decoder.to_df()
+        self.assertEqual(2, len(df))
+        self.assertEqual("float64", str(df["lat"].dtype))
+        self.assertEqual([43.4592, 1.5], df["lat"].tolist())
+        self.assertEqual("int64", str(df["count"].dtype))
+        self.assertEqual(datetime.date(2025, 2, 6), df["day"][0].date())
+        self.assertTrue(pd.isna(df["day"][1]))
+        self.assertEqual("bool", str(df["flag"].dtype))
+        self.assertEqual([True, False], df["flag"].tolist())
+        self.assertEqual("http://www.wikidata.org/entity/Q1", df["item"][0])
+        self.assertIsNone(df["label"][1])
+        # e.g. the big bang does not fit datetime64 - decoded one by one
+        self.assertEqual(object, df["when"].dtype)
+        self.assertEqual(2025, df["when"][0].year)
+
+    def test_missing_values(self):
+        """
+        test unbound values in numeric columns
+        """
+        xsd = "http://www.w3.org/2001/XMLSchema#"
+        json_result = {
+            "head": {"vars": ["count", "lat", "mixed"]},
+            "results": {
+                "bindings": [
+                    {
+                        "count": {
+                            "type": "literal",
+                            "value": "3",
+                            "datatype": f"{xsd}integer",
+                        },
+                        "mixed": {
+                            "type": "literal",
+                            "value": "1",
+                            "datatype": f"{xsd}integer",
+                        },
+                    },
+                    {
+                        "lat": {
+                            "type": "literal",
+                            "value": "1.25",
+                            "datatype": f"{xsd}double",
+                        },
+                        "mixed": {
+                            "type": "literal",
+                            "value": "2.5",
+                            "datatype": f"{xsd}decimal",
+                        },
+                    },
+                ]
+            },
+        }
+        decoder = SparqlColumnDecoder(SparqlClient.convert)
+        decoder.add_json(json_result)
+        df = decoder.to_df()
+        self.assertEqual("Int64", str(df["count"].dtype))
+        self.assertTrue(pd.isna(df["count"][1]))
+        self.assertEqual("float64", str(df["lat"].dtype))
+        self.assertTrue(pd.isna(df["lat"][0]))
+        self.assertEqual([1.0, 2.5], df["mixed"].tolist())
+        payload = SparqlColumnDecoder.to_payload(df)
+        restored = SparqlColumnDecoder.from_payload(payload)
+        pd.testing.assert_frame_equal(df, restored)
+
+    def page_response(self, query, _headers):
+        """
+        respond with the requested slice of 25 train stations as TSV
+        """
+        limit = int(re.search(r"LIMIT (\d+)", query).group(1))
+        offset = int(re.search(r"OFFSET (\d+)", query).group(1))
+        lines = ["?item\t?itemLabel\t?lat\t?long"]
+        for i in range(offset, min(offset + limit, 25)):
+            item = f"<http://www.wikidata.org/entity/Q{i}>"
+            lines.append(f'{item}\t"S{i}"\t{i}.5\t1.0E0')
+        body = ("\n".join(lines) + "\n").encode("utf-8")
+        return 200, {"Content-Type": "text/tab-separated-values"}, body
+
+    def test_query_df(self):
+        """
+        test typed DataFrames via the NPQ_Handler with and without cache
+        """
+        saved_cache = NPQ_Handler.query_cache
+        with tempfile.TemporaryDirectory() as tmpdir:
+            try:
+                NPQ_Handler.query_cache = QueryCache(Path(tmpdir) / "cache.db")
+                with SparqlTestServer() as server:
+                    handler = NPQ_Handler("locations.yaml")
+                    handler.endpoints["test"] = server.endpoint()
+                    for _i in range(2):
+                        df = handler.query_df(
+                            "SELECT ?label WHERE {}", endpoint="test"
+                        )
+                        self.assertEqual("int64", str(df["count"].dtype))
+                        self.assertEqual("float64", str(df["lat"].dtype))
+                        self.assertEqual(43.4592, df["lat"][0])
+                    # the second query is a cache hit
+                    self.assertEqual(1, len(server.queries))
+            finally:
+                NPQ_Handler.query_cache = saved_cache
+
+    def test_query_df_paged(self):
+        """
+        test stitching typed DataFrame pages
+        """
+        with SparqlTestServer(self.page_response) as server:
+            handler = NPQ_Handler("locations.yaml")
+            handler.endpoints["test"] = server.endpoint("test", database="qlever")
+            df = handler.query_df_by_name(
+                "AllTrainStations", endpoint="test", page_size=10, parallelism=2
+            )
+            self.assertEqual(25, len(df))
+            self.assertEqual("float64", str(df["lat"].dtype))
+            self.assertEqual([i + 0.5 for i in range(25)], df["lat"].tolist())
+            self.assertEqual(list(range(25)), df.index.tolist())
+
+    @unittest.skipUnless(importlib.util.find_spec("pyarrow"), "pyarrow not installed")
+    def test_query_arrow(self):
+        """
+        test the Arrow variant
+        """
+        with SparqlTestServer() as server:
+            handler = NPQ_Handler("locations.yaml")
+            handler.endpoints["test"] = server.endpoint()
+            table = handler.query_arrow("SELECT ?label WHERE {}", endpoint="test")
+            self.assertEqual("double", str(table.schema.field("lat").type))
+            self.assertEqual("int64", str(table.schema.field("count").type))
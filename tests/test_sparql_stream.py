@@ -0,0 +1,72 @@
+"""
+Created on 2026-10-18
+
+@author: wf
+"""
+
+import json
+
+from ngwidgets.basetest import Basetest
+
+from tests.sparql_test_server import SparqlTestServer
+from velorail.npq import NPQ_Handler
+from velorail.sparql_stream import SparqlJsonStream
+
+
+class TestSparqlStream(Basetest):
+    """
+    test streaming of SPARQL JSON results
+    """
+
+    def setUp(self, debug=False, profile=True):
+        Basetest.setUp(self, debug=debug, profile=profile)
+        xsd = "http://www.w3.org/2001/XMLSchema#"
+        self.lod = [
+            {
+                "label": (f"Zürich Hauptbahnhof {i} ⇄ [bindings]", None),
+                "count": (str(i), f"{xsd}integer"),
+            }
+            for i in range(50)
+        ]
+        self.body = SparqlTestServer.sparql_json(self.lod)
+
+    def test_chunked_parse(self):
+        """
+        test parsing with chunk boundaries at every possible position
+        """
+        expected = json.loads(self.body)["results"]["bindings"]
+        for chunk_size in (1, 2, 7, 64, len(self.body)):
+            with self.subTest(chunk_size=chunk_size):
+                chunks = [
+                    self.body[i : i + chunk_size]
+                    for i in range(0, len(self.body), chunk_size)
+                ]
+                bindings = list(SparqlJsonStream(chunks))
+                self.assertEqual(expected, bindings)
+
+    def test_empty_and_invalid(self):
+        """
+        test empty results and truncated documents
+        """
+        empty = b'{"head": {"vars": []}, "results": {"bindings": []}}'
+        self.assertEqual([], list(SparqlJsonStream([empty])))
+        with self.assertRaises(ValueError):
+            list(SparqlJsonStream([self.body[: len(self.body) // 2]]))
+
+    def test_iter_query(self):
+        """
+        test streaming rows from an endpoint
+        """
+
+        def response(_query, _headers):
+            return 200, {"Content-Type": "application/sparql-results+json"}, self.body
+
+        with SparqlTestServer(response) as server:
+            handler = NPQ_Handler("locations.yaml")
+            handler.endpoints["test"] = server.endpoint()
+            rows = handler.iter_query_by_name(
+                "WikidataGeo", param_dict={"qid": "Q1"}, endpoint="test"
+            )
+            chunks = list(SparqlJsonStream.iter_chunks(rows, chunk_size=20))
+            self.assertEqual([20, 20, 10], [len(chunk) for chunk in chunks])
+            self.assertEqual(49, chunks[-1][-1]["count"])
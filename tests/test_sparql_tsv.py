@@ -0,0 +1,134 @@
+"""
+Created on 2026-10-18
+
+@author: wf
+"""
+
+import asyncio
+import json
+
+from ngwidgets.basetest import Basetest
+
+from tests.sparql_test_server import SparqlTestServer
+from velorail.npq import NPQ_Handler
+from velorail.sparql_client import SparqlClient
+from velorail.sparql_tsv import SparqlTsvDecoder
+
+
+class TestSparqlTsv(Basetest):
+    """
+    test the TSV result format negotiation and decoding
+    """
+
+    def setUp(self, debug=False, profile=True):
+        Basetest.setUp(self, debug=debug, profile=profile)
+        xsd = "http://www.w3.org/2001/XMLSchema#"
+        self.tsv = (
+            "?item\t?label\t?count\t?lat\t?day\t?flag\n"
+            f'<http://www.wikidata.org/entity/Q1>\t"Gare \\"du\\" Nord\\tParis"@fr\t42\t"43.4592"^^<{xsd}double>\t"2025-02-06"^^<{xsd}date>\ttrue\n'
+            f'_:b0\t\t"7"^^<{xsd}integer>\t1.5\t\t"false"^^<{xsd}boolean>\n'
+        )
+        self.json = {
+            "head": {"vars": ["item", "label", "count", "lat", "day", "flag"]},
+            "results": {
+                "bindings": [
+                    {
+                        "item": {
+                            "type": "uri",
+                            "value": "http://www.wikidata.org/entity/Q1",
+                        },
+                        "label": {
+                            "type": "literal",
+                            "value": 'Gare "du" Nord\tParis',
+                            "xml:lang": "fr",
+                        },
+                        "count": {
+                            "type": "literal",
+                            "value": "42",
+                            "datatype": f"{xsd}integer",
+                        },
+                        "lat": {
+                            "type": "literal",
+                            "value": "43.4592",
+                            "datatype": f"{xsd}double",
+                        },
+                        "day": {
+                            "type": "literal",
+                            "value": "2025-02-06",
+                            "datatype": f"{xsd}date",
+                        },
+                        "flag": {
+                            "type": "literal",
+                            "value": "true",
+                            "datatype": f"{xsd}boolean",
+                        },
+                    },
+                    {
+                        "item": {"type": "bnode", "value": "b0"},
+                        "count": {
+                            "type": "literal",
+                            "value": "7",
+                            "datatype": f"{xsd}integer",
+                        },
+                        "lat": {
+                            "type": "literal",
+                            "value": "1.5",
+                            "datatype": f"{xsd}decimal",
+                        },
+                        "flag": {
+                            "type": "literal",
+                            "value": "false",
+                            "datatype": f"{xsd}boolean",
+                        },
+                    },
+                ]
+            },
+        }
+
+    def test_decode(self):
+        """
+        test that TSV decodes to the same values as SPARQL JSON
+        """
+        expected = SparqlClient.to_lod(self.json)
+        decoder = SparqlTsvDecoder(SparqlClient.convert)
+        self.assertEqual(expected, decoder.to_lod(self.tsv))
+        body = self.tsv.encode("utf-8")
+        chunks = [body[i : i + 5] for i in range(0, len(body), 5)]
+        rows = list(decoder.iter_records(decoder.iter_lines(chunks)))
+        self.assertEqual(expected, rows)
+
+    def test_negotiation(self):
+        """
+        test that qlever endpoints get TSV and others JSON
+        """
+
+        def response(_query, headers):
+            if "text/tab-separated-values" in headers.get("Accept", ""):
+                body = self.tsv.encode("utf-8")
+                content_type = "text/tab-separated-values; charset=UTF-8"
+            else:
+                body = json.dumps(self.json).encode("utf-8")
+                content_type = "application/sparql-results+json"
+            return 200, {"Content-Type": content_type}, body
+
+        expected = SparqlClient.to_lod(self.json)
+        with SparqlTestServer(response) as server:
+            handler = NPQ_Handler("locations.yaml")
+            handler.endpoints["qlever"] = server.endpoint("qlever", database="qlever")
+            handler.endpoints["blazegraph"] = server.endpoint("blazegraph")
+            for endpoint in ["qlever", "blazegraph"]:
+                with self.subTest(endpoint=endpoint):
+                    sparql_endpoint = handler.endpoints[endpoint]
+                    client = SparqlClient(sparql_endpoint)
+                    self.assertEqual(expected, client.query("SELECT ?item"))
+                    self.assertEqual(expected, list(client.iter_query("SELECT ?item")))
+                    df, _size = client.query_df("SELECT ?item")
+                    self.assertEqual([42, 7], df["count"].tolist())
+                    lod = asyncio.run(
+                        handler.aquery("SELECT ?item WHERE {}", endpoint=endpoint)
+                    )
+                    self.assertEqual(expected, lod)
+            self.assertIn(
+                "text/tab-separated-values",
+                SparqlClient.get_accept(handler.endpoints["osm-qlever"]),
+            )
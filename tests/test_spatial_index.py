@@ -0,0 +1,162 @@
+"""
+Created on 2026-10-18
+
+@author: wf
+"""
+
+import re
+import time
+
+import numpy as np
+from ngwidgets.basetest import Basetest
+
+from tests.sparql_test_server import SparqlTestServer
+from velorail.locfind import LocFinder
+from velorail.spatial_index import SpatialIndex
+
+
+class TestSpatialIndex(Basetest):
+    """
+    test radius and k-nearest queries of the spatial index
+    """
+
+    def setUp(self, debug=False, profile=True):
+        Basetest.setUp(self, debug=debug, profile=profile)
+        rng = np.random.default_rng(42)
+        self.lat = np.degrees(np.arcsin(rng.uniform(-1, 1, 20000)))
+        self.lon = rng.uniform(-180, 180, 20000)
+        self.lat[:5] = np.nan
+        self.index = SpatialIndex(self.lat, self.lon)
+
+    def brute_force(self, lat: float, lon: float) -> np.ndarray:
+        lat1, lon1 = np.radians(lat), np.radians(lon)
+        lat2, lon2 = np.radians(self.lat), np.radians(self.lon)
+        a = (
+            np.sin((lat2 - lat1) / 2) ** 2
+            + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+        )
+        distances = 2 * SpatialIndex.EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+        return distances
+
+    def test_radius(self):
+        """
+        test radius queries against brute force including the poles
+        and the antimeridian
+        """
+        self.assertEqual(19995, len(self.index))
+        for lat, lon, radius in [
+            (43.48, -1.56, 300),
+            (89.9, 10, 500),
+            (-60, 179.9, 800),
+            (10, -179.8, 250),
+            (0, 0, 25000),
+        ]:
+            positions, distances = self.index.query_radius(lat, lon, radius)
+            expected = self.brute_force(lat, lon)
+            within = np.flatnonzero(expected <= radius)
+            self.assertEqual(sorted(within.tolist()), sorted(positions.tolist()))
+            self.assertTrue(np.all(np.diff(distances) >= 0))
+            np.testing.assert_allclose(expected[positions], distances)
+
+    def test_knn(self):
+        """
+        test k-nearest queries against brute force
+        """
+        for lat, lon in [(48.14, 11.58), (-89, 0), (35, 180)]:
+            positions, distances = self.index.query_knn(lat, lon, 7)
+            expected = np.sort(self.brute_force(lat, lon))
+            np.testing.assert_allclose(expected[:7], distances)
+        positions, distances = self.index.query_knn(48.14, 11.58, 7, radius_km=1)
+        self.assertEqual(0, len(positions))
+        start_time = time.perf_counter()
+        for _i in range(100):
+            self.index.query_radius(48.14, 11.58, 50)
+        elapsed = (time.perf_counter() - start_time) / 100
+        if self.debug:
+            print(f"radius query: {elapsed*1000:.3f} ms")
+
+    def test_knn_batch(self):
+        """
+        test batch k-nearest queries against brute force
+        """
+        rng = np.random.default_rng(7)
+        lat = np.concatenate([rng.uniform(-90, 90, 300), [89.99, -90, np.nan]])
+        lon = np.concatenate([rng.uniform(-180, 180, 300), [179.99, 180, 0]])
+        for radius in [None, 300]:
+            positions, distances = self.index.query_knn_batch(
+                lat, lon, 4, radius_km=radius, chunk_size=64
+            )
+            self.assertEqual((303, 4), positions.shape)
+            for i in range(302):
+                expected = np.sort(self.brute_force(lat[i], lon[i]))[:4]
+                if radius is not None:
+                    expected = expected[expected <= radius]
+                found = len(expected)
+                np.testing.assert_allclose(expected, distances[i, :found])
+                self.assertTrue(np.all(positions[i, found:] == -1))
+                self.assertTrue(np.all(np.isinf(distances[i, found:])))
+            self.assertTrue(np.all(positions[302] == -1))
+        # the points of a track searched at once and one by one
+        track_lat = np.linspace(47.0, 48.5, 2000)
+        track_lon = np.linspace(7.5, 11.5, 2000)
+        start_time = time.perf_counter()
+        positions, distances = self.index.query_knn_batch(track_lat, track_lon, 3)
+        batch_time = time.perf_counter() - start_time
+        for i in range(0, 2000, 97):
+            single_positions, _ = self.index.query_knn(track_lat[i], track_lon[i], 3)
+            self.assertEqual(single_positions.tolist(), positions[i].tolist())
+        if self.debug:
+            print(f"batch of 2000 points: {batch_time*1000:.1f} ms")
+
+    def test_locfinder(self):
+        """
+        test the LocFinder station snapshot and its index
+        """
+
+        def response(query, _headers):
+            limit = int(re.search(r"LIMIT (\d+)", query).group(1))
+            offset = int(re.search(r"OFFSET (\d+)", query).group(1))
+            lines = ["?item\t?itemLabel\t?lat\t?long"]
+            for i in range(offset, min(offset + limit, 30)):
+                item = f"<http://www.wikidata.org/entity/Q{i}>"
+                lines.append(f'{item}\t"S{i}"\t{43 + i / 10}\t-1.5')
+            body = ("\n".join(lines) + "\n").encode("utf-8")
+            return 200, {"Content-Type": "text/tab-separated-values"}, body
+
+        saved = (LocFinder.stations, LocFinder.station_index)
+        saved_checked_at = LocFinder.stations_checked_at
+        try:
+            LocFinder.stations_checked_at = None
+            with SparqlTestServer(response) as server:
+                locfinder = LocFinder()
+                locfinder.endpoints["wikidata-qlever"] = server.endpoint(
+                    "wikidata-qlever", database="qlever"
+                )
+                df = locfinder.get_train_stations_by_coordinates(43.48, -1.5, 25)
+                labels = df["itemLabel"].tolist()
+                self.assertEqual(["S5", "S4", "S6"], labels[:3])
+                self.assertTrue(all(df["distance_km"] <= 25))
+                index = LocFinder.station_index
+                checked_at = LocFinder.stations_checked_at
+                df = locfinder.get_nearest_train_stations(45.04, -1.5, k=3)
+                self.assertEqual(["S20", "S21", "S19"], df["itemLabel"].tolist())
+                df = locfinder.get_nearest_train_stations_batch(
+                    np.array([43.02, 45.04, 10.0]),
+                    np.array([-1.5, -1.5, 10.0]),
+                    k=2,
+                    radius=100,
+                )
+                self.assertEqual([0, 0, 1, 1], df["point"].tolist())
+                self.assertEqual([0, 1, 0, 1], df["rank"].tolist())
+                self.assertEqual(["S0", "S1", "S20", "S21"], df["itemLabel"].tolist())
+                self.assertAlmostEqual(2.224, df["distance_km"][0], places=3)
+                # the snapshot is not refetched within station_max_age
+                self.assertEqual(checked_at, LocFinder.stations_checked_at)
+                # a refetched but unchanged snapshot keeps the index
+                LocFinder.stations_checked_at = None
+                locfinder.get_nearest_train_stations(45.0, -1.5, k=3)
+                self.assertIsNotNone(LocFinder.stations_checked_at)
+                self.assertIs(index, LocFinder.station_index)
+        finally:
+            LocFinder.stations, LocFinder.station_index = saved
+            LocFinder.stations_checked_at = saved_checked_at
@@ -0,0 +1,186 @@
+"""
+Created on 2026-10-18
+
+@author: wf
+"""
+
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from ngwidgets.basetest import Basetest
+
+from tests.sparql_test_server import SparqlTestServer
+from velorail.locfind import LocFinder
+from velorail.station_snapshot import StationSnapshot, StringColumn
+
+
+class TestStationSnapshot(Basetest):
+    """
+    test the memory mapped train station snapshot
+    """
+
+    def setUp(self, debug=False, profile=True):
+        Basetest.setUp(self, debug=debug, profile=profile)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.df = pd.DataFrame(
+            {
+                "item": [f"http://www.wikidata.org/entity/Q{i}" for i in range(4)],
+                "itemLabel": ["Gare de Biarritz", None, "München Hbf", "Zürich HB"],
+                "lat": [43.4592, 44.0, 48.1403, np.nan],
+                "long": [-1.5456, -1.0, 11.5600, 8.5402],
+            }
+        )
+        self.saved = (
+            LocFinder.station_snapshot_dir,
+            LocFinder.stations,
+            LocFinder.station_index,
+            LocFinder.stations_checked_at,
+        )
+
+    def tearDown(self):
+        (
+            LocFinder.station_snapshot_dir,
+            LocFinder.stations,
+            LocFinder.station_index,
+            LocFinder.stations_checked_at,
+        ) = self.saved
+        self.tmpdir.cleanup()
+        Basetest.tearDown(self)
+
+    def test_string_column(self):
+        """
+        test the utf-8 string column
+        """
+        values = ["München Hbf", None, "", "Zürich HB"]
+        column = StringColumn.from_strings(values)
+        self.assertEqual(4, len(column))
+        self.assertEqual(["München Hbf", None, None, "Zürich HB"], list(column))
+        self.assertEqual(["Zürich HB", "München Hbf"], column.take(np.array([3, 0])))
+        self.assertEqual("Zürich HB", column[-1])
+        with self.assertRaises(IndexError):
+            column[4]
+
+    def test_save_load(self):
+        """
+        test saving and memory mapped loading of snapshot versions
+        """
+        path = self.tmpdir.name
+        self.assertIsNone(StationSnapshot.load(path))
+        snapshot = StationSnapshot.from_df(self.df, "v1").save(path)
+        self.assertIsInstance(snapshot.lat, np.memmap)
+        self.assertIsInstance(snapshot.labels.data, np.memmap)
+        self.assertEqual(4, len(snapshot))
+        df = snapshot.to_df(np.array([2, 1]))
+        self.assertEqual("München Hbf", df["itemLabel"][2])
+        self.assertTrue(pd.isna(df["itemLabel"][1]))
+        self.assertEqual([2, 1], df.index.tolist())
+        pd.testing.assert_frame_equal(
+            self.df, snapshot.to_df(np.arange(4)), check_index_type=False
+        )
+        StationSnapshot.from_df(self.df.head(2), "v2").save(path)
+        loaded = StationSnapshot.load(path)
+        self.assertEqual("v2", loaded.version)
+        self.assertEqual(2, len(loaded))
+        # the old version is removed while its mapping stays readable
+        self.assertFalse((Path(path) / "v1").exists())
+        self.assertEqual("Zürich HB", snapshot.labels[3])
+
+    def test_concurrent_save(self):
+        """
+        test that concurrent writers of different versions never remove
+        the version current.json points to
+        """
+        path = self.tmpdir.name
+        snapshots = [
+            StationSnapshot.from_df(self.df.head(i % 3 + 1), f"v{i % 3}")
+            for i in range(24)
+        ]
+        with ThreadPoolExecutor(max_workers=6) as executor:
+            saved = list(executor.map(lambda snapshot: snapshot.save(path), snapshots))
+        self.assertTrue(all(snapshot is not None for snapshot in saved))
+        loaded = StationSnapshot.load(path)
+        self.assertIsNotNone(loaded)
+        versions = [p.name for p in Path(path).iterdir() if p.name.startswith("v")]
+        self.assertEqual([loaded.version], versions)
+        # a writer of an older version does not point back to it
+        snapshots[0].touch(path)
+        if loaded.version != snapshots[0].version:
+            self.assertEqual(loaded.version, StationSnapshot.load(path).version)
+
+    def test_locfinder(self):
+        """
+        test that a restarted LocFinder answers from the saved snapshot
+        """
+
+        def response(query, _headers):
+            limit = int(re.search(r"LIMIT (\d+)", query).group(1))
+            offset = int(re.search(r"OFFSET (\d+)", query).group(1))
+            lines = ["?item\t?itemLabel\t?lat\t?long"]
+            for i in range(offset, min(offset + limit, 20)):
+                item = f"<http://www.wikidata.org/entity/Q{i}>"
+                lines.append(f'{item}\t"S{i}"\t{43 + i / 10}\t-1.5')
+            body = ("\n".join(lines) + "\n").encode("utf-8")
+            return 200, {"Content-Type": "text/tab-separated-values"}, body
+
+        LocFinder.station_snapshot_dir = self.tmpdir.name
+        LocFinder.stations = None
+        LocFinder.stations_checked_at = None
+        with SparqlTestServer(response) as server:
+            locfinder = LocFinder()
+            locfinder.endpoints["wikidata-qlever"] = server.endpoint(
+                "wikidata-qlever", database="qlever"
+            )
+            df = locfinder.get_nearest_train_stations(43.52, -1.5, k=2)
+            self.assertEqual(["S5", "S6"], df["itemLabel"].tolist())
+            version = LocFinder.stations.version
+        # a restart opens the snapshot without querying
+        LocFinder.stations = None
+        LocFinder.stations_checked_at = None
+        start_time = time.perf_counter()
+        df = LocFinder().get_nearest_train_stations(43.52, -1.5, k=2)
+        elapsed = time.perf_counter() - start_time
+        self.assertEqual(["S5", "S6"], df["itemLabel"].tolist())
+        self.assertIsInstance(LocFinder.stations.lat, np.memmap)
+        self.assertEqual(version, LocFinder.stations.version)
+        if self.debug:
+            print(f"first query after restart: {elapsed*1000:.1f} ms")
+
+    def test_refresh(self):
+        """
+        test that readers keep using the current snapshot while it is refetched
+        """
+        started = threading.Event()
+
+        def response(query, _headers):
+            started.set()
+            time.sleep(0.5)
+            lines = ["?item\t?itemLabel\t?lat\t?long"]
+            if "OFFSET 0" in query:
+                lines.append('<http://www.wikidata.org/entity/Q1>\t"S1"\t43.5\t-1.5')
+            body = ("\n".join(lines) + "\n").encode("utf-8")
+            return 200, {"Content-Type": "text/tab-separated-values"}, body
+
+        LocFinder.station_snapshot_dir = None
+        LocFinder.set_stations(StationSnapshot.from_df(self.df, "v1"), None)
+        with SparqlTestServer(response) as server:
+            locfinder = LocFinder()
+            locfinder.endpoints["wikidata-qlever"] = server.endpoint(
+                "wikidata-qlever", database="qlever"
+            )
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                refresh = executor.submit(locfinder.get_station_index)
+                started.wait(5)
+                start_time = time.perf_counter()
+                stations, _index = locfinder.get_station_index()
+                elapsed = time.perf_counter() - start_time
+                self.assertEqual("v1", stations.version)
+                self.assertLess(elapsed, 0.25)
+                stations, _index = refresh.result()
+        self.assertEqual(1, len(stations))
+        self.assertIs(stations, LocFinder.stations)
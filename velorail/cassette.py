@@ -0,0 +1,218 @@
+"""
+Created on 2026-10-18
+
+@author: wf
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from velorail.query_cache import QueryCache
+from velorail.version import Version
+
+
+class Cassette:
+    """
+    record/replay of SPARQL query results for offline and
+    reproducible runs
+
+    each (endpoint, final query) pair is stored as an indented
+    JSON file in a directory that can be put under version control
+    """
+
+    format_version = 1
+    modes = ["record", "replay"]
+
+    def __init__(
+        self,
+        path: str,
+        mode: str = "replay",
+        latency: float = 0.0,
+        latency_factor: float = 0.0,
+    ):
+        """
+        constructor
+
+        Args:
+            path (str): the cassette directory
+            mode (str): "record" to store the live results or "replay" to serve them
+            latency (float): synthetic latency in seconds added when replaying
+            latency_factor (float): factor of the recorded latency added when replaying
+        """
+        if mode not in self.modes:
+            raise ValueError(f"invalid cassette mode {mode} - use one of {self.modes}")
+        self.path = Path(path)
+        self.mode = mode
+        self.latency = latency
+        self.latency_factor = latency_factor
+        self.lock = threading.Lock()
+        self.recorded = 0
+        self.replayed = 0
+        self.meta_path = self.path / "cassette.json"
+        if self.recording:
+            self.path.mkdir(parents=True, exist_ok=True)
+            if not self.meta_path.exists():
+                version = Version()
+                meta = {
+                    "format": self.format_version,
+                    "created_by": f"{version.name} {version.version}",
+                }
+                self.write_json(self.meta_path, meta)
+        self.check_format()
+
+    @classmethod
+    def from_env(cls) -> Optional["Cassette"]:
+        """
+        get the cassette configured by the VELORAIL_CASSETTE,
+        VELORAIL_CASSETTE_MODE and VELORAIL_CASSETTE_LATENCY
+        environment variables e.g. to run the test suite offline
+
+        Returns:
+            Cassette: the cassette or None if VELORAIL_CASSETTE is not set
+        """
+        path = os.environ.get("VELORAIL_CASSETTE")
+        cassette = None
+        if path:
+            cassette = cls(
+                path,
+                mode=os.environ.get("VELORAIL_CASSETTE_MODE", "replay"),
+                latency=float(os.environ.get("VELORAIL_CASSETTE_LATENCY", "0")),
+            )
+        return cassette
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def check_format(self):
+        """
+        check that my directory has the format version I can read
+        """
+        if not self.meta_path.exists():
+            raise ValueError(f"{self.path} is not a cassette directory")
+        with open(self.meta_path) as meta_file:
+            meta = json.load(meta_file)
+        if meta.get("format") != self.format_version:
+            raise ValueError(
+                f"cassette format {meta.get('format')} of {self.path} is not supported - expected {self.format_version}"
+            )
+
+    def get_path(self, endpoint: str, final_query: str) -> Path:
+        """
+        get the path of the recording for the given endpoint and query
+        """
+        digest = hashlib.sha256(f"{endpoint}\n{final_query}".encode("utf-8"))
+        path = self.path / endpoint / f"{digest.hexdigest()[:24]}.json"
+        return path
+
+    @staticmethod
+    def write_json(path: Path, record: dict):
+        """
+        write the given record atomically
+        """
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as json_file:
+            json.dump(
+                record,
+                json_file,
+                indent=2,
+                ensure_ascii=False,
+                default=QueryCache.encode_value,
+            )
+        os.replace(tmp_path, path)
+
+    def record(
+        self,
+        endpoint: str,
+        final_query: str,
+        lod: List[dict],
+        size: int,
+        seconds: float,
+        query_name: Optional[str] = None,
+    ):
+        """
+        record the given result
+
+        Args:
+            endpoint (str): name of the endpoint
+            final_query (str): the query with all parameters applied
+            lod (list): the result - or the payload of typed columns
+            size (int): the number of bytes received
+            seconds (float): the wall time of the live request
+            query_name (str): the name of the query if it is a named query
+        """
+        path = self.get_path(endpoint, final_query)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        record = {
+            "endpoint": endpoint,
+            "query_name": query_name,
+            "query": final_query,
+            "seconds": round(seconds, 6),
+            "size": size,
+            "lod": lod,
+        }
+        self.write_json(path, record)
+        with self.lock:
+            self.recorded += 1
+
+    def load(self, endpoint: str, final_query: str) -> Tuple[List[dict], int, float]:
+        """
+        load the recording for the given endpoint and query
+
+        Returns:
+            tuple: the result, the recorded size and the latency to simulate
+        """
+        path = self.get_path(endpoint, final_query)
+        if not path.exists():
+            raise ValueError(
+                f"no recording for {endpoint} in cassette {self.path}:\n{final_query}"
+            )
+        with open(path, encoding="utf-8") as json_file:
+            record = json.load(json_file, object_hook=QueryCache.decode_value)
+        with self.lock:
+            self.replayed += 1
+        latency = self.latency + self.latency_factor * record.get("seconds", 0)
+        return record["lod"], record.get("size", 0), latency
+
+    def play(self, endpoint: str, final_query: str) -> Tuple[List[dict], int]:
+        """
+        replay the recording for the given endpoint and query
+
+        Returns:
+            tuple: the result and the recorded number of bytes
+        """
+        lod, size, latency = self.load(endpoint, final_query)
+        if latency > 0:
+            time.sleep(latency)
+        return lod, size
+
+    async def aplay(self, endpoint: str, final_query: str) -> Tuple[List[dict], int]:
+        """
+        async version of play
+        """
+        lod, size, latency = self.load(endpoint, final_query)
+        if latency > 0:
+            await asyncio.sleep(latency)
+        return lod, size
+
+    def stats(self) -> dict:
+        """
+        get my statistics
+        """
+        stats = {
+            "path": str(self.path),
+            "mode": self.mode,
+            "recorded": self.recorded,
+            "replayed": self.replayed,
+        }
+        return stats
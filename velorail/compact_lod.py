@@ -0,0 +1,237 @@
+"""
+Created on 2026-10-18
+
+@author: wf
+"""
+
+from array import array
+from collections.abc import Sequence
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from velorail.prefix_index import PrefixIndex
+
+
+class CompactLod(Sequence):
+    """
+    compact read only list of dicts for large query results
+
+    the values are stored column wise - URIs as (namespace id, local part)
+    pairs with each namespace stored once, other values as they are - so
+    that there is neither a dict per row nor a full URI string per value;
+    equal local parts and strings of the rows added together are shared
+
+    rows are decoded on access and compare equal to the list of dicts
+    they were built from
+    """
+
+    # namespace ids of the values that are no URIs
+    PLAIN = -1
+    UNBOUND = -2
+    uri_schemes = ("http://", "https://")
+
+    def __init__(self, prefix_index: Optional[PrefixIndex] = None):
+        """
+        constructor
+
+        Args:
+            prefix_index (PrefixIndex): the known namespaces e.g. of the
+                endpoint - other URIs are split after their last / or #
+        """
+        self.prefix_index = prefix_index
+        self.namespaces: List[str] = []
+        self.namespace_ids: Dict[str, int] = {}
+        # namespace ids and values by variable name
+        self.columns: Dict[str, Tuple[array, list]] = {}
+        self.rows = 0
+
+    @classmethod
+    def from_lod(
+        cls, lod: Iterable[dict], prefix_index: Optional[PrefixIndex] = None
+    ) -> "CompactLod":
+        """
+        create a compact copy of the given list of dicts
+        """
+        compact_lod = cls(prefix_index)
+        compact_lod.extend(lod)
+        return compact_lod
+
+    @classmethod
+    def join(
+        cls, pages: Dict[int, Iterable[dict]], last_page: Optional[int]
+    ) -> "CompactLod":
+        """
+        stitch the given result pages together in order up to the given
+        last page - see QueryPager.join
+        """
+        compact_lod = None
+        for page in sorted(pages):
+            if last_page is not None and page > last_page:
+                break
+            lod = pages[page]
+            if compact_lod is None:
+                prefix_index = getattr(lod, "prefix_index", None)
+                compact_lod = cls(prefix_index)
+            compact_lod.extend(lod)
+        if compact_lod is None:
+            compact_lod = cls()
+        return compact_lod
+
+    def get_namespace_id(self, namespace: str) -> int:
+        """
+        get the id of the given namespace - registering it if new
+        """
+        namespace_id = self.namespace_ids.get(namespace)
+        if namespace_id is None:
+            namespace_id = len(self.namespaces)
+            self.namespaces.append(namespace)
+            self.namespace_ids[namespace] = namespace_id
+        return namespace_id
+
+    def split_uri(self, uri: str) -> Tuple[str, str]:
+        """
+        split the given URI into its namespace and local part
+        """
+        namespace = None
+        if self.prefix_index is not None:
+            qname = self.prefix_index.compact_uri(uri)
+            if qname is not None:
+                prefix, _sep, local_part = qname.partition(":")
+                namespace = self.prefix_index.prefixes[prefix]
+        if namespace is None:
+            pos = max(uri.rfind("/"), uri.rfind("#")) + 1
+            namespace, local_part = uri[:pos], uri[pos:]
+        return namespace, local_part
+
+    def encode(self, value, strings: Dict[str, str]) -> Tuple[int, object]:
+        """
+        encode the given value
+
+        Args:
+            value: the value to encode
+            strings (dict): the strings seen so far for sharing equal ones
+                - kept only while adding rows since most local parts
+                e.g. node ids are unique and a permanent table would
+                cost more than it saves
+
+        Returns:
+            tuple: the namespace id and the local part for URIs
+            else PLAIN and the value itself
+        """
+        namespace_id = self.PLAIN
+        if isinstance(value, str):
+            if value.startswith(self.uri_schemes):
+                namespace, value = self.split_uri(value)
+                namespace_id = self.get_namespace_id(namespace)
+            value = strings.setdefault(value, value)
+        return namespace_id, value
+
+    def get_column(self, var: str) -> Tuple[array, list]:
+        """
+        get the column of the given variable - adding it unbound
+        for all previous rows if new
+        """
+        column = self.columns.get(var)
+        if column is None:
+            column = (
+                array("i", [self.UNBOUND]) * self.rows,
+                [None] * self.rows,
+            )
+            self.columns[var] = column
+        return column
+
+    def append(self, record: dict, strings: Optional[Dict[str, str]] = None):
+        """
+        append the given row
+
+        Args:
+            record (dict): the row to append
+            strings (dict): the strings seen so far - see encode
+        """
+        if strings is None:
+            strings = {}
+        for var, value in record.items():
+            namespace_ids, values = self.get_column(var)
+            namespace_id, value = self.encode(value, strings)
+            namespace_ids.append(namespace_id)
+            values.append(value)
+        self.rows += 1
+        for namespace_ids, values in self.columns.values():
+            if len(values) < self.rows:
+                namespace_ids.append(self.UNBOUND)
+                values.append(None)
+
+    def extend(self, lod: Iterable[dict]):
+        """
+        append the given rows - compact ones without decoding them
+        """
+        if not isinstance(lod, CompactLod):
+            strings = {}
+            for record in lod:
+                self.append(record, strings)
+            return
+        id_map = [self.get_namespace_id(namespace) for namespace in lod.namespaces]
+        for var in lod.columns:
+            self.get_column(var)
+        for var, (namespace_ids, values) in self.columns.items():
+            column = lod.columns.get(var)
+            if column is None:
+                namespace_ids.extend(array("i", [self.UNBOUND]) * lod.rows)
+                values.extend([None] * lod.rows)
+            else:
+                namespace_ids.extend(
+                    id_map[ns_id] if ns_id >= 0 else ns_id for ns_id in column[0]
+                )
+                values.extend(column[1])
+        self.rows += lod.rows
+
+    def decode(self, namespace_id: int, value):
+        """
+        decode the given stored value
+        """
+        if namespace_id >= 0:
+            value = self.namespaces[namespace_id] + value
+        return value
+
+    def get_record(self, index: int) -> dict:
+        """
+        decode the row with the given index
+        """
+        record = {}
+        for var, (namespace_ids, values) in self.columns.items():
+            namespace_id = namespace_ids[index]
+            if namespace_id != self.UNBOUND:
+                record[var] = self.decode(namespace_id, values[index])
+        return record
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.get_record(i) for i in range(*index.indices(self.rows))]
+        if index < 0:
+            index += self.rows
+        if not 0 <= index < self.rows:
+            raise IndexError("CompactLod index out of range")
+        return self.get_record(index)
+
+    def __iter__(self) -> Iterator[dict]:
+        for index in range(self.rows):
+            yield self.get_record(index)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (CompactLod, list)):
+            return len(self) == len(other) and all(
+                record == other_record for record, other_record in zip(self, other)
+            )
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"CompactLod({self.rows} rows, {len(self.namespaces)} namespaces)"
+
+    def to_lod(self) -> List[dict]:
+        """
+        decode all rows to a plain list of dicts e.g. for JSON serialization
+        """
+        lod = list(self)
+        return lod
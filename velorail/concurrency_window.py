@@ -0,0 +1,226 @@
+"""
+Created on 2026-10-18
+
+@author: wf
+"""
+
+import asyncio
+import datetime
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Deque, Dict, Optional
+
+
+class Ticket:
+    """
+    a place in the queue of a ConcurrencyWindow
+    for a thread or an asyncio task
+    """
+
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.loop = loop
+        self.granted = False
+        if loop is None:
+            self.event = threading.Event()
+        else:
+            self.future = loop.create_future()
+
+    def wake(self):
+        """
+        wake up the waiting thread or task
+        """
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(self.resolve)
+
+    def resolve(self):
+        """
+        resolve my future in its event loop
+        """
+        if not self.future.done():
+            self.future.set_result(True)
+
+
+class ConcurrencyWindow:
+    """
+    additive increase / multiplicative decrease concurrency window
+    of a single endpoint shared by threads and asyncio tasks
+
+    the window grows by one slot per window of successful requests and
+    shrinks multiplicatively on timeouts and throttling responses -
+    a Retry-After header blocks new requests until the given time
+    waiting requests are granted slots in FIFO order
+    """
+
+    SUCCESS = "success"
+    THROTTLE = "throttle"
+    TIMEOUT = "timeout"
+    ERROR = "error"
+
+    def __init__(
+        self,
+        max_window: int = 4,
+        min_window: int = 1,
+        initial_window: Optional[float] = None,
+        decrease_factor: float = 0.5,
+        decrease_interval: float = 1.0,
+        max_retry_after: float = 300,
+    ):
+        """
+        constructor
+
+        Args:
+            max_window (int): the maximum number of concurrent requests
+            min_window (int): the minimum number of concurrent requests
+            initial_window (float): the start window - default: half of max_window
+            decrease_factor (float): the factor to shrink the window with
+            decrease_interval (float): minimum seconds between two decreases so
+                that a burst of failures of the same window shrinks it only once
+            max_retry_after (float): the maximum Retry-After time in seconds to honor
+        """
+        self.max_window = max_window
+        self.min_window = min_window
+        if initial_window is None:
+            initial_window = max(min_window, (max_window + 1) // 2)
+        self.window = float(initial_window)
+        self.decrease_factor = decrease_factor
+        self.decrease_interval = decrease_interval
+        self.max_retry_after = max_retry_after
+        self.lock = threading.Lock()
+        self.queue: Deque[Ticket] = deque()
+        self.active = 0
+        self.blocked_until = 0.0
+        self.last_decrease = 0.0
+        self.counts = {
+            self.SUCCESS: 0,
+            self.THROTTLE: 0,
+            self.TIMEOUT: 0,
+            self.ERROR: 0,
+        }
+
+    @staticmethod
+    def parse_retry_after(value: Optional[str]) -> Optional[float]:
+        """
+        parse the given Retry-After header value
+
+        Args:
+            value (str): delay seconds or an HTTP date
+
+        Returns:
+            float: the delay in seconds or None if not available
+        """
+        if not value:
+            return None
+        value = value.strip()
+        if value.isdigit():
+            return float(value)
+        try:
+            retry_time = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        now = datetime.datetime.now(tz=retry_time.tzinfo or datetime.timezone.utc)
+        return max(0.0, (retry_time - now).total_seconds())
+
+    def blocked_for(self) -> float:
+        """
+        get the number of seconds new requests are blocked by a Retry-After
+        """
+        return max(0.0, self.blocked_until - time.monotonic())
+
+    def dispatch(self):
+        """
+        grant free slots to the waiting tickets in order - the lock must be held
+        """
+        if self.blocked_for() > 0:
+            return
+        while self.queue and self.active < int(self.window):
+            ticket = self.queue.popleft()
+            ticket.granted = True
+            self.active += 1
+            ticket.wake()
+
+    def acquire(self):
+        """
+        wait for a slot in the window
+        """
+        ticket = Ticket()
+        with self.lock:
+            self.queue.append(ticket)
+            self.dispatch()
+        while not ticket.granted:
+            ticket.event.wait(timeout=self.blocked_for() or None)
+            with self.lock:
+                self.dispatch()
+
+    async def aacquire(self):
+        """
+        wait for a slot in the window without blocking the event loop
+        """
+        ticket = Ticket(asyncio.get_running_loop())
+        with self.lock:
+            self.queue.append(ticket)
+            self.dispatch()
+        try:
+            while not ticket.granted:
+                try:
+                    await asyncio.wait_for(
+                        asyncio.shield(ticket.future),
+                        timeout=self.blocked_for() or None,
+                    )
+                except asyncio.TimeoutError:
+                    pass
+                with self.lock:
+                    self.dispatch()
+        except asyncio.CancelledError:
+            with self.lock:
+                if ticket.granted:
+                    self.active -= 1
+                    self.dispatch()
+                else:
+                    self.queue.remove(ticket)
+            raise
+
+    def release(self, outcome: str, retry_after: Optional[float] = None):
+        """
+        release a slot and adapt the window to the outcome of the request
+
+        Args:
+            outcome (str): SUCCESS, THROTTLE, TIMEOUT or ERROR
+            retry_after (float): the Retry-After delay in seconds if any
+        """
+        now = time.monotonic()
+        with self.lock:
+            self.active -= 1
+            self.counts[outcome] = self.counts.get(outcome, 0) + 1
+            if outcome == self.SUCCESS:
+                self.window = min(self.max_window, self.window + 1 / self.window)
+            elif outcome in (self.THROTTLE, self.TIMEOUT):
+                if now - self.last_decrease >= self.decrease_interval:
+                    self.window = max(
+                        self.min_window, self.window * self.decrease_factor
+                    )
+                    self.last_decrease = now
+            if retry_after:
+                retry_after = min(retry_after, self.max_retry_after)
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+            self.dispatch()
+
+    def stats(self) -> Dict[str, float]:
+        """
+        get the window state for monitoring
+        """
+        with self.lock:
+            stats = {
+                "window": round(self.window, 3),
+                "limit": int(self.window),
+                "min_window": self.min_window,
+                "max_window": self.max_window,
+                "active": self.active,
+                "waiting": len(self.queue),
+                "blocked_for": round(self.blocked_for(), 3),
+            }
+            stats.update(self.counts)
+        return stats
@@ -0,0 +1,332 @@
+"""
+Created on 2026-10-18
+
+@author: wf
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, Mapping, Optional, Sequence
+
+from lodstorage.query import Endpoint
+
+from velorail.sparql_client import SparqlClient, SparqlHttpError
+
+
+class EndpointUnavailableError(Exception):
+    """
+    all endpoints a query could be routed to have an open circuit
+    """
+
+
+@dataclass
+class EndpointState:
+    """
+    the health of a single endpoint
+    """
+
+    state: str = "closed"
+    # smoothed probe latency in seconds - None if not probed yet
+    latency: Optional[float] = None
+    # consecutive failures of queries and probes
+    failures: int = 0
+    # time the circuit was opened or the trial request was let pass
+    opened_at: float = 0.0
+    probes: int = 0
+    probe_failures: int = 0
+    opened: int = 0
+    last_error: Optional[str] = None
+
+
+class EndpointHealth:
+    """
+    availability and latency of the SPARQL endpoints with a circuit
+    breaker per endpoint
+
+    a circuit opens after failure_threshold consecutive failures and
+    lets a single trial request pass after reset_timeout - its success
+    closes the circuit again, its failure keeps it open for another
+    reset_timeout
+
+    the latency used for routing is the smoothed latency of the probes
+    since the same probe query is comparable across endpoints while the
+    latency of the queries depends on the query
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+    instance = None
+
+    def __init__(
+        self,
+        failure_threshold: int = 3,
+        reset_timeout: float = 30.0,
+        alpha: float = 0.3,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        constructor
+
+        Args:
+            failure_threshold (int): consecutive failures to open the circuit
+            reset_timeout (float): seconds until an open circuit allows a trial
+            alpha (float): weight of the latest probe latency
+            clock (Callable): the monotonic time function e.g. for tests
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.alpha = alpha
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.states: Dict[str, EndpointState] = {}
+
+    @classmethod
+    def get_instance(cls) -> "EndpointHealth":
+        """
+        get the shared endpoint health
+        """
+        if cls.instance is None:
+            cls.instance = cls()
+        return cls.instance
+
+    @classmethod
+    def is_failure(cls, ex: Exception) -> bool:
+        """
+        check whether the given exception means the endpoint is unhealthy
+        - client errors e.g. a syntax error of the query do not count
+        """
+        if isinstance(ex, SparqlHttpError):
+            failure = ex.status_code >= 500 or ex.status_code == 429
+        else:
+            failure = True
+        return failure
+
+    def get_state(self, endpoint: str) -> EndpointState:
+        """
+        get the state of the given endpoint - the lock must be held
+        """
+        state = self.states.get(endpoint)
+        if state is None:
+            state = EndpointState()
+            self.states[endpoint] = state
+        return state
+
+    def record_success(
+        self, endpoint: str, seconds: Optional[float] = None, probe: bool = False
+    ):
+        """
+        record a successful query or probe of the given endpoint
+
+        Args:
+            endpoint (str): the name of the endpoint
+            seconds (float): the latency of a probe
+            probe (bool): True if this is the outcome of a probe
+        """
+        with self.lock:
+            state = self.get_state(endpoint)
+            state.failures = 0
+            state.state = self.CLOSED
+            if probe:
+                state.probes += 1
+                if seconds is not None:
+                    if state.latency is None:
+                        state.latency = seconds
+                    else:
+                        state.latency += self.alpha * (seconds - state.latency)
+
+    def record_failure(self, endpoint: str, error: str = "", probe: bool = False):
+        """
+        record a failed query or probe of the given endpoint
+
+        Args:
+            endpoint (str): the name of the endpoint
+            error (str): the error message
+            probe (bool): True if this is the outcome of a probe
+        """
+        with self.lock:
+            state = self.get_state(endpoint)
+            state.failures += 1
+            state.last_error = error
+            if probe:
+                state.probes += 1
+                state.probe_failures += 1
+            if state.state == self.HALF_OPEN or (
+                state.state == self.CLOSED
+                and state.failures >= self.failure_threshold
+            ):
+                state.state = self.OPEN
+                state.opened_at = self.clock()
+                state.opened += 1
+
+    def is_available(self, endpoint: str, reserve: bool = False) -> bool:
+        """
+        check whether requests may be sent to the given endpoint
+
+        Args:
+            endpoint (str): the name of the endpoint
+            reserve (bool): if True half-open a circuit that allows a trial
+                so that no other request gets it
+
+        Returns:
+            bool: True if the circuit is closed or a trial may be sent
+        """
+        with self.lock:
+            state = self.get_state(endpoint)
+            return self.check_state(state, reserve)
+
+    def check_state(self, state: EndpointState, reserve: bool) -> bool:
+        """
+        check the given state - the lock must be held
+        """
+        available = state.state == self.CLOSED
+        if not available:
+            # open circuits and trials without outcome e.g. because the
+            # query was answered from the cache allow a trial after reset_timeout
+            available = self.clock() - state.opened_at >= self.reset_timeout
+            if available and reserve:
+                state.state = self.HALF_OPEN
+                state.opened_at = self.clock()
+        return available
+
+    def choose(self, endpoints: Sequence[str]) -> Optional[str]:
+        """
+        choose the fastest available of the given equivalent endpoints
+
+        Args:
+            endpoints (Sequence): the endpoint names in order of preference
+                - the order decides between endpoints without probe latency
+
+        Returns:
+            str: the chosen endpoint or None if all circuits are open
+        """
+        with self.lock:
+            states = [self.get_state(name) for name in endpoints]
+            order = sorted(
+                range(len(states)),
+                key=lambda i: (states[i].latency is None, states[i].latency or 0.0, i),
+            )
+            for i in order:
+                if self.check_state(states[i], reserve=True):
+                    return endpoints[i]
+        return None
+
+    def stats(self) -> Dict[str, dict]:
+        """
+        get the health of all endpoints
+        """
+        with self.lock:
+            stats = {
+                name: {
+                    "state": state.state,
+                    "latency": state.latency,
+                    "failures": state.failures,
+                    "opened": state.opened,
+                    "probes": state.probes,
+                    "probe_failures": state.probe_failures,
+                    "last_error": state.last_error,
+                }
+                for name, state in self.states.items()
+            }
+        return stats
+
+
+class HealthProber:
+    """
+    background thread probing the availability and latency of endpoints
+    """
+
+    probe_query = "SELECT ?s WHERE { ?s ?p ?o } LIMIT 1"
+
+    def __init__(
+        self,
+        endpoints: Mapping[str, Endpoint],
+        health: Optional[EndpointHealth] = None,
+        interval: float = 60.0,
+        timeout: float = 10.0,
+    ):
+        """
+        constructor
+
+        Args:
+            endpoints (Mapping): the endpoint configurations by name
+            health (EndpointHealth): the health to update - default: the shared one
+            interval (float): seconds between probe rounds
+            timeout (float): probe request timeout in seconds
+        """
+        self.endpoints = dict(endpoints)
+        self.health = health or EndpointHealth.get_instance()
+        self.interval = interval
+        self.timeout = timeout
+        # own clients so that probes neither wait for nor shrink
+        # the concurrency window of the queries
+        self.clients: Dict[str, SparqlClient] = {}
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def probe(self, endpoint_name: str) -> bool:
+        """
+        probe the given endpoint and record the outcome
+
+        Returns:
+            bool: True if the endpoint answered
+        """
+        client = self.clients.get(endpoint_name)
+        if client is None:
+            client = SparqlClient(
+                self.endpoints[endpoint_name], max_connections=1, timeout=self.timeout
+            )
+            self.clients[endpoint_name] = client
+        start_time = time.monotonic()
+        try:
+            client.query(self.probe_query)
+        except Exception as ex:
+            self.health.record_failure(endpoint_name, str(ex)[:200], probe=True)
+            return False
+        elapsed = time.monotonic() - start_time
+        self.health.record_success(endpoint_name, elapsed, probe=True)
+        return True
+
+    def probe_all(self) -> Dict[str, bool]:
+        """
+        probe all endpoints concurrently
+
+        Returns:
+            dict: the probe outcome by endpoint name
+        """
+        names = list(self.endpoints)
+        with ThreadPoolExecutor(
+            max_workers=max(1, len(names)), thread_name_prefix="probe"
+        ) as executor:
+            outcomes = dict(zip(names, executor.map(self.probe, names)))
+        return outcomes
+
+    def run(self):
+        """
+        probe all endpoints every interval seconds until stopped
+        """
+        while not self.stop_event.is_set():
+            self.probe_all()
+            self.stop_event.wait(self.interval)
+
+    def start(self):
+        """
+        start probing in a daemon thread
+        """
+        if self.thread is None:
+            self.stop_event.clear()
+            self.thread = threading.Thread(
+                target=self.run, name="health-prober", daemon=True
+            )
+            self.thread.start()
+
+    def stop(self):
+        """
+        stop probing
+        """
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=self.timeout)
+            self.thread = None
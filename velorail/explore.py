@@ -13,6 +13,8 @@ from ez_wikidata.wdproperty import WikidataProperty, WikidataPropertyManager
 from ngwidgets.widgets import Link
 
 from velorail.npq import NPQ_Handler
+from velorail.predicate_catalog import PredicateCatalog
+from velorail.query_planner import QueryPlanner
 
 
 class TriplePos(Enum):
@@ -45,6 +47,10 @@ class Explorer(NPQ_Handler):
     A SPARQL explorer that allows traversing RDF graphs starting from any node
     """
 
+    pid_pattern = re.compile(r"P\d+")
+    # optional predicate statistics gathered from the summaries - see QueryPlanner
+    predicate_catalog: Optional[PredicateCatalog] = None
+
     def __init__(self, endpoint_name: str):
         """
         Initialize the explorer with a SPARQL endpoint
@@ -54,6 +60,7 @@ class Explorer(NPQ_Handler):
         """
         super().__init__("sparql-explore.yaml")
         self.endpoint_name = endpoint_name
+        self.prefix_index = self.get_prefix_index(endpoint_name)
         self.wpm = WikidataPropertyManager.get_instance()
 
     def get_prop(self, value: str) -> WikidataProperty:
@@ -68,12 +75,14 @@ class Explorer(NPQ_Handler):
         """
         prop = None
         if "wikidata" in self.endpoint_name and self.wpm:
-            prop_pattern = r"P(\d+)"
+            match = self.pid_pattern.match(value)
             # Only try to extract pid if it's a property URI or matches P-number pattern
-            if "www.wikidata.org/prop" in value or re.match(prop_pattern, value):
-                pid = re.sub(f".*{prop_pattern}.*", r"P\1", value)
-                if pid:
-                    prop = self.wpm.get_property_by_id(pid)
+            if not match and "www.wikidata.org/prop" in value:
+                # e.g. wdt:P31 - the local name of the longest matching namespace
+                qname = self.prefix_index.compact_uri(value) or value
+                match = self.pid_pattern.search(qname)
+            if match:
+                prop = self.wpm.get_property_by_id(match.group(0))
         return prop
 
     def get_view_record(self, record: dict, index: int) -> dict:
@@ -98,11 +107,46 @@ class Explorer(NPQ_Handler):
                     )
                     continue
                 if value.startswith("http"):
-                    view_record[key] = Link.create(value, value)
+                    text = self.prefix_index.compact_uri(value) or value
+                    view_record[key] = Link.create(value, text)
             else:
                 view_record[key] = value
         return view_record
 
+    def compact_records(self, lod: list) -> list:
+        """
+        get a copy of the given records with their URI values
+        compacted to prefixed names of the endpoint where possible
+
+        Args:
+            lod (list): the query result records
+
+        Returns:
+            list: the compacted records
+        """
+        uris = list(
+            {
+                value
+                for record in lod
+                for value in record.values()
+                if isinstance(value, str) and value.startswith("http")
+            }
+        )
+        qnames = {
+            uri: qname
+            for uri, qname in zip(uris, self.prefix_index.compact(uris))
+            if qname is not None
+        }
+        compacted = []
+        for record in lod:
+            compacted_record = {}
+            for key, value in record.items():
+                if isinstance(value, str):
+                    value = qnames.get(value, value)
+                compacted_record[key] = value
+            compacted.append(compacted_record)
+        return compacted
+
     def get_node(self, node_id: str, prefix: str) -> Node:
         """
         Resolve a node URI using stored prefixes.
@@ -114,12 +158,8 @@ class Explorer(NPQ_Handler):
         Returns:
             Node: Constructed node with resolved URI.
         """
-        endpoint_prefix_dict = self.endpoint_prefixes.get(self.endpoint_name, {})
-
-        if prefix in endpoint_prefix_dict:
-            base_uri = endpoint_prefix_dict[prefix]
-            uri = f"{base_uri}{node_id}"
-        else:
+        uri = self.prefix_index.expand_qname(f"{prefix}:{node_id}")
+        if uri is None:
             raise ValueError(
                 f"Prefix '{prefix}' not found in endpoint '{self.endpoint_name}'"
             )
@@ -131,19 +171,16 @@ class Explorer(NPQ_Handler):
         )
         return node
 
-    def explore_node(
-        self, node: Node, triple_pos: TriplePos, summary: bool = False
-    ) -> str:
+    def get_explore_query_name(self, triple_pos: TriplePos, summary: bool) -> str:
         """
-        Get the appropriate exploration query based on node type
+        Get the name of the exploration query for the given triple position
 
         Args:
-            node: The node to explore from
             triple_pos: The triple position
             summary: show a summary with counts
 
         Returns:
-            Query result from the appropriate SPARQL query
+            str: the query name
         """
         query_map = {
             TriplePos.SUBJECT: (
@@ -158,10 +195,76 @@ class Explorer(NPQ_Handler):
         }
 
         query_name = query_map[triple_pos]
+        return query_name
+
+    def explore_node(
+        self, node: Node, triple_pos: TriplePos, summary: bool = False
+    ) -> str:
+        """
+        Get the appropriate exploration query based on node type
 
+        Args:
+            node: The node to explore from
+            triple_pos: The triple position
+            summary: show a summary with counts
+
+        Returns:
+            Query result from the appropriate SPARQL query
+        """
+        query_name = self.get_explore_query_name(triple_pos, summary)
         param_dict = {"start_node": node.qualified_name}
 
         lod = self.query_by_name(
             query_name=query_name, param_dict=param_dict, endpoint=self.endpoint_name
         )
+        if summary:
+            self.observe_summary(node, triple_pos, lod)
+        return lod
+
+    async def aexplore_node(
+        self, node: Node, triple_pos: TriplePos, summary: bool = False
+    ) -> list:
+        """
+        Explore the given node without blocking the event loop
+
+        Args:
+            node: The node to explore from
+            triple_pos: The triple position
+            summary: show a summary with counts
+
+        Returns:
+            Query result from the appropriate SPARQL query
+        """
+        query_name = self.get_explore_query_name(triple_pos, summary)
+        param_dict = {"start_node": node.qualified_name}
+
+        lod = await self.aquery_by_name(
+            query_name=query_name, param_dict=param_dict, endpoint=self.endpoint_name
+        )
+        if summary:
+            self.observe_summary(node, triple_pos, lod)
         return lod
+
+    def observe_summary(self, node: Node, triple_pos: TriplePos, lod: list):
+        """
+        add the given summary exploration result to the predicate catalog
+
+        Args:
+            node: The explored node
+            triple_pos: The triple position
+            lod: the summary records with their counts
+        """
+        if self.predicate_catalog is not None and node.uri:
+            self.predicate_catalog.observe_summary(
+                self.endpoint_name, node.uri, triple_pos.value, lod
+            )
+
+    def get_planner(self) -> QueryPlanner:
+        """
+        get a planner for the generated queries of my endpoint
+
+        Returns:
+            QueryPlanner: the planner using the predicate catalog
+        """
+        planner = QueryPlanner(self.predicate_catalog, self.endpoint_name)
+        return planner
@@ -4,12 +4,15 @@ Created on 2025-06-02
 @author: wf
 """
 
+import asyncio
+
 from ngwidgets.lod_grid import GridConfig, ListOfDictsGrid
 from ngwidgets.webserver import WebSolution
 from nicegui import ui
 
 from velorail.explore import Explorer, TriplePos
 from velorail.querygen import QueryGen
+from velorail.result_spill import SpilledLod
 from ngwidgets.task_runner import TaskRunner
 
 
@@ -33,6 +36,7 @@ class ExplorerView:
         self.result_row = None
         self.lod_grid = None
         self.node_id = None
+        self.query_plan = None
         self.task_runner=TaskRunner()
 
 
@@ -46,11 +50,19 @@ class ExplorerView:
                     ui.notify("Please select at least one row")
                     return
             prefixes = self.explorer.endpoint_prefixes.get(self.endpoint_name)
-            query_gen = QueryGen(prefixes, debug=self.args.debug)
-            sparql_query = query_gen.gen(
-                lod, main_var="item", main_value=f"{self.prefix}:{self.node_id}"
+            query_gen = QueryGen(
+                prefixes,
+                debug=self.args.debug,
+                prefix_index=self.explorer.prefix_index,
+            )
+            self.query_plan = self.explorer.get_planner().plan(
+                query_gen,
+                lod,
+                main_var="item",
+                main_value=f"{self.prefix}:{self.node_id}",
             )
-            self.query_code.content = sparql_query
+            self.query_code.content = self.query_plan.sparql_query
+            self.plan_info.content = self.query_plan.summary
         except Exception as ex:
             self.solution.handle_exception(ex)
 
@@ -66,10 +78,29 @@ class ExplorerView:
 
             sparql_query = self.query_code.content.strip()
 
-            # Execute the query
-            lod = self.explorer.query(
-                sparql_query=sparql_query, param_dict={}, endpoint=self.endpoint_name
-            )
+            # Execute the query - as planned if it has not been edited
+            plan = self.query_plan
+            if plan is not None and plan.sparql_query.strip() == sparql_query:
+                if plan.refused:
+                    with self.result_row:
+                        ui.notify(f"Query {plan.summary}")
+                    return
+                lods = await asyncio.gather(
+                    *[
+                        self.explorer.aquery(
+                            sparql_query=planned_query,
+                            param_dict={},
+                            endpoint=self.endpoint_name,
+                        )
+                        for planned_query in plan.sparql_queries
+                    ]
+                )
+                lod = plan.merge(lods)
+            else:
+                self.plan_info.content = "no estimate for the edited query"
+                lod = await self.explorer.aquery(
+                    sparql_query=sparql_query, param_dict={}, endpoint=self.endpoint_name
+                )
 
             # Ensure only one record is expected
             if not lod:
@@ -161,6 +192,7 @@ WHERE {
                     self.result_row = ui.row().classes("w-full")
             with splitter.after:
                 ui.button("run", icon="run", on_click=self.on_run_query)
+                self.plan_info = ui.html("")
                 self.query_code = (
                     ui.code(content=self.get_default_query(), language="SPARQL")
                     .classes("w-full")
@@ -189,7 +221,7 @@ WHERE {
                     f"Exploring {start_node.qualified_name} on {self.endpoint_name}"
                 )
 
-            lod = self.explorer.explore_node(
+            lod = await self.explorer.aexplore_node(
                 node=start_node, triple_pos=TriplePos.SUBJECT, summary=self.summary
             )
 
@@ -198,6 +230,15 @@ WHERE {
                     ui.notify("Exploration returned no results")
                 return
 
+            if isinstance(lod, SpilledLod):
+                # only the part within the memory budget fits the grid
+                truncated = " (truncated)" if lod.truncated else ""
+                with self.solution.container:
+                    ui.notify(
+                        f"showing {len(lod.head)} of {len(lod)} results{truncated}",
+                        type="warning",
+                    )
+                lod = lod.head
             self.result_row.clear()
             self.update_lod(lod)
 
@@ -0,0 +1,253 @@
+"""
+Created on 2026-10-18
+
+@author: wf
+"""
+
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class Hedger:
+    """
+    hedged execution of requests on mirror endpoints
+
+    the primary request is sent first - if it has not answered after the
+    observed latency quantile of its endpoint the same request is also
+    sent to a mirror and the first good response wins
+    """
+
+    instance = None
+
+    def __init__(
+        self,
+        quantile: float = 0.95,
+        default_delay: float = 1.0,
+        min_delay: float = 0.05,
+        window: int = 200,
+        min_samples: int = 10,
+        max_workers: int = 16,
+    ):
+        """
+        constructor
+
+        Args:
+            quantile (float): the latency quantile after which to hedge
+            default_delay (float): the delay in seconds while there are too few samples
+            min_delay (float): the minimum delay in seconds
+            window (int): the number of latest latencies to keep per endpoint
+            min_samples (int): the number of samples needed to derive the delay
+            max_workers (int): the maximum number of threads for sync requests
+        """
+        self.quantile = quantile
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.window = window
+        self.min_samples = min_samples
+        self.lock = threading.Lock()
+        self.latencies: Dict[str, Deque[float]] = {}
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="hedge"
+        )
+        # submitted requests that have not finished yet - including losers
+        self.running = 0
+        self.requests = 0
+        self.hedged = 0
+        self.secondary_wins = 0
+        self.skipped = 0
+
+    @classmethod
+    def get_instance(cls) -> "Hedger":
+        """
+        get the shared hedger
+        """
+        if cls.instance is None:
+            cls.instance = cls()
+        return cls.instance
+
+    def record(self, endpoint: str, seconds: float):
+        """
+        record the latency of a successful request
+
+        Args:
+            endpoint (str): the name of the endpoint
+            seconds (float): the wall time of the request
+        """
+        with self.lock:
+            latencies = self.latencies.get(endpoint)
+            if latencies is None:
+                latencies = deque(maxlen=self.window)
+                self.latencies[endpoint] = latencies
+            latencies.append(seconds)
+
+    def get_delay(self, endpoint: str) -> float:
+        """
+        get the delay after which to hedge requests to the given endpoint
+
+        Args:
+            endpoint (str): the name of the endpoint
+
+        Returns:
+            float: the delay in seconds
+        """
+        with self.lock:
+            latencies = sorted(self.latencies.get(endpoint, ()))
+        if len(latencies) < self.min_samples:
+            delay = self.default_delay
+        else:
+            index = min(len(latencies) - 1, int(self.quantile * len(latencies)))
+            delay = max(self.min_delay, latencies[index])
+        return delay
+
+    def count(self, hedged: bool, secondary_won: bool, skipped: bool = False):
+        """
+        count a finished request
+        """
+        with self.lock:
+            self.requests += 1
+            if hedged:
+                self.hedged += 1
+            if secondary_won:
+                self.secondary_wins += 1
+            if skipped:
+                self.skipped += 1
+
+    def submit(self, call: Callable[[], T]) -> Optional[Future]:
+        """
+        submit the given request if a worker is free
+
+        Returns:
+            Future: the future of the request or None if all workers are busy
+        """
+        with self.lock:
+            if self.running >= self.max_workers:
+                return None
+            self.running += 1
+        future = self.executor.submit(call)
+        future.add_done_callback(self.release)
+        return future
+
+    def release(self, _future: Future):
+        """
+        free the worker of a finished request
+        """
+        with self.lock:
+            self.running -= 1
+
+    def run(
+        self, primary: Callable[[], T], secondary: Callable[[], T], delay: float
+    ) -> T:
+        """
+        run the primary request and hedge it with the secondary one
+        after the given delay or as soon as the primary failed
+
+        a running loser can not be interrupted - its result is discarded
+        and it keeps its worker so requests are not hedged while all
+        workers are busy
+
+        Args:
+            primary (Callable): the primary request
+            secondary (Callable): the equivalent request on a mirror
+            delay (float): the delay in seconds before hedging
+
+        Returns:
+            the result of the first successful request
+        """
+        primary_future = self.submit(primary)
+        if primary_future is None:
+            # waiting for a worker would delay the primary request
+            self.count(hedged=False, secondary_won=False, skipped=True)
+            return primary()
+        done, _pending = wait([primary_future], timeout=delay)
+        if done and primary_future.exception() is None:
+            self.count(hedged=False, secondary_won=False)
+            return primary_future.result()
+        secondary_future = self.submit(secondary)
+        if secondary_future is None:
+            self.count(hedged=False, secondary_won=False, skipped=True)
+            if done:
+                # fail over in this thread
+                return secondary()
+            return primary_future.result()
+        pending = {secondary_future}
+        if not done:
+            pending.add(primary_future)
+        error = primary_future.exception() if done else None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for loser in pending:
+                        loser.cancel()
+                    self.count(hedged=True, secondary_won=future is not primary_future)
+                    return future.result()
+                error = future.exception()
+        self.count(hedged=True, secondary_won=False)
+        raise error
+
+    async def arun(
+        self,
+        primary: Callable[[], Awaitable[T]],
+        secondary: Callable[[], Awaitable[T]],
+        delay: float,
+    ) -> T:
+        """
+        async version of run - the loser is cancelled and so are both
+        requests if the caller is cancelled
+
+        Args:
+            primary (Callable): coroutine function of the primary request
+            secondary (Callable): coroutine function of the request on a mirror
+            delay (float): the delay in seconds before hedging
+
+        Returns:
+            the result of the first successful request
+        """
+        primary_task = asyncio.ensure_future(primary())
+        pending = {primary_task}
+        try:
+            done, _pending = await asyncio.wait({primary_task}, timeout=delay)
+            if done and primary_task.exception() is None:
+                self.count(hedged=False, secondary_won=False)
+                return primary_task.result()
+            pending = {asyncio.ensure_future(secondary())}
+            if not done:
+                pending.add(primary_task)
+            error = primary_task.exception() if done else None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        self.count(hedged=True, secondary_won=task is not primary_task)
+                        return task.result()
+                    error = task.exception()
+        finally:
+            for loser in pending:
+                loser.cancel()
+        self.count(hedged=True, secondary_won=False)
+        raise error
+
+    def stats(self) -> Dict[str, dict]:
+        """
+        get the hedging statistics
+        """
+        with self.lock:
+            stats = {
+                "requests": self.requests,
+                "hedged": self.hedged,
+                "secondary_wins": self.secondary_wins,
+                "skipped": self.skipped,
+                "running": self.running,
+            }
+        stats["delays"] = {
+            endpoint: self.get_delay(endpoint) for endpoint in list(self.latencies)
+        }
+        return stats
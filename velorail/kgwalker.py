@@ -28,7 +28,11 @@ class KGWalker:
         self.debug = debug
         self.explorer = Explorer(endpoint_name)
         self.prefixes = self.explorer.endpoint_prefixes.get(endpoint_name)
-        self.query_gen = QueryGen(prefixes=self.prefixes, debug=self.debug)
+        self.query_gen = QueryGen(
+            prefixes=self.prefixes,
+            debug=self.debug,
+            prefix_index=self.explorer.prefix_index,
+        )
 
     def get_gen_lod(self, query_lod: list, selected_props: list) -> list:
         """
@@ -87,18 +91,28 @@ class KGWalker:
         # Table of selected properties for generation
         gen_lod = self.get_gen_lod(query_lod, selected_props)
 
-        # Generate query with selected properties
-        generated_query = self.query_gen.gen(
-            lod=gen_lod, main_var="item", main_value=start_node.qualified_name
+        # Generate and plan the query with selected properties
+        plan = self.explorer.get_planner().plan(
+            self.query_gen,
+            gen_lod,
+            main_var="item",
+            main_value=start_node.qualified_name,
         )
 
         if self.debug:
-            print(generated_query)
-
-        # Execute query and store results
-        query_results = self.explorer.query(
-            sparql_query=generated_query, param_dict={}, endpoint=self.endpoint_name
-        )
+            print(plan.sparql_query)
+            print(plan.summary)
+        if plan.refused:
+            raise ValueError(f"query for {start_node.qualified_name} {plan.summary}")
+
+        # Execute the planned queries and store results
+        lods = [
+            self.explorer.query(
+                sparql_query=sparql_query, param_dict={}, endpoint=self.endpoint_name
+            )
+            for sparql_query in plan.sparql_queries
+        ]
+        query_results = plan.merge(lods)
         return query_results
 
     def create_view(
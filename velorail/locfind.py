@@ -4,7 +4,10 @@ Created on 2025-02-01
 @author: th
 """
 
-from typing import Optional
+import hashlib
+import threading
+import time
+from typing import List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
@@ -12,6 +15,8 @@ from basemkit.yamlable import lod_storable
 from ngwidgets.widgets import Link
 
 from velorail.npq import NPQ_Handler
+from velorail.spatial_index import SpatialIndex
+from velorail.station_snapshot import StationSnapshot
 from velorail.tour import LegStyles
 
 
@@ -107,6 +112,26 @@ class LocFinder(NPQ_Handler):
     Set of methods to lookup different location types
     """
 
+    cache_ttls = {
+        "AllTrainStations": 7 * 24 * 3600,
+        "WikidataGeo": 24 * 3600,
+        "BikeNodes4Bounds": 24 * 3600,
+    }
+    # the /wd/{qid} page waits for these
+    hedge_queries = {"WikidataGeo"}
+    # seconds until the train station snapshot is checked for changes
+    station_max_age: float = 24 * 3600
+    # directory to persist the train station snapshot in - None for memory only
+    station_snapshot_dir: Optional[str] = None
+    # the train station snapshot and its spatial index shared by all instances
+    stations: Optional[StationSnapshot] = None
+    station_index: Optional[SpatialIndex] = None
+    stations_checked_at: Optional[float] = None
+    # guards the shared snapshot, index and check time
+    stations_lock = threading.Lock()
+    # held by the one thread refreshing the snapshot
+    stations_refresh_lock = threading.Lock()
+
     def __init__(self):
         super().__init__("locations.yaml")
 
@@ -126,7 +151,8 @@ class LocFinder(NPQ_Handler):
             list of dicts containing bike route information
         """
         param_dict = {"south": south, "west": west, "north": north, "east": east}
-        lod = self.query_by_name(
+        # large bounding boxes would time out in one piece
+        lod = self.query_by_name_paged(
             query_name="BikeNodes4Bounds",
             param_dict=param_dict,
             endpoint="osm-sophox",  # Using Sophox endpoint for OSM data
@@ -144,6 +170,56 @@ class LocFinder(NPQ_Handler):
             WikidataGeoItem with location data and metadata
         """
         lod = self.query_by_name(query_name="WikidataGeo", param_dict={"qid": qid})
+        return self.to_wikidata_geo_item(qid, lod)
+
+    def get_wikidata_geos(
+        self, qids: List[str], batch_size: int = 200
+    ) -> List[Optional[WikidataGeoItem]]:
+        """
+        Get geographical coordinates and metadata for many Wikidata items
+        with one query per batch
+
+        Args:
+            qids: Wikidata QIDs of the items
+            batch_size: maximum number of items per query
+
+        Returns:
+            list of WikidataGeoItem or None per qid
+        """
+        param_dicts = [{"qid": qid} for qid in qids]
+        lods = self.query_by_name_many(
+            query_name="WikidataGeo", param_dicts=param_dicts, batch_size=batch_size
+        )
+        wd_items = [self.to_wikidata_geo_item(qid, lod) for qid, lod in zip(qids, lods)]
+        return wd_items
+
+    async def aget_wikidata_geo(self, qid: str) -> WikidataGeoItem:
+        """
+        Get geographical coordinates and metadata for a Wikidata item
+        without blocking the event loop
+
+        Args:
+            qid: Wikidata QID of the item
+
+        Returns:
+            WikidataGeoItem with location data and metadata
+        """
+        lod = await self.aquery_by_name(
+            query_name="WikidataGeo", param_dict={"qid": qid}
+        )
+        return self.to_wikidata_geo_item(qid, lod)
+
+    def to_wikidata_geo_item(self, qid: str, lod: list) -> WikidataGeoItem:
+        """
+        Convert the WikidataGeo query result for the given qid
+
+        Args:
+            qid: Wikidata QID of the item
+            lod: the query result
+
+        Returns:
+            WikidataGeoItem or None if there is no result
+        """
         if len(lod) >= 1:
             record = lod[0]
             record["qid"] = qid  # Add qid to record for WikidataGeoItem creation
@@ -151,43 +227,182 @@ class LocFinder(NPQ_Handler):
         return None
 
     def get_all_train_stations(self):
-        lod = self.query_by_name(query_name="AllTrainStations")
+        lod = self.query_by_name_paged(query_name="AllTrainStations")
         return lod
 
+    @staticmethod
+    def get_stations_version(df: pd.DataFrame) -> str:
+        """
+        get the fingerprint of the given train station snapshot
+        """
+        hashes = pd.util.hash_pandas_object(df[["item", "lat", "long"]], index=False)
+        version = hashlib.sha1(hashes.to_numpy().tobytes()).hexdigest()
+        return version
+
+    @staticmethod
+    def set_stations(
+        stations: StationSnapshot, checked_at: float
+    ) -> Tuple[StationSnapshot, SpatialIndex]:
+        """
+        share the given train station snapshot and index its coordinates
+
+        the index is built before the snapshot is swapped in so that
+        readers keep using the old one meanwhile
+        """
+        index = SpatialIndex(stations.lat, stations.lon)
+        with LocFinder.stations_lock:
+            LocFinder.stations = stations
+            LocFinder.station_index = index
+            LocFinder.stations_checked_at = checked_at
+        return stations, index
+
+    @staticmethod
+    def get_stations() -> Tuple[StationSnapshot, SpatialIndex, Optional[float]]:
+        """
+        get the shared train stations, their index and monotonic check time
+        """
+        with LocFinder.stations_lock:
+            return (
+                LocFinder.stations,
+                LocFinder.station_index,
+                LocFinder.stations_checked_at,
+            )
+
+    def is_stale(self, checked_at: Optional[float]) -> bool:
+        """
+        check whether the snapshot checked at the given time needs a refetch
+        """
+        stale = checked_at is None
+        if not stale:
+            stale = time.monotonic() - checked_at >= self.station_max_age
+        return stale
+
+    def get_station_index(self) -> Tuple[StationSnapshot, SpatialIndex]:
+        """
+        get the train stations and their spatial index
+
+        at first use the snapshot persisted in station_snapshot_dir is
+        opened memory mapped - the query result is refetched when the
+        snapshot is older than station_max_age seconds and the snapshot
+        and index are only replaced if the result changed
+
+        one thread refetches while the others keep using the current
+        snapshot - only callers without a snapshot wait for it
+
+        Returns:
+            tuple: the train stations and the spatial index of their coordinates
+        """
+        stations, index, checked_at = self.get_stations()
+        if stations is None or self.is_stale(checked_at):
+            refresh_lock = LocFinder.stations_refresh_lock
+            if refresh_lock.acquire(blocking=stations is None):
+                try:
+                    stations, index = self.refresh_stations()
+                finally:
+                    refresh_lock.release()
+        return stations, index
+
+    def refresh_stations(self) -> Tuple[StationSnapshot, SpatialIndex]:
+        """
+        load or refetch the train station snapshot if it is missing or stale
+        - needs the stations_refresh_lock
+
+        Returns:
+            tuple: the train stations and the spatial index of their coordinates
+        """
+        stations, index, checked_at = self.get_stations()
+        snapshot_dir = self.station_snapshot_dir
+        if stations is None and snapshot_dir is not None:
+            loaded = StationSnapshot.load(snapshot_dir)
+            if loaded is not None:
+                age = max(0.0, time.time() - loaded.checked_at)
+                checked_at = time.monotonic() - age
+                stations, index = self.set_stations(loaded, checked_at)
+        if stations is None or self.is_stale(checked_at):
+            now = time.monotonic()
+            # typed float64 lat/long columns straight from the SPARQL result
+            df = self.query_df_by_name(query_name="AllTrainStations", page_size=10000)
+            version = self.get_stations_version(df)
+            if stations is None or version != stations.version:
+                stations = StationSnapshot.from_df(df, version)
+                if snapshot_dir is not None:
+                    stations = stations.save(snapshot_dir) or stations
+                stations, index = self.set_stations(stations, now)
+            else:
+                if snapshot_dir is not None:
+                    stations.touch(snapshot_dir)
+                with LocFinder.stations_lock:
+                    LocFinder.stations_checked_at = now
+        return stations, index
+
+    def to_stations_df(self, stations: StationSnapshot, positions, distances):
+        """
+        get the stations at the given positions with their distances
+        """
+        df = stations.to_df(positions)
+        df["distance_km"] = distances
+        return df
+
     def get_train_stations_by_coordinates(
         self, latitude: float, longitude: float, radius: float
     ):
         """
         Get all train stations within the given radius around the given latitude and longitude
+        ordered by distance
         """
-        lod = self.get_all_train_stations()
-        df = pd.DataFrame.from_records(lod)
-        # Haversine formula components
-        lat1, lon1 = np.radians(latitude), np.radians(longitude)
-        lat2, lon2 = np.radians(df["lat"]), np.radians(df["long"])
+        stations, index = self.get_station_index()
+        positions, distances = index.query_radius(latitude, longitude, radius)
+        return self.to_stations_df(stations, positions, distances)
 
-        # Differences in coordinates
-        dlat = lat2 - lat1
-        dlon = lon2 - lon1
-
-        # Haversine formula
-        a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
-        c = 2 * np.arcsin(np.sqrt(a))
-        r = 6371  # Radius of Earth in kilometers
-
-        # Calculate distances
-        distances = c * r
+    def get_nearest_train_stations(
+        self, latitude: float, longitude: float, k: int = 5, radius: float = None
+    ):
+        """
+        Get the k train stations nearest to the given latitude and longitude
 
-        # Add distances to dataframe
-        df_with_distances = df.copy()
-        df_with_distances["distance_km"] = distances
+        Args:
+            latitude: the latitude in degrees
+            longitude: the longitude in degrees
+            k: the number of stations
+            radius: the maximum distance in km - None for no limit
 
-        # Filter points within radius
-        points_within_radius = df_with_distances[
-            df_with_distances["distance_km"] <= radius
-        ].copy()
+        Returns:
+            DataFrame of at most k stations ordered by distance_km
+        """
+        stations, index = self.get_station_index()
+        positions, distances = index.query_knn(latitude, longitude, k, radius)
+        return self.to_stations_df(stations, positions, distances)
+
+    def get_nearest_train_stations_batch(
+        self,
+        latitudes: np.ndarray,
+        longitudes: np.ndarray,
+        k: int = 5,
+        radius: float = None,
+    ) -> pd.DataFrame:
+        """
+        Get the k train stations nearest to each of many points e.g. the
+        points of a GPX track or the coordinates of Locs with a single
+        search of the spatial index
 
-        # Sort by distance
-        points_within_radius = points_within_radius.sort_values("distance_km")
+        Args:
+            latitudes: the latitudes of the points in degrees
+            longitudes: the longitudes of the points in degrees
+            k: the number of stations per point
+            radius: the maximum distance in km - None for no limit
 
-        return points_within_radius
+        Returns:
+            DataFrame with the index of the point, the rank of the station
+            and the station columns with distance_km ordered by point and rank
+            - points without stations within the radius have no rows
+        """
+        stations, index = self.get_station_index()
+        positions, distances = index.query_knn_batch(latitudes, longitudes, k, radius)
+        points, ranks = np.nonzero(positions >= 0)
+        df = self.to_stations_df(
+            stations, positions[points, ranks], distances[points, ranks]
+        )
+        df.insert(0, "point", points)
+        df.insert(1, "rank", ranks)
+        df = df.reset_index(drop=True)
+        return df
@@ -4,12 +4,31 @@ Created on 2025-02-06
 @author: wf
 """
 
+import asyncio
 import logging
-import re
+import time
 from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
 
-from lodstorage.query import EndpointManager, Query, QueryManager
-from lodstorage.sparql import SPARQL, Params
+import pandas as pd
+from lodstorage.query import Endpoint, Query
+
+from velorail.cassette import Cassette
+from velorail.compact_lod import CompactLod
+from velorail.endpoint_health import EndpointHealth, EndpointUnavailableError
+from velorail.hedging import Hedger
+from velorail.npq_registry import NPQ_Registry
+from velorail.prefix_index import PrefixIndex
+from velorail.prefix_scanner import PrefixScanner
+from velorail.query_batch import QueryBatcher
+from velorail.query_cache import QueryCache
+from velorail.query_metrics import QueryMetrics
+from velorail.query_pager import QueryPager
+from velorail.query_template import QueryTemplate
+from velorail.result_spill import ResultBudget, SpilledLod
+from velorail.single_flight import SingleFlight
+from velorail.sparql_client import SparqlClientPool
+from velorail.sparql_columns import SparqlColumnDecoder
 
 
 class NPQ_Handler:
@@ -17,6 +36,25 @@ class NPQ_Handler:
     Handling of named parameterized queries
     """
 
+    # optional result cache shared by all handlers - see QueryCache
+    query_cache: Optional[QueryCache] = None
+    # time to live in seconds of cached results by query name
+    cache_ttls: Dict[str, float] = {}
+    # optional record/replay of query results e.g. for offline runs - see Cassette
+    cassette: Optional[Cassette] = None
+    # whether the cassette of the environment has been looked up - see get_cassette
+    cassette_from_env: bool = False
+    # compiled named query templates by yaml file, name, endpoint and auto_prefix
+    templates: Dict[tuple, QueryTemplate] = {}
+    # names of latency critical queries to hedge on mirror endpoints - see Hedger
+    hedge_queries: Set[str] = set()
+    # return large results as CompactLod instead of lists of dicts - see compact
+    compact_results: bool = False
+    # optional per query memory budget spilling larger results to disk
+    result_budget: Optional[ResultBudget] = None
+    # route named queries to the fastest healthy mirror - see EndpointHealth
+    route_endpoints: bool = False
+
     def __init__(self, yaml_file: str, with_default: bool = False, debug: bool = False):
         """
         Constructor
@@ -35,24 +73,19 @@ class NPQ_Handler:
         if not self.query_yaml.is_file():
             raise FileNotFoundError(f"Queries file not found: {self.query_yaml}")
 
-        self.query_manager = QueryManager(
-            lang="sparql", queriesPath=self.query_yaml.as_posix()
-        )
-
-        self.endpoints = EndpointManager.getEndpoints(
-            self.endpoint_path.as_posix(), with_default=with_default
+        # parsed files are shared process wide and reloaded on modification
+        registry = NPQ_Registry.get_instance()
+        self.query_manager = registry.get_query_manager(self.query_yaml)
+        endpoint_config = registry.get_endpoint_config(
+            self.endpoint_path, with_default=with_default
         )
+        # copy so that endpoints added to a handler stay local to it
+        self.endpoints = dict(endpoint_config.endpoints)
+        self.endpoint_prefixes = endpoint_config.prefixes
+        self.endpoint_mirrors = endpoint_config.mirrors
+        self.endpoint_prefix_indices = endpoint_config.prefix_indices
 
-        # Preload prefixes for each endpoint
-        self.endpoint_prefixes = {}
-        for endpoint_name, endpoint in self.endpoints.items():
-            if hasattr(endpoint, "prefixes"):
-                prefix_dict, _body = self.parse_prefixes(endpoint.prefixes)
-                self.endpoint_prefixes[endpoint_name] = prefix_dict
-            else:
-                self.endpoint_prefixes[endpoint_name] = dict()
-
-    def parse_prefixes(self, prefix_str: str) -> dict:
+    def parse_prefixes(self, prefix_str: str) -> tuple:
         """
         Parse prefixes from string with newlines and prefixes per
         line into a dictionary
@@ -61,21 +94,25 @@ class NPQ_Handler:
             prefix_str (str): The string containing prefix definitions.
 
         Returns:
-            dict: A dictionary mapping prefix names to their URIs.
+            tuple: A dictionary mapping prefix names to their URIs and the remaining body.
         """
-        prefix_pattern = re.compile(
-            r"^prefix\s+(?P<name>\w+):\s+<(?P<uri>[^>]+)>", re.IGNORECASE
-        )
-        prefix_dict = {}
-        body = ""
-        for line in prefix_str.splitlines():
-            if match := prefix_pattern.match(line.strip()):
-                name = match.group("name")
-                uri = match.group("uri")
-                prefix_dict[name] = uri
-            else:
-                body += line + "\n"
-        return prefix_dict, body
+        return NPQ_Registry.parse_prefixes(prefix_str)
+
+    def get_prefix_index(self, endpoint_name: str) -> PrefixIndex:
+        """
+        Get the prefix index of the given endpoint for compacting
+        URIs and expanding prefixed names.
+
+        Args:
+            endpoint_name (str): Name of the endpoint.
+
+        Returns:
+            PrefixIndex: the shared index - empty for unknown endpoints
+        """
+        prefix_index = self.endpoint_prefix_indices.get(endpoint_name)
+        if prefix_index is None:
+            prefix_index = PrefixIndex(self.endpoint_prefixes.get(endpoint_name))
+        return prefix_index
 
     def to_set(self, prefix_dict) -> set:
         prefix_set = set()
@@ -104,6 +141,9 @@ class NPQ_Handler:
         """
         Merge query prefixes with endpoint prefixes avoiding duplicates.
 
+        Only the endpoint prefixes the query body actually references
+        are added - see PrefixScanner.
+
         Args:
             query_str (str): SPARQL query string potentially containing prefixes.
             endpoint_prefix_dict (dict): Dictionary mapping prefix names to URIs.
@@ -114,14 +154,17 @@ class NPQ_Handler:
         prefix_dict, body_section = self.parse_prefixes(query_str)
         query_prefix_set = self.to_set(prefix_dict)
 
-        endpoint_prefix_set = self.to_set(endpoint_prefix_dict)
+        used_prefix_set = PrefixScanner.scan(body_section)
+        endpoint_prefix_set = self.to_set(endpoint_prefix_dict) & used_prefix_set
 
         missing_prefixes = endpoint_prefix_set - query_prefix_set
 
         if not missing_prefixes:
             return query_str
 
-        merged_prefix_dict = dict(endpoint_prefix_dict)
+        merged_prefix_dict = {
+            prefix: endpoint_prefix_dict[prefix] for prefix in missing_prefixes
+        }
         merged_prefix_dict.update(prefix_dict)
 
         merged_prefix_lines = []
@@ -132,6 +175,24 @@ class NPQ_Handler:
         merged_query = "\n".join(merged_prefix_lines) + f"\n\n{body_section}"
         return merged_query
 
+    def get_query(self, query_name: str) -> Query:
+        """
+        Get the named query.
+
+        Args:
+            query_name (str): Name of the query.
+
+        Returns:
+            Query: the query
+
+        Raises:
+            ValueError: if the query is not defined
+        """
+        query: Query = self.query_manager.queriesByName.get(query_name)
+        if not query:
+            raise ValueError(f"{query_name} is not defined!")
+        return query
+
     def query_by_name(
         self,
         query_name: str,
@@ -151,32 +212,222 @@ class NPQ_Handler:
         Returns:
             list: List of dictionaries with query results.
         """
-        query: Query = self.query_manager.queriesByName.get(query_name)
-        if not query:
-            raise ValueError(f"{query_name} is not defined!")
-
-        # Get the query string and handle prefixes
-        sparql_query = query.query
+        endpoint = self.route(endpoint, query_name)
+        query = self.get_query(query_name)
         lod = self.query(
-            sparql_query=sparql_query,
+            sparql_query=query.query,
             param_dict=param_dict,
             endpoint=endpoint,
             auto_prefix=auto_prefix,
+            query_name=query_name,
         )
         return lod
 
-    def query(
+    def query_by_name_many(
         self,
-        sparql_query: str,
+        query_name: str,
+        param_dicts: List[dict],
+        endpoint: str = "wikidata-qlever",
+        auto_prefix: bool = True,
+        batch_size: int = 200,
+    ) -> List[List[dict]]:
+        """
+        Get the results of the given query for many parameter sets
+        using one VALUES bound query per batch.
+
+        Queries that can not be rewritten e.g. because of LIMIT or
+        subqueries are run once per parameter set instead.
+
+        Args:
+            query_name (str): Name of the query to execute.
+            param_dicts (list): the parameter dicts to substitute.
+            endpoint (str): Name of the endpoint to use.
+            auto_prefix (bool): Whether to automatically add endpoint prefixes.
+            batch_size (int): the maximum number of parameter sets per query.
+
+        Returns:
+            list: one list of dictionaries with query results per parameter dict.
+        """
+        endpoint = self.route(endpoint, query_name)
+        query = self.get_query(query_name)
+        sparql_query = query.query
+        if auto_prefix:
+            sparql_query = self.merge_prefixes_by_endpoint_name(sparql_query, endpoint)
+        batcher = QueryBatcher(sparql_query)
+        lods = []
+        if not batcher.can_batch:
+            logging.debug(f"{query_name} not batched: {batcher.reason}")
+            for param_dict in param_dicts:
+                lod = self.query_by_name(
+                    query_name, param_dict, endpoint=endpoint, auto_prefix=auto_prefix
+                )
+                lods.append(lod)
+            return lods
+        for offset in range(0, len(param_dicts), batch_size):
+            batch = param_dicts[offset : offset + batch_size]
+            batch_query = batcher.batch_query(batch)
+            lod = self.query(
+                sparql_query=batch_query,
+                endpoint=endpoint,
+                auto_prefix=auto_prefix,
+                query_name=query_name,
+            )
+            lods.extend(batcher.split(lod, len(batch)))
+        return lods
+
+    @staticmethod
+    def get_cassette() -> Optional[Cassette]:
+        """
+        Get the active cassette - at first use the one configured by the
+        environment unless a cassette has been set.
+        """
+        if not NPQ_Handler.cassette_from_env:
+            if NPQ_Handler.cassette is None:
+                NPQ_Handler.cassette = Cassette.from_env()
+            NPQ_Handler.cassette_from_env = True
+        return NPQ_Handler.cassette
+
+    def get_join(self) -> Optional[Callable]:
+        """
+        Get the function stitching the pages of a paged query together
+        - None for plain lists.
+        """
+        join = None
+        if self.result_budget is not None and not self.get_cassette():
+            # results beyond the budget stay spilled
+            join = self.result_budget.join
+        elif self.compact_results:
+            join = CompactLod.join
+        return join
+
+    def get_pager(
+        self, query_name: str, endpoint: str, auto_prefix: bool
+    ) -> QueryPager:
+        """
+        Get the pager for the given named query.
+        """
+        query = self.get_query(query_name)
+        sparql_query = query.query
+        if auto_prefix:
+            sparql_query = self.merge_prefixes_by_endpoint_name(sparql_query, endpoint)
+        pager = QueryPager(sparql_query)
+        if not pager.can_page:
+            logging.debug(f"{query_name} not paginated: {pager.reason}")
+        return pager
+
+    def query_by_name_paged(
+        self,
+        query_name: str,
+        param_dict: dict = {},
+        endpoint: str = "wikidata-qlever",
+        auto_prefix: bool = True,
+        page_size: int = 10000,
+        max_pages: Optional[int] = None,
+        parallelism: Optional[int] = None,
+    ) -> List[dict]:
+        """
+        Get the result of the given named query in LIMIT/OFFSET pages
+        with a stable ORDER BY fetched concurrently and stitched together
+        in order. Fetching stops at the first short page.
+
+        Queries that can not be paginated e.g. because of their own
+        LIMIT are run in one piece instead.
+
+        Args:
+            query_name (str): Name of the query to execute.
+            param_dict (dict): Dictionary of parameters to substitute.
+            endpoint (str): Name of the endpoint to use.
+            auto_prefix (bool): Whether to automatically add endpoint prefixes.
+            page_size (int): the number of rows per page.
+            max_pages (int): the maximum number of pages - None for all.
+            parallelism (int): the maximum number of concurrent pages
+                - None for the max_concurrency of the SparqlClientPool.
+
+        Returns:
+            list: List of dictionaries with query results.
+        """
+        endpoint = self.route(endpoint, query_name)
+        pager = self.get_pager(query_name, endpoint, auto_prefix)
+        if not pager.can_page:
+            return self.query_by_name(query_name, param_dict, endpoint, auto_prefix)
+        if parallelism is None:
+            parallelism = SparqlClientPool.get_instance().max_concurrency
+
+        def fetch_page(page: int) -> List[dict]:
+            lod = self.query(
+                sparql_query=pager.page_query(page, page_size),
+                param_dict=param_dict,
+                endpoint=endpoint,
+                auto_prefix=auto_prefix,
+                query_name=query_name,
+            )
+            return lod
+
+        join = self.get_join()
+        lod = QueryPager.fetch(fetch_page, page_size, parallelism, max_pages, join)
+        return lod
+
+    async def aquery_by_name_paged(
+        self,
+        query_name: str,
+        param_dict: dict = {},
+        endpoint: str = "wikidata-qlever",
+        auto_prefix: bool = True,
+        page_size: int = 10000,
+        max_pages: Optional[int] = None,
+    ) -> List[dict]:
+        """
+        Get the result of the given named query in LIMIT/OFFSET pages
+        without blocking the event loop - the number of concurrent pages
+        is limited by the concurrency of the async client of the endpoint.
+
+        Args:
+            query_name (str): Name of the query to execute.
+            param_dict (dict): Dictionary of parameters to substitute.
+            endpoint (str): Name of the endpoint to use.
+            auto_prefix (bool): Whether to automatically add endpoint prefixes.
+            page_size (int): the number of rows per page.
+            max_pages (int): the maximum number of pages - None for all.
+
+        Returns:
+            list: List of dictionaries with query results.
+        """
+        endpoint = self.route(endpoint, query_name)
+        pager = self.get_pager(query_name, endpoint, auto_prefix)
+        if not pager.can_page:
+            return await self.aquery_by_name(
+                query_name, param_dict, endpoint, auto_prefix
+            )
+        parallelism = SparqlClientPool.get_instance().max_concurrency
+
+        async def fetch_page(page: int) -> List[dict]:
+            lod = await self.aquery(
+                sparql_query=pager.page_query(page, page_size),
+                param_dict=param_dict,
+                endpoint=endpoint,
+                auto_prefix=auto_prefix,
+                query_name=query_name,
+            )
+            return lod
+
+        join = self.get_join()
+        lod = await QueryPager.afetch(
+            fetch_page, page_size, parallelism, max_pages, join
+        )
+        return lod
+
+    async def aquery_by_name(
+        self,
+        query_name: str,
         param_dict: dict = {},
         endpoint: str = "wikidata-qlever",
         auto_prefix: bool = True,
     ):
         """
-        Get the result of the given query.
+        Get the result of the given query without blocking the event loop.
 
         Args:
-            sparql_query (str): the query to execute.
+            query_name (str): Name of the query to execute.
             param_dict (dict): Dictionary of parameters to substitute.
             endpoint (str): Name of the endpoint to use.
             auto_prefix (bool): Whether to automatically add endpoint prefixes.
@@ -184,23 +435,753 @@ class NPQ_Handler:
         Returns:
             list: List of dictionaries with query results.
         """
+        endpoint = self.route(endpoint, query_name)
+        query = self.get_query(query_name)
+        lod = await self.aquery(
+            sparql_query=query.query,
+            param_dict=param_dict,
+            endpoint=endpoint,
+            auto_prefix=auto_prefix,
+            query_name=query_name,
+        )
+        return lod
+
+    def get_cache_ttl(self, query_name: Optional[str]) -> Optional[float]:
+        """
+        get the time to live for cached results of the given query
+
+        Args:
+            query_name (str): name of the query - None for ad hoc queries
+
+        Returns:
+            float: the ttl in seconds or None for the cache default
+        """
+        ttl = self.cache_ttls.get(query_name) if query_name else None
+        return ttl
+
+    def get_template(
+        self,
+        sparql_query: str,
+        endpoint: str,
+        auto_prefix: bool,
+        query_name: Optional[str] = None,
+    ) -> QueryTemplate:
+        """
+        Get the compiled template of the given query.
+
+        Named queries are compiled once per endpoint with the typed defaults
+        of their param_list - other queries e.g. rewritten batch or page
+        queries are compiled on the fly.
+
+        Args:
+            sparql_query (str): the query to compile.
+            endpoint (str): Name of the endpoint to use.
+            auto_prefix (bool): Whether to automatically add endpoint prefixes.
+            query_name (str): Name of the query if it is a named query.
+
+        Returns:
+            QueryTemplate: the compiled template
+        """
+        prefixes = self.endpoint_prefixes.get(endpoint, {}) if auto_prefix else None
+        query = self.query_manager.queriesByName.get(query_name) if query_name else None
+        if query is None or query.query != sparql_query:
+            return self.compile_template(sparql_query, endpoint, prefixes)
+        key = (str(self.query_yaml), query_name, endpoint, auto_prefix)
+        template = self.templates.get(key)
+        # the yaml files might have been reloaded since
+        if (
+            template is None
+            or template.param_list is not query.param_list
+            or template.prefixes is not prefixes
+        ):
+            template = self.compile_template(
+                sparql_query, endpoint, prefixes, query.param_list
+            )
+            self.templates[key] = template
+        return template
+
+    def compile_template(
+        self,
+        sparql_query: str,
+        endpoint: str,
+        prefixes: Optional[Dict[str, str]],
+        param_list: Optional[list] = None,
+    ) -> QueryTemplate:
+        """
+        Compile the given query merging the given endpoint prefixes.
+        """
+        if prefixes is not None:
+            logging.debug(f"Auto prefixing for endpoint: {endpoint}")
+            sparql_query = self.merge_prefixes(sparql_query, prefixes)
+        logging.debug(f"SPARQL query for {endpoint}:\n{sparql_query}")
+        template = QueryTemplate(sparql_query, param_list=param_list, prefixes=prefixes)
+        return template
+
+    def prepare_query(
+        self,
+        sparql_query: str,
+        param_dict: dict,
+        endpoint: str,
+        auto_prefix: bool,
+        query_name: Optional[str] = None,
+    ) -> Tuple[Endpoint, str, str]:
+        """
+        Prepare the given query for execution.
+
+        Args:
+            sparql_query (str): the query to execute.
+            param_dict (dict): Dictionary of parameters to substitute.
+            endpoint (str): Name of the endpoint to use.
+            auto_prefix (bool): Whether to automatically add endpoint prefixes.
+            query_name (str): Name of the query if it is a named query.
+
+        Returns:
+            tuple: the endpoint configuration, the prefixed query
+            and the final query with the parameters applied
+        """
         if endpoint not in self.endpoints:
             raise Exception(f"invalid endpoint {endpoint}")
         sparql_endpoint = self.endpoints[endpoint]
-        endpoint_instance = SPARQL(sparql_endpoint.endpoint)
-
-        if auto_prefix:
-            logging.debug(f"Auto prefixing for endpoint: {endpoint}")
-            sparql_query = self.merge_prefixes_by_endpoint_name(sparql_query, endpoint)
-        msg = f"SPARQL query for {endpoint}:\n{sparql_query}"
-        logging.debug(msg)
+        template = self.get_template(sparql_query, endpoint, auto_prefix, query_name)
+        final_query = template.bind(param_dict)
         if self.debug:
-            print(msg)
-            params = Params(sparql_query)
-            final_query = params.apply_parameters_with_check(param_dict)
+            print(f"SPARQL query for {endpoint}:\n{template.sparql_query}")
             print("parameterized query:")
             print(final_query)
+        return sparql_endpoint, template.sparql_query, final_query
+
+    def get_cache_key(
+        self, endpoint: str, sparql_query: str, param_dict: dict, use_cache: bool
+    ) -> Optional[str]:
+        """
+        Get the cache key for the given query if caching is active
+        - the cache is bypassed while a cassette is active so that
+        all results are recorded and replayed.
+
+        Returns:
+            str: the key or None if the cache is not to be used
+        """
+        cache_key = None
+        if use_cache and self.query_cache is not None and not self.get_cassette():
+            cache_key = self.query_cache.get_key(endpoint, sparql_query, param_dict)
+        return cache_key
+
+    def cache_result(
+        self,
+        cache_key: Optional[str],
+        lod: list,
+        query_name: Optional[str],
+        endpoint: str,
+    ):
+        """
+        Store the given result in the query cache if caching is active
+        - results beyond the result_budget are not cached.
+        """
+        if cache_key and not isinstance(lod, SpilledLod):
+            self.query_cache.put(
+                cache_key,
+                lod,
+                query_name=query_name,
+                endpoint=endpoint,
+                ttl=self.get_cache_ttl(query_name),
+            )
+
+    def compact(self, endpoint: str, lod: List[dict]) -> List[dict]:
+        """
+        Get the given result as CompactLod if compact_results is active.
+
+        Args:
+            endpoint (str): Name of the endpoint whose prefixes to use
+                for splitting the URIs into namespace and local part.
+            lod (list): the query result
+
+        Returns:
+            list: the CompactLod or the unchanged result
+            - SpilledLod results stay on disk
+        """
+        if self.compact_results and isinstance(lod, list):
+            lod = CompactLod.from_lod(lod, self.get_prefix_index(endpoint))
+        return lod
+
+    def get_group(self, endpoint: str) -> List[str]:
+        """
+        Get the equivalence group of the given endpoint.
+
+        Returns:
+            list: the endpoint followed by its known mirrors
+        """
+        group = [endpoint] + [
+            mirror
+            for mirror in self.endpoint_mirrors.get(endpoint, ())
+            if mirror in self.endpoints
+        ]
+        return group
 
-        # Execute query
-        lod = endpoint_instance.queryAsListOfDicts(sparql_query, param_dict=param_dict)
+    def route(self, endpoint: str, query_name: Optional[str]) -> str:
+        """
+        Route the given named query to the fastest healthy endpoint of the
+        equivalence group of the given endpoint if route_endpoints is active.
+
+        Args:
+            endpoint (str): Name of the requested endpoint.
+            query_name (str): Name of the query.
+
+        Returns:
+            str: the name of the endpoint to use
+
+        Raises:
+            EndpointUnavailableError: if the circuits of all endpoints
+            of the group are open
+        """
+        if not self.route_endpoints or self.get_cassette():
+            # recordings are per endpoint and need to be reproducible
+            return endpoint
+        group = self.get_group(endpoint)
+        routed = EndpointHealth.get_instance().choose(group)
+        if routed is None:
+            raise EndpointUnavailableError(
+                f"{query_name}: no healthy endpoint in {', '.join(group)}"
+            )
+        return routed
+
+    def record_health(self, endpoint: str, ex: Optional[Exception] = None):
+        """
+        Record the outcome of a query for the circuit breaker of the endpoint.
+
+        Args:
+            endpoint (str): Name of the endpoint.
+            ex (Exception): the error of the query - None for success
+        """
+        health = EndpointHealth.get_instance()
+        if ex is None:
+            health.record_success(endpoint)
+        elif EndpointHealth.is_failure(ex):
+            health.record_failure(endpoint, str(ex)[:200])
+
+    def get_mirror(
+        self, endpoint: str, query_name: Optional[str], hedge: Optional[bool]
+    ) -> Optional[str]:
+        """
+        Get the mirror endpoint to hedge the given query with.
+
+        Args:
+            endpoint (str): Name of the primary endpoint.
+            query_name (str): Name of the query if it is a named query.
+            hedge (bool): Whether to hedge - None for hedging the hedge_queries only.
+
+        Returns:
+            str: the name of the mirror endpoint or None if not hedging
+        """
+        if hedge is None:
+            hedge = query_name in self.hedge_queries
+        if self.get_cassette():
+            # recordings are per endpoint and need to be reproducible
+            hedge = False
+        mirror = None
+        if hedge:
+            health = EndpointHealth.get_instance()
+            for mirror_name in self.get_group(endpoint)[1:]:
+                if not self.route_endpoints or health.is_available(mirror_name):
+                    mirror = mirror_name
+                    break
+        return mirror
+
+    def record(
+        self,
+        endpoint: str,
+        final_query: str,
+        lod: List[dict],
+        size: int,
+        seconds: float,
+        query_name: Optional[str],
+    ):
+        """
+        Record the given live result in the cassette if one is recording.
+        """
+        cassette = self.get_cassette()
+        if cassette and cassette.recording:
+            cassette.record(endpoint, final_query, lod, size, seconds, query_name)
+
+    def execute(
+        self,
+        endpoint: str,
+        sparql_endpoint: Endpoint,
+        final_query: str,
+        query_name: Optional[str] = None,
+    ):
+        """
+        Execute the given final query using the shared keep-alive
+        client of the endpoint and record its latency and metrics.
+        """
+        cassette = self.get_cassette()
+        metrics = QueryMetrics.get_instance()
+        start_time = time.monotonic()
+        try:
+            if cassette and cassette.replaying:
+                lod, size = cassette.play(endpoint, final_query)
+            else:
+                pool = SparqlClientPool.get_instance()
+                client = pool.get_client(endpoint, sparql_endpoint)
+                if self.result_budget is not None and not cassette:
+                    lod, size = client.query_budgeted(final_query, self.result_budget)
+                else:
+                    lod, size = client.query_with_size(final_query)
+        except Exception as ex:
+            metrics.record_error(query_name, endpoint)
+            self.record_health(endpoint, ex)
+            raise
+        elapsed = time.monotonic() - start_time
+        self.record_health(endpoint)
+        self.record(endpoint, final_query, lod, size, elapsed, query_name)
+        Hedger.get_instance().record(endpoint, elapsed)
+        metrics.record(query_name, endpoint, elapsed, rows=len(lod), size=size)
+        return lod
+
+    async def aexecute(
+        self,
+        endpoint: str,
+        sparql_endpoint: Endpoint,
+        final_query: str,
+        query_name: Optional[str] = None,
+    ):
+        """
+        Execute the given final query using the shared async
+        client of the endpoint and record its latency and metrics.
+        """
+        cassette = self.get_cassette()
+        metrics = QueryMetrics.get_instance()
+        start_time = time.monotonic()
+        try:
+            if cassette and cassette.replaying:
+                lod, size = await cassette.aplay(endpoint, final_query)
+            elif self.result_budget is not None and not cassette:
+                # streamed by the keep-alive client of the endpoint in a thread
+                # - the async client receives results in one piece
+                client = SparqlClientPool.get_instance().get_client(
+                    endpoint, sparql_endpoint
+                )
+                lod, size = await asyncio.to_thread(
+                    client.query_budgeted, final_query, self.result_budget
+                )
+            else:
+                pool = SparqlClientPool.get_instance()
+                client = pool.get_async_client(endpoint, sparql_endpoint)
+                lod, size = await client.query_with_size(final_query)
+        except Exception as ex:
+            metrics.record_error(query_name, endpoint)
+            self.record_health(endpoint, ex)
+            raise
+        elapsed = time.monotonic() - start_time
+        self.record_health(endpoint)
+        self.record(endpoint, final_query, lod, size, elapsed, query_name)
+        Hedger.get_instance().record(endpoint, elapsed)
+        metrics.record(query_name, endpoint, elapsed, rows=len(lod), size=size)
+        return lod
+
+    def query(
+        self,
+        sparql_query: str,
+        param_dict: dict = {},
+        endpoint: str = "wikidata-qlever",
+        auto_prefix: bool = True,
+        query_name: Optional[str] = None,
+        use_cache: bool = True,
+        hedge: Optional[bool] = None,
+    ):
+        """
+        Get the result of the given query.
+
+        Args:
+            sparql_query (str): the query to execute.
+            param_dict (dict): Dictionary of parameters to substitute.
+            endpoint (str): Name of the endpoint to use.
+            auto_prefix (bool): Whether to automatically add endpoint prefixes.
+            query_name (str): Name of the query if it is a named query.
+            use_cache (bool): Whether to use the query cache if one is configured.
+            hedge (bool): Whether to also send the query to a mirror endpoint
+                if the endpoint is slow - None for hedging the hedge_queries only.
+
+        Returns:
+            list: List of dictionaries with query results
+            - a CompactLod if compact_results is active.
+        """
+        query_template = sparql_query
+        sparql_endpoint, sparql_query, final_query = self.prepare_query(
+            sparql_query, param_dict, endpoint, auto_prefix, query_name
+        )
+        cache_key = self.get_cache_key(endpoint, sparql_query, param_dict, use_cache)
+        if cache_key:
+            lod = self.query_cache.get(cache_key, query_name)
+            if lod is not None:
+                QueryMetrics.get_instance().record_cache_hit(query_name, endpoint)
+                return self.compact(endpoint, lod)
+
+        def fetch():
+            mirror = self.get_mirror(endpoint, query_name, hedge)
+            if mirror:
+                # the mirror might need different prefixes
+                mirror_endpoint, _mirror_query, mirror_final_query = (
+                    self.prepare_query(
+                        query_template, param_dict, mirror, auto_prefix, query_name
+                    )
+                )
+                hedger = Hedger.get_instance()
+                lod = hedger.run(
+                    lambda: self.execute(
+                        endpoint, sparql_endpoint, final_query, query_name
+                    ),
+                    lambda: self.execute(
+                        mirror, mirror_endpoint, mirror_final_query, query_name
+                    ),
+                    delay=hedger.get_delay(endpoint),
+                )
+            else:
+                lod = self.execute(endpoint, sparql_endpoint, final_query, query_name)
+            self.cache_result(cache_key, lod, query_name, endpoint)
+            return self.compact(endpoint, lod)
+
+        # concurrent identical queries share one request
+        lod = SingleFlight.get_instance().do((endpoint, final_query), fetch)
+        return lod
+
+    def iter_query(
+        self,
+        sparql_query: str,
+        param_dict: dict = {},
+        endpoint: str = "wikidata-qlever",
+        auto_prefix: bool = True,
+        query_name: Optional[str] = None,
+    ) -> Iterator[dict]:
+        """
+        Iterate over the result rows of the given query as they arrive.
+
+        Only the current row is decoded at a time so that large results
+        do not need to be held in memory. Streamed results are not
+        stored in the query cache but served from it if available.
+
+        Args:
+            sparql_query (str): the query to execute.
+            param_dict (dict): Dictionary of parameters to substitute.
+            endpoint (str): Name of the endpoint to use.
+            auto_prefix (bool): Whether to automatically add endpoint prefixes.
+            query_name (str): Name of the query if it is a named query.
+
+        Yields:
+            dict: the next result row
+        """
+        sparql_endpoint, sparql_query, final_query = self.prepare_query(
+            sparql_query, param_dict, endpoint, auto_prefix, query_name
+        )
+        cache_key = self.get_cache_key(endpoint, sparql_query, param_dict, True)
+        if cache_key:
+            lod = self.query_cache.get(cache_key, query_name)
+            if lod is not None:
+                QueryMetrics.get_instance().record_cache_hit(query_name, endpoint)
+                yield from lod
+                return
+        if self.get_cassette():
+            # recordings are complete results
+            yield from self.execute(endpoint, sparql_endpoint, final_query, query_name)
+            return
+        client = SparqlClientPool.get_instance().get_client(endpoint, sparql_endpoint)
+        metrics = QueryMetrics.get_instance()
+        rows = 0
+        start_time = time.monotonic()
+
+        def on_done(size: int):
+            elapsed = time.monotonic() - start_time
+            metrics.record(query_name, endpoint, elapsed, rows=rows, size=size)
+
+        try:
+            for record in client.iter_query(final_query, on_done=on_done):
+                rows += 1
+                yield record
+        except Exception as ex:
+            metrics.record_error(query_name, endpoint)
+            self.record_health(endpoint, ex)
+            raise
+        self.record_health(endpoint)
+
+    def iter_query_by_name(
+        self,
+        query_name: str,
+        param_dict: dict = {},
+        endpoint: str = "wikidata-qlever",
+        auto_prefix: bool = True,
+    ) -> Iterator[dict]:
+        """
+        Iterate over the result rows of the given named query as they arrive.
+
+        Args:
+            query_name (str): Name of the query to execute.
+            param_dict (dict): Dictionary of parameters to substitute.
+            endpoint (str): Name of the endpoint to use.
+            auto_prefix (bool): Whether to automatically add endpoint prefixes.
+
+        Yields:
+            dict: the next result row
+        """
+        endpoint = self.route(endpoint, query_name)
+        query = self.get_query(query_name)
+        yield from self.iter_query(
+            sparql_query=query.query,
+            param_dict=param_dict,
+            endpoint=endpoint,
+            auto_prefix=auto_prefix,
+            query_name=query_name,
+        )
+
+    async def aquery(
+        self,
+        sparql_query: str,
+        param_dict: dict = {},
+        endpoint: str = "wikidata-qlever",
+        auto_prefix: bool = True,
+        query_name: Optional[str] = None,
+        use_cache: bool = True,
+        hedge: Optional[bool] = None,
+    ):
+        """
+        Get the result of the given query without blocking the event loop.
+
+        Args:
+            sparql_query (str): the query to execute.
+            param_dict (dict): Dictionary of parameters to substitute.
+            endpoint (str): Name of the endpoint to use.
+            auto_prefix (bool): Whether to automatically add endpoint prefixes.
+            query_name (str): Name of the query if it is a named query.
+            use_cache (bool): Whether to use the query cache if one is configured.
+            hedge (bool): Whether to also send the query to a mirror endpoint
+                if the endpoint is slow - None for hedging the hedge_queries only.
+
+        Returns:
+            list: List of dictionaries with query results
+            - a CompactLod if compact_results is active.
+        """
+        query_template = sparql_query
+        sparql_endpoint, sparql_query, final_query = self.prepare_query(
+            sparql_query, param_dict, endpoint, auto_prefix, query_name
+        )
+        cache_key = self.get_cache_key(endpoint, sparql_query, param_dict, use_cache)
+        if cache_key:
+            lod = self.query_cache.get(cache_key, query_name)
+            if lod is not None:
+                QueryMetrics.get_instance().record_cache_hit(query_name, endpoint)
+                return self.compact(endpoint, lod)
+
+        async def fetch():
+            mirror = self.get_mirror(endpoint, query_name, hedge)
+            if mirror:
+                mirror_endpoint, _mirror_query, mirror_final_query = (
+                    self.prepare_query(
+                        query_template, param_dict, mirror, auto_prefix, query_name
+                    )
+                )
+                hedger = Hedger.get_instance()
+                lod = await hedger.arun(
+                    lambda: self.aexecute(
+                        endpoint, sparql_endpoint, final_query, query_name
+                    ),
+                    lambda: self.aexecute(
+                        mirror, mirror_endpoint, mirror_final_query, query_name
+                    ),
+                    delay=hedger.get_delay(endpoint),
+                )
+            else:
+                lod = await self.aexecute(
+                    endpoint, sparql_endpoint, final_query, query_name
+                )
+            self.cache_result(cache_key, lod, query_name, endpoint)
+            return self.compact(endpoint, lod)
+
+        # concurrent identical queries share one request
+        lod = await SingleFlight.get_instance().ado((endpoint, final_query), fetch)
         return lod
+
+    def execute_df(
+        self,
+        endpoint: str,
+        sparql_endpoint: Endpoint,
+        final_query: str,
+        query_name: Optional[str] = None,
+    ) -> pd.DataFrame:
+        """
+        Execute the given final query decoding the result into typed
+        columns and record its latency and metrics.
+
+        Cassettes hold the typed columns separately from the lists of
+        dicts so that replayed results have the dtypes of live ones.
+        """
+        cassette = self.get_cassette()
+        columns_endpoint = f"{endpoint}#columns"
+        metrics = QueryMetrics.get_instance()
+        start_time = time.monotonic()
+        try:
+            if cassette and cassette.replaying:
+                payload, size = cassette.play(columns_endpoint, final_query)
+                df = SparqlColumnDecoder.from_payload(payload)
+            else:
+                pool = SparqlClientPool.get_instance()
+                client = pool.get_client(endpoint, sparql_endpoint)
+                df, size = client.query_df(final_query)
+        except Exception as ex:
+            metrics.record_error(query_name, endpoint)
+            self.record_health(endpoint, ex)
+            raise
+        elapsed = time.monotonic() - start_time
+        self.record_health(endpoint)
+        if cassette and cassette.recording:
+            payload = SparqlColumnDecoder.to_payload(df)
+            self.record(
+                columns_endpoint, final_query, payload, size, elapsed, query_name
+            )
+        Hedger.get_instance().record(endpoint, elapsed)
+        metrics.record(query_name, endpoint, elapsed, rows=len(df), size=size)
+        return df
+
+    def query_df(
+        self,
+        sparql_query: str,
+        param_dict: dict = {},
+        endpoint: str = "wikidata-qlever",
+        auto_prefix: bool = True,
+        query_name: Optional[str] = None,
+        use_cache: bool = True,
+    ) -> pd.DataFrame:
+        """
+        Get the result of the given query as a DataFrame with one typed
+        column per variable decoded directly from the SPARQL result
+        using the datatypes of the literals e.g. xsd:double as float64,
+        xsd:integer as int64 and xsd:dateTime as datetime64.
+
+        Args:
+            sparql_query (str): the query to execute.
+            param_dict (dict): Dictionary of parameters to substitute.
+            endpoint (str): Name of the endpoint to use.
+            auto_prefix (bool): Whether to automatically add endpoint prefixes.
+            query_name (str): Name of the query if it is a named query.
+            use_cache (bool): Whether to use the query cache if one is configured.
+
+        Returns:
+            pd.DataFrame: the typed query result
+        """
+        sparql_endpoint, sparql_query, final_query = self.prepare_query(
+            sparql_query, param_dict, endpoint, auto_prefix, query_name
+        )
+        # typed columns are cached separately from the list of dicts
+        cache_key = self.get_cache_key(
+            f"{endpoint}#columns", sparql_query, param_dict, use_cache
+        )
+        if cache_key:
+            payload = self.query_cache.get(cache_key, query_name)
+            if payload is not None:
+                QueryMetrics.get_instance().record_cache_hit(query_name, endpoint)
+                return SparqlColumnDecoder.from_payload(payload)
+
+        def fetch():
+            df = self.execute_df(endpoint, sparql_endpoint, final_query, query_name)
+            if cache_key:
+                payload = SparqlColumnDecoder.to_payload(df)
+                self.cache_result(cache_key, payload, query_name, endpoint)
+            return df
+
+        # concurrent identical queries share one request
+        df = SingleFlight.get_instance().do((endpoint, final_query, "df"), fetch)
+        return df
+
+    def query_df_by_name(
+        self,
+        query_name: str,
+        param_dict: dict = {},
+        endpoint: str = "wikidata-qlever",
+        auto_prefix: bool = True,
+        page_size: Optional[int] = None,
+        max_pages: Optional[int] = None,
+        parallelism: Optional[int] = None,
+    ) -> pd.DataFrame:
+        """
+        Get the result of the given named query as a typed DataFrame.
+
+        Args:
+            query_name (str): Name of the query to execute.
+            param_dict (dict): Dictionary of parameters to substitute.
+            endpoint (str): Name of the endpoint to use.
+            auto_prefix (bool): Whether to automatically add endpoint prefixes.
+            page_size (int): the number of rows per page - None for no paging
+                see query_by_name_paged
+            max_pages (int): the maximum number of pages - None for all.
+            parallelism (int): the maximum number of concurrent pages
+                - None for the max_concurrency of the SparqlClientPool.
+
+        Returns:
+            pd.DataFrame: the typed query result
+        """
+        endpoint = self.route(endpoint, query_name)
+        query = self.get_query(query_name)
+        pager = None
+        if page_size:
+            pager = self.get_pager(query_name, endpoint, auto_prefix)
+        if pager is None or not pager.can_page:
+            df = self.query_df(
+                sparql_query=query.query,
+                param_dict=param_dict,
+                endpoint=endpoint,
+                auto_prefix=auto_prefix,
+                query_name=query_name,
+            )
+            return df
+        if parallelism is None:
+            parallelism = SparqlClientPool.get_instance().max_concurrency
+
+        def fetch_page(page: int) -> pd.DataFrame:
+            df = self.query_df(
+                sparql_query=pager.page_query(page, page_size),
+                param_dict=param_dict,
+                endpoint=endpoint,
+                auto_prefix=auto_prefix,
+                query_name=query_name,
+            )
+            return df
+
+        def join(pages: Dict[int, pd.DataFrame], last_page: Optional[int]):
+            dfs = [
+                pages[page]
+                for page in sorted(pages)
+                if last_page is None or page <= last_page
+            ]
+            df = pd.concat(dfs, ignore_index=True) if dfs else pd.DataFrame()
+            return df
+
+        df = QueryPager.fetch(fetch_page, page_size, parallelism, max_pages, join)
+        return df
+
+    def query_arrow(
+        self,
+        sparql_query: str,
+        param_dict: dict = {},
+        endpoint: str = "wikidata-qlever",
+        auto_prefix: bool = True,
+        query_name: Optional[str] = None,
+        use_cache: bool = True,
+    ):
+        """
+        Get the result of the given query as a typed Arrow table
+        - needs the optional pyarrow dependency (velorail[arrow])
+
+        Args:
+            see query_df
+
+        Returns:
+            pyarrow.Table: the typed query result
+        """
+        try:
+            import pyarrow as pa
+        except ImportError as ex:
+            raise ImportError(
+                "query_arrow needs pyarrow - pip install velorail[arrow]"
+            ) from ex
+        df = self.query_df(
+            sparql_query, param_dict, endpoint, auto_prefix, query_name, use_cache
+        )
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        return table
@@ -0,0 +1,220 @@
+"""
+Created on 2026-10-18
+
+@author: wf
+"""
+
+import os
+import re
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional, Tuple
+
+import yaml
+from lodstorage.query import Endpoint, EndpointManager, QueryManager
+from lodstorage.yaml_path import YamlPath
+
+from velorail.prefix_index import PrefixIndex
+
+
+@dataclass(frozen=True)
+class EndpointConfig:
+    """
+    read only endpoint configurations and their parsed prefixes
+    """
+
+    endpoints: Mapping[str, Endpoint]
+    prefixes: Mapping[str, Mapping[str, str]]
+    # names of the endpoints serving the same data by endpoint name
+    mirrors: Mapping[str, Tuple[str, ...]]
+    # prefix tries for URI compaction by endpoint name
+    prefix_indices: Mapping[str, PrefixIndex]
+
+
+class NPQ_Registry:
+    """
+    process wide registry of parsed query and endpoint yaml files
+
+    each file is parsed once and reparsed only when its
+    modification time changes
+    """
+
+    instance = None
+    prefix_pattern = re.compile(
+        r"^prefix\s+(?P<name>\w+):\s+<(?P<uri>[^>]+)>", re.IGNORECASE
+    )
+
+    def __init__(self):
+        """
+        constructor
+        """
+        self.lock = threading.Lock()
+        self.query_managers: Dict[str, Tuple[tuple, QueryManager]] = {}
+        self.endpoint_configs: Dict[Tuple[str, bool], Tuple[tuple, EndpointConfig]] = (
+            {}
+        )
+        self.loads = 0
+
+    @classmethod
+    def get_instance(cls) -> "NPQ_Registry":
+        """
+        get the shared registry
+        """
+        if cls.instance is None:
+            cls.instance = cls()
+        return cls.instance
+
+    @staticmethod
+    def get_signature(yaml_file_name: str, yaml_path: str, with_default: bool) -> tuple:
+        """
+        get the modification time signature of the files
+        lodstorage reads for the given yaml path
+
+        Returns:
+            tuple: (path, mtime) pairs - mtime is None for missing files
+        """
+        signature = []
+        for path in YamlPath.getPaths(yaml_file_name, yaml_path, with_default):
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except FileNotFoundError:
+                mtime = None
+            signature.append((path, mtime))
+        return tuple(signature)
+
+    @classmethod
+    def parse_prefixes(cls, prefix_str: str) -> Tuple[Dict[str, str], str]:
+        """
+        Parse prefixes from string with newlines and prefixes per
+        line into a dictionary
+
+        Args:
+            prefix_str (str): The string containing prefix definitions.
+
+        Returns:
+            tuple: A dictionary mapping prefix names to their URIs and the remaining body.
+        """
+        prefix_dict = {}
+        body = ""
+        for line in prefix_str.splitlines():
+            if match := cls.prefix_pattern.match(line.strip()):
+                name = match.group("name")
+                uri = match.group("uri")
+                prefix_dict[name] = uri
+            else:
+                body += line + "\n"
+        return prefix_dict, body
+
+    def get_query_manager(self, query_yaml: Path) -> QueryManager:
+        """
+        get the shared query manager for the given query yaml file
+
+        Args:
+            query_yaml (Path): path of the yaml file with the named queries
+
+        Returns:
+            QueryManager: the query manager shared by all handlers with
+            a read only queriesByName - the Query objects are shared as well
+        """
+        key = Path(query_yaml).as_posix()
+        signature = self.get_signature("queries.yaml", key, with_default=True)
+        with self.lock:
+            entry = self.query_managers.get(key)
+            if entry is None or entry[0] != signature:
+                query_manager = QueryManager(lang="sparql", queriesPath=key)
+                query_manager.queriesByName = MappingProxyType(
+                    dict(query_manager.queriesByName)
+                )
+                entry = (signature, query_manager)
+                self.query_managers[key] = entry
+                self.loads += 1
+        return entry[1]
+
+    def get_endpoint_config(
+        self, endpoint_yaml: Path, with_default: bool = False
+    ) -> EndpointConfig:
+        """
+        get the shared endpoint configuration for the given endpoint yaml file
+
+        Args:
+            endpoint_yaml (Path): path of the endpoints yaml file
+            with_default (bool): Whether to include default endpoints.
+
+        Returns:
+            EndpointConfig: read only endpoints and prefixes by endpoint name
+        """
+        path = Path(endpoint_yaml).as_posix()
+        key = (path, with_default)
+        signature = self.get_signature("endpoints.yaml", path, with_default)
+        with self.lock:
+            entry = self.endpoint_configs.get(key)
+            if entry is None or entry[0] != signature:
+                endpoint_config = self.load_endpoint_config(path, with_default)
+                entry = (signature, endpoint_config)
+                self.endpoint_configs[key] = entry
+                self.loads += 1
+        return entry[1]
+
+    def load_endpoint_config(self, path: str, with_default: bool) -> EndpointConfig:
+        """
+        parse the given endpoints yaml file and the prefixes of its endpoints
+        """
+        endpoints = EndpointManager.getEndpoints(path, with_default=with_default)
+        prefixes = {}
+        for endpoint_name, endpoint in endpoints.items():
+            prefix_dict = {}
+            if getattr(endpoint, "prefixes", None):
+                prefix_dict, _body = self.parse_prefixes(endpoint.prefixes)
+            prefixes[endpoint_name] = MappingProxyType(prefix_dict)
+        mirrors = {}
+        for yaml_path in YamlPath.getPaths("endpoints.yaml", path, with_default):
+            mirrors.update(self.load_mirrors(yaml_path))
+        endpoint_mirrors = {
+            name: tuple(
+                mirror for mirror in mirrors.get(name, []) if mirror in endpoints
+            )
+            for name in endpoints
+        }
+        prefix_indices = {
+            name: PrefixIndex(prefix_dict) for name, prefix_dict in prefixes.items()
+        }
+        endpoint_config = EndpointConfig(
+            endpoints=MappingProxyType(endpoints),
+            prefixes=MappingProxyType(prefixes),
+            mirrors=MappingProxyType(endpoint_mirrors),
+            prefix_indices=MappingProxyType(prefix_indices),
+        )
+        return endpoint_config
+
+    def load_mirrors(self, yaml_path: str) -> Dict[str, list]:
+        """
+        load the velorail specific mirrors lists which
+        lodstorage does not keep in its Endpoint records
+
+        Args:
+            yaml_path (str): path of an endpoints yaml file
+
+        Returns:
+            dict: the mirror names by endpoint name
+        """
+        with open(yaml_path, "r") as stream:
+            endpoints_yaml = yaml.safe_load(stream) or {}
+        mirrors = {}
+        for name, endpoint_dict in (endpoints_yaml.get("endpoints") or {}).items():
+            if isinstance(endpoint_dict, dict) and "mirrors" in endpoint_dict:
+                mirrors[name] = list(endpoint_dict["mirrors"] or [])
+        return mirrors
+
+    def stats(self) -> Dict[str, Optional[int]]:
+        """
+        get the registry statistics
+        """
+        with self.lock:
+            stats = {
+                "query_files": len(self.query_managers),
+                "endpoint_files": len(self.endpoint_configs),
+                "loads": self.loads,
+            }
+        return stats
@@ -2,8 +2,10 @@
 import json
 import os
 import dataclasses
+import itertools
+import textwrap
 from argparse import ArgumentParser, Namespace
-from typing import Dict, List
+from typing import Dict, Iterable, Iterator, List, Tuple
 
 from lodstorage.query_cmd import QueryCmd
 
@@ -120,15 +122,15 @@ class Osm2WikiConverter:
         args = parser.parse_args()
         return args
 
-    def query_osm_item(self, osm_item: str) -> Dict:
+    def get_query_params(self, osm_item: str) -> Tuple[str, Dict]:
         """
-        Query the given osm_item using SPARQL
+        Get the query name and parameters for the given osm_item
 
         Args:
              osm_item: The osm_item to query
 
         Returns:
-             Dict: The query results as list of dicts
+             Tuple[str, Dict]: the query name and the parameter dict
         """
         if osm_item.startswith("relation"):
             queryName = "ItemNodesGeo"
@@ -152,7 +154,19 @@ class Osm2WikiConverter:
 
         if self.args.debug:
             print(f"Querying osm_item {osm_item}")
+        return queryName, param_dict
+
+    def query_osm_item(self, osm_item: str) -> List[Dict]:
+        """
+        Query the given osm_item using SPARQL
+
+        Args:
+             osm_item: The osm_item to query
 
+        Returns:
+             List[Dict]: The query results as list of dicts
+        """
+        queryName, param_dict = self.get_query_params(osm_item)
         lod = self.query_handler.query_by_name(
             query_name=queryName,
             param_dict=param_dict,
@@ -161,6 +175,43 @@ class Osm2WikiConverter:
         )
         return lod
 
+    def iter_osm_item(self, osm_item: str) -> Iterator[Dict]:
+        """
+        Query the given osm_item using SPARQL streaming the result
+
+        Args:
+             osm_item: The osm_item to query
+
+        Yields:
+             Dict: The next result row
+        """
+        queryName, param_dict = self.get_query_params(osm_item)
+        yield from self.query_handler.iter_query_by_name(
+            query_name=queryName,
+            param_dict=param_dict,
+            endpoint=self.args.endpoint_name,
+            auto_prefix=True,
+        )
+
+    def write_json_rows(self, rows: Iterable[Dict], json_file: str) -> Iterator[Dict]:
+        """
+        Write the given rows as indented JSON list while passing them on
+
+        Args:
+            rows: the rows to write
+            json_file: path of the JSON file
+
+        Yields:
+            Dict: each row after it has been written
+        """
+        with open(json_file, "w") as f:
+            delim = "[\n"
+            for row in rows:
+                f.write(delim + textwrap.indent(json.dumps(row, indent=2), "  "))
+                delim = ",\n"
+                yield row
+            f.write("[]" if delim == "[\n" else "\n]")
+
     def compress_nodes(
         self, nodes: List[Dict], min_distance_m: float = 1000
     ) -> List[Dict]:
@@ -175,13 +226,32 @@ class Osm2WikiConverter:
         Returns:
             List[Dict]: Filtered node data
         """
-        if not nodes or len(nodes) <= 2:
-            return nodes
+        compressed_nodes = list(self.iter_compressed_nodes(nodes, min_distance_m))
+        return compressed_nodes
+
+    def iter_compressed_nodes(
+        self, nodes: Iterable[Dict], min_distance_m: float = 1000
+    ) -> Iterator[Dict]:
+        """
+        Compress the given stream of nodes by skipping ones that are
+        too close together - sequences of up to two nodes are kept as is
+
+        Args:
+            nodes: node data dicts with wkt set
+            min_distance_m: Minimum distance between nodes in meters
+
+        Yields:
+            Dict: the kept nodes
+        """
+        nodes = iter(nodes)
+        head = list(itertools.islice(nodes, 3))
+        if len(head) <= 2:
+            yield from head
+            return
 
-        compressed_nodes = []
         last_lat, last_lon = None, None
 
-        for node in nodes:
+        for node in itertools.chain(head, nodes):
             wkt_node=node["wkt"]
             # get a copy
             wkt=dataclasses.replace(wkt_node)
@@ -195,12 +265,10 @@ class Osm2WikiConverter:
                     # keep reference
                     wkt.lat = lat
                     wkt.lon = lon
-                    compressed_nodes.append(node)
+                    yield node
                     last_lat, last_lon = lat, lon  # Update last kept point
                     break  # Move to the next node after selecting the first valid point
 
-        return compressed_nodes
-
     def set_wkts(self, nodes: List[Dict]):
         """
         Convert loc entries to WKT instances for each node
@@ -212,6 +280,20 @@ class Osm2WikiConverter:
         for node in nodes:
             node["wkt"] = WKT(node["loc"])
 
+    def iter_wkts(self, nodes: Iterable[Dict]) -> Iterator[Dict]:
+        """
+        Set the WKT instance for each node of the given stream
+
+        Args:
+            nodes: node data dicts
+
+        Yields:
+            Dict: the node with wkt set
+        """
+        for node in nodes:
+            node["wkt"] = WKT(node["loc"])
+            yield node
+
     def to_mediawiki(self, osm_item: str, data: Dict) -> str:
         """
         Convert relation data to MediaWiki format
@@ -285,19 +367,20 @@ https://www.openstreetmap.org/{osm_item}
             if not self.test:
                 print(f"Processing osm item {osm_item}")
 
-            # Query and save JSON
-            q_data = self.query_osm_item(osm_item)
+            # Query streaming the rows through saving JSON and compression
+            # so that only the kept nodes are held in memory
+            rows = self.iter_osm_item(osm_item)
             if with_write:
-                with open(json_file, "w") as f:
-                    json.dump(q_data, f, indent=2)
-
-            self.set_wkts(q_data)
+                rows = self.write_json_rows(rows, json_file)
+            nodes = self.iter_wkts(rows)
             if self.args.min_node_distance:
-                c_data = self.compress_nodes(
-                    q_data, min_distance_m=self.args.min_node_distance
+                c_data = list(
+                    self.iter_compressed_nodes(
+                        nodes, min_distance_m=self.args.min_node_distance
+                    )
                 )
             else:
-                c_data = q_data
+                c_data = list(nodes)
 
             # Convert to wiki and save
             wiki = self.to_mediawiki(osm_item, c_data)
@@ -0,0 +1,200 @@
+"""
+Created on 2026-10-18
+
+@author: wf
+"""
+
+import math
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+
+@dataclass
+class PredicateStats:
+    """
+    the statistics of a predicate of an endpoint as far as observed
+    """
+
+    predicate: str
+    # number of distinct subjects/objects observed with the predicate
+    subjects: int = 0
+    objects: int = 0
+    # number of triples observed from the subject/object side
+    subject_triples: int = 0
+    object_triples: int = 0
+    max_per_subject: int = 0
+    max_per_object: int = 0
+
+    @property
+    def values_per_subject(self) -> Optional[int]:
+        """
+        the expected number of values of a subject - rounded up
+        """
+        per_subject = None
+        if self.subjects:
+            per_subject = math.ceil(self.subject_triples / self.subjects)
+        return per_subject
+
+
+class PredicateCatalog:
+    """
+    SQLite backed persistent catalog of per endpoint predicate statistics
+    gathered from the summary exploration queries
+
+    each observation is the number of triples of a predicate for a single
+    subject or object node so that repeated explorations of the same
+    node replace instead of inflate the statistics
+    """
+
+    SUBJECT = "subject"
+    OBJECT = "object"
+
+    def __init__(self, db_path: Optional[str] = None):
+        """
+        constructor
+
+        Args:
+            db_path (str): path of the SQLite database file
+                - default: ~/.velorail/predicate_catalog.db
+        """
+        if db_path is None:
+            db_path = PredicateCatalog.default_path()
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(
+            self.db_path.as_posix(), check_same_thread=False
+        )
+        self.connection.execute(
+            """CREATE TABLE IF NOT EXISTS predicate_observation (
+                endpoint TEXT,
+                predicate TEXT,
+                node TEXT,
+                position TEXT,
+                count INTEGER,
+                updated REAL,
+                PRIMARY KEY (endpoint, predicate, node, position)
+            )"""
+        )
+        self.connection.commit()
+
+    @classmethod
+    def default_path(cls) -> str:
+        """
+        get the default path of the catalog database
+        """
+        path = Path.home() / ".velorail" / "predicate_catalog.db"
+        return path.as_posix()
+
+    def observe(
+        self, endpoint: str, observations: Iterable[tuple], position: str
+    ) -> int:
+        """
+        store the given observations
+
+        Args:
+            endpoint (str): name of the endpoint
+            observations (Iterable): (predicate, node, count) tuples
+            position (str): SUBJECT if the node is the subject of the
+                counted triples else OBJECT
+
+        Returns:
+            int: the number of observations stored
+        """
+        now = time.time()
+        rows = [
+            (endpoint, predicate, node, position, int(count), now)
+            for predicate, node, count in observations
+        ]
+        with self.lock:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO predicate_observation VALUES (?,?,?,?,?,?)",
+                rows,
+            )
+            self.connection.commit()
+        return len(rows)
+
+    def observe_summary(
+        self, endpoint: str, node: str, triple_pos: str, lod: List[dict]
+    ) -> int:
+        """
+        store the result of a summary exploration query
+
+        Args:
+            endpoint (str): name of the endpoint
+            node (str): the URI of the explored node
+            triple_pos (str): the position of the explored node
+                - "subject", "predicate" or "object"
+            lod (list): the ?p/?s and ?count records of the summary
+
+        Returns:
+            int: the number of observations stored
+        """
+        if triple_pos == "predicate":
+            observations = [(node, record["s"], record["count"]) for record in lod]
+            position = self.SUBJECT
+        else:
+            observations = [(record["p"], node, record["count"]) for record in lod]
+            position = self.SUBJECT if triple_pos == "subject" else self.OBJECT
+        count = self.observe(endpoint, observations, position)
+        return count
+
+    def get_stats(
+        self, endpoint: str, predicates: Iterable[str]
+    ) -> Dict[str, PredicateStats]:
+        """
+        get the statistics of the given predicates
+
+        Args:
+            endpoint (str): name of the endpoint
+            predicates (Iterable): the predicate URIs
+
+        Returns:
+            dict: the statistics by predicate - only for observed predicates
+        """
+        predicates = list(dict.fromkeys(predicates))
+        stats = {}
+        if not predicates:
+            return stats
+        placeholders = ",".join("?" * len(predicates))
+        with self.lock:
+            rows = self.connection.execute(
+                f"""SELECT predicate, position, COUNT(*), SUM(count), MAX(count)
+                FROM predicate_observation
+                WHERE endpoint=? AND predicate IN ({placeholders})
+                GROUP BY predicate, position""",
+                (endpoint, *predicates),
+            ).fetchall()
+        for predicate, position, nodes, triples, max_count in rows:
+            predicate_stats = stats.setdefault(predicate, PredicateStats(predicate))
+            if position == self.SUBJECT:
+                predicate_stats.subjects = nodes
+                predicate_stats.subject_triples = triples
+                predicate_stats.max_per_subject = max_count
+            else:
+                predicate_stats.objects = nodes
+                predicate_stats.object_triples = triples
+                predicate_stats.max_per_object = max_count
+        return stats
+
+    def stats(self) -> dict:
+        """
+        get the catalog statistics
+
+        Returns:
+            dict: the number of observed predicates and observations by endpoint
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                """SELECT endpoint, COUNT(DISTINCT predicate), COUNT(*)
+                FROM predicate_observation GROUP BY endpoint"""
+            ).fetchall()
+        stats = {
+            endpoint: {"predicates": predicates, "observations": observations}
+            for endpoint, predicates, observations in rows
+        }
+        return stats
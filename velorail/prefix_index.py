@@ -0,0 +1,113 @@
+"""
+Created on 2026-10-18
+
+@author: wf
+"""
+
+from typing import Dict, Iterable, List, Mapping, Optional
+
+
+class PrefixIndex:
+    """
+    character trie of the namespace URIs of a prefix dict for
+    longest match compaction of URIs and expansion of prefixed names
+    """
+
+    # marks the end of a namespace URI in a trie node
+    END = ""
+
+    def __init__(self, prefixes: Optional[Mapping[str, str]] = None):
+        """
+        constructor
+
+        Args:
+            prefixes (Mapping): namespace URIs by prefix name - the first
+                prefix wins if several share the same URI
+        """
+        self.prefixes: Dict[str, str] = dict(prefixes or {})
+        self.root: dict = {}
+        for prefix, uri in self.prefixes.items():
+            node = self.root
+            for char in uri:
+                node = node.setdefault(char, {})
+            node.setdefault(self.END, prefix)
+
+    def __len__(self) -> int:
+        return len(self.prefixes)
+
+    def compact_uri(self, uri: str) -> Optional[str]:
+        """
+        compact the given URI with the longest matching namespace
+
+        Args:
+            uri (str): the full URI
+
+        Returns:
+            str: the prefixed name e.g. wdt:P31 or None if no namespace matches
+        """
+        node = self.root
+        best_prefix = None
+        best_len = 0
+        for i, char in enumerate(uri):
+            node = node.get(char)
+            if node is None:
+                break
+            prefix = node.get(self.END)
+            if prefix is not None:
+                best_prefix = prefix
+                best_len = i + 1
+        qname = None
+        if best_prefix is not None:
+            qname = f"{best_prefix}:{uri[best_len:]}"
+        return qname
+
+    def compact(self, uris: Iterable[str]) -> List[Optional[str]]:
+        """
+        compact the given URIs - each distinct URI is looked up once
+
+        Args:
+            uris (Iterable): the full URIs
+
+        Returns:
+            list: the prefixed names - None where no namespace matches
+        """
+        qnames = {}
+        result = []
+        for uri in uris:
+            qname = qnames.get(uri, qnames)
+            if qname is qnames:
+                qname = self.compact_uri(uri)
+                qnames[uri] = qname
+            result.append(qname)
+        return result
+
+    def expand_qname(self, qname: str) -> Optional[str]:
+        """
+        expand the given prefixed name
+
+        Args:
+            qname (str): the prefixed name e.g. wd:Q80
+
+        Returns:
+            str: the full URI or None if the prefix is unknown
+        """
+        prefix, sep, local_name = qname.partition(":")
+        uri = None
+        if sep:
+            namespace = self.prefixes.get(prefix)
+            if namespace is not None:
+                uri = f"{namespace}{local_name}"
+        return uri
+
+    def expand(self, qnames: Iterable[str]) -> List[Optional[str]]:
+        """
+        expand the given prefixed names
+
+        Args:
+            qnames (Iterable): the prefixed names
+
+        Returns:
+            list: the full URIs - None where the prefix is unknown
+        """
+        uris = [self.expand_qname(qname) for qname in qnames]
+        return uris
@@ -0,0 +1,79 @@
+"""
+Created on 2026-10-18
+
+@author: wf
+"""
+
+import re
+from functools import lru_cache
+from typing import FrozenSet
+
+
+class PrefixScanner:
+    """
+    single pass tokenizer finding the prefixes of the prefixed names
+    a SPARQL query actually references
+
+    comments, string literals, IRIs and variables are skipped so that
+    e.g. the scheme of <http://...> or a time in a string literal
+    does not count as a prefix
+    """
+
+    token_pattern = re.compile(
+        r"""
+        \#[^\n]*                                    # comment
+        | \"\"\"(?:[^"\\]|\\.|"(?!""))*\"\"\"       # long string literals
+        | '''(?:[^'\\]|\\.|'(?!''))*'''
+        | "(?:[^"\\\n]|\\.)*"                       # string literals
+        | '(?:[^'\\\n]|\\.)*'
+        | <[^<>"{}|^`\\\s]*>                        # IRIs
+        | [?$]\w+                                   # variables
+        | (?<![\w.:-])(?P<prefix>[A-Za-z](?:[\w.-]*[\w-])?)?:  # prefixed names
+        """,
+        re.VERBOSE,
+    )
+
+    @classmethod
+    @lru_cache(maxsize=1024)
+    def scan(cls, sparql: str) -> FrozenSet[str]:
+        """
+        get the prefixes referenced by prefixed names in the given query text
+
+        Args:
+            sparql (str): the query body without its PREFIX declarations
+
+        Returns:
+            frozenset: the prefix names - "" for the default prefix
+        """
+        prefixes = set()
+        for match in cls.token_pattern.finditer(sparql):
+            token = match.group(0)
+            if token.endswith(":") and not token.startswith(("#", '"', "'", "<")):
+                prefixes.add(match.group("prefix") or "")
+        return frozenset(prefixes)
+
+    @classmethod
+    def mask(cls, sparql: str, literals: bool = True) -> str:
+        """
+        blank out the comments and optionally the contents of the string
+        literals of the given query so that keywords and braces can be
+        searched in the remaining text - positions stay the same
+
+        Args:
+            sparql (str): the query text
+            literals (bool): whether to also blank the string literals
+
+        Returns:
+            str: the masked query text
+        """
+
+        def blank(match) -> str:
+            token = match.group(0)
+            if token.startswith("#"):
+                token = " " * len(token)
+            elif literals and token.startswith(('"', "'")):
+                token = token[0] + " " * (len(token) - 2) + token[-1]
+            return token
+
+        masked = cls.token_pattern.sub(blank, sparql)
+        return masked
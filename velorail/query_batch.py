@@ -0,0 +1,173 @@
+"""
+Created on 2026-10-18
+
+@author: wf
+"""
+
+import re
+from typing import Dict, List, Optional
+
+from lodstorage.params import Params
+
+
+class QueryBatcher:
+    """
+    rewrite a single entity parameterized query template into
+    a query for many parameter sets by binding the parameterized
+    terms via a VALUES block with a batch index column
+    """
+
+    batch_var = "npq_batch"
+    param_pattern = re.compile(r"{{\s*(\w+)\s*}}")
+    # a term containing a parameter e.g. wd:{{qid}}, "{{role}}" or {{south}}
+    term_pattern = re.compile(r"""[^\s(){},;]*{{\s*\w+\s*}}[^\s(){},;]*""")
+    values_pattern = re.compile(
+        r"VALUES\s*\((?P<vars>[^)]*)\)\s*\{\s*\((?P<row>[^)]*)\)\s*\}", re.IGNORECASE
+    )
+    select_pattern = re.compile(
+        r"\bSELECT\s+(?:(?:DISTINCT|REDUCED)\s+)?", re.IGNORECASE
+    )
+    where_pattern = re.compile(r"\bWHERE\s*\{|\{", re.IGNORECASE)
+    aggregate_pattern = re.compile(
+        r"\b(COUNT|SUM|AVG|MIN|MAX|SAMPLE|GROUP_CONCAT)\s*\(", re.IGNORECASE
+    )
+
+    def __init__(self, sparql_query: str):
+        """
+        constructor
+
+        Args:
+            sparql_query (str): the prefixed query template with {{param}} placeholders
+        """
+        self.sparql_query = sparql_query
+        self.values_match = None
+        self.terms: List[str] = []
+        self.reason = self.analyze()
+
+    @property
+    def can_batch(self) -> bool:
+        """
+        True if the template can be rewritten
+        """
+        return self.reason is None
+
+    def analyze(self) -> Optional[str]:
+        """
+        analyze my template
+
+        Returns:
+            str: the reason why the template can not be batched or None
+        """
+        query = self.sparql_query
+        if not self.param_pattern.search(query):
+            return "query has no parameters"
+        if len(self.select_pattern.findall(query)) != 1:
+            return "query needs exactly one SELECT"
+        if re.search(r"\b(LIMIT|OFFSET)\b", query, re.IGNORECASE):
+            return "LIMIT/OFFSET would apply to the whole batch"
+        has_group_by = re.search(r"\bGROUP\s+BY\b", query, re.IGNORECASE)
+        if self.aggregate_pattern.search(query) and not has_group_by:
+            return "aggregation without GROUP BY"
+        for match in self.values_pattern.finditer(query):
+            if self.param_pattern.search(match.group("row")):
+                if self.values_match is not None:
+                    return "more than one parameterized VALUES block"
+                self.values_match = match
+        outside = query
+        if self.values_match:
+            outside = query[: self.values_match.start()] + query[self.values_match.end() :]
+        for term in self.term_pattern.findall(outside):
+            term = term.rstrip(".")
+            if term not in self.terms:
+                self.terms.append(term)
+        return None
+
+    def term_var(self, index: int) -> str:
+        """
+        get the variable name for the term with the given index
+        """
+        return f"npq_t{index}"
+
+    def bind(self, template: str, param_dict: Dict) -> str:
+        """
+        apply the given parameters to a part of the template with auditing
+        """
+        params = Params(template)
+        value = params.apply_parameters_with_check(param_dict)
+        return value
+
+    def batch_query(self, param_dicts: List[Dict]) -> str:
+        """
+        get the query for the given list of parameter sets
+
+        Args:
+            param_dicts (list): the parameter sets in batch index order
+
+        Returns:
+            str: the rewritten query
+        """
+        if not self.can_batch:
+            raise ValueError(f"query can not be batched: {self.reason}")
+        query = self.sparql_query
+        variables = [f"?{self.batch_var}"]
+        if self.values_match:
+            variables.extend(self.values_match.group("vars").split())
+        variables.extend(f"?{self.term_var(i)}" for i in range(len(self.terms)))
+        rows = []
+        for i, param_dict in enumerate(param_dicts):
+            row = [str(i)]
+            if self.values_match:
+                row.append(self.bind(self.values_match.group("row").strip(), param_dict))
+            row.extend(self.bind(term, param_dict) for term in self.terms)
+            rows.append(f"    ({' '.join(row)})")
+        values_block = (
+            f"VALUES ({' '.join(variables)}) {{\n" + "\n".join(rows) + "\n  }"
+        )
+        if self.values_match:
+            start, end = self.values_match.span()
+            body = query[:start] + values_block + query[end:]
+        else:
+            where = self.where_pattern.search(
+                query, self.select_pattern.search(query).end()
+            )
+            body = (
+                query[: where.end()] + f"\n  {values_block}\n" + query[where.end() :]
+            )
+        # replace the terms longest first so that contained terms stay intact
+        for i, term in sorted(
+            enumerate(self.terms), key=lambda item: len(item[1]), reverse=True
+        ):
+            body = re.sub(
+                r"(?<![^\s(){},;])" + re.escape(term) + r"(?![^\s(){},;.])",
+                f"?{self.term_var(i)}",
+                body,
+            )
+        select = self.select_pattern.search(body)
+        body = body[: select.end()] + f"?{self.batch_var} " + body[select.end() :]
+        body = re.sub(
+            r"\bGROUP\s+BY\b",
+            f"GROUP BY ?{self.batch_var}",
+            body,
+            flags=re.IGNORECASE,
+        )
+        return body
+
+    def split(self, lod: List[dict], count: int) -> List[List[dict]]:
+        """
+        split the result of a batch query back per parameter set
+
+        Args:
+            lod (list): the batch query result
+            count (int): the number of parameter sets in the batch
+
+        Returns:
+            list: one list of dicts per parameter set
+        """
+        lods = [[] for _i in range(count)]
+        term_vars = {self.term_var(i) for i in range(len(self.terms))}
+        for record in lod:
+            index = int(record.pop(self.batch_var))
+            for var in term_vars:
+                record.pop(var, None)
+            lods[index].append(record)
+        return lods
@@ -0,0 +1,275 @@
+"""
+Created on 2026-10-18
+
+@author: wf
+"""
+
+import datetime
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+class QueryCache:
+    """
+    SQLite backed persistent cache for SPARQL query results
+
+    entries are keyed by endpoint, canonicalized query text and parameters,
+    stored as compressed JSON, expire after a per named query time to live
+    and are evicted least recently used first when the size limits are hit
+    """
+
+    instance = None
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        default_ttl: float = 3600,
+        max_entries: int = 10000,
+        max_bytes: int = 256 * 1024 * 1024,
+    ):
+        """
+        constructor
+
+        Args:
+            db_path (str): path of the SQLite database file - default: ~/.velorail/sparql_cache.db
+            default_ttl (float): time to live in seconds for queries without explicit ttl
+            max_entries (int): maximum number of cached results
+            max_bytes (int): maximum total size of the compressed payloads
+        """
+        if db_path is None:
+            db_path = QueryCache.default_path()
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = {}
+        self.misses = {}
+        self.connection = sqlite3.connect(
+            self.db_path.as_posix(), check_same_thread=False
+        )
+        self.connection.execute(
+            """CREATE TABLE IF NOT EXISTS query_cache (
+                key TEXT PRIMARY KEY,
+                query_name TEXT,
+                endpoint TEXT,
+                payload BLOB,
+                size INTEGER,
+                created REAL,
+                expires REAL,
+                last_access REAL
+            )"""
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS idx_last_access ON query_cache(last_access)"
+        )
+        self.connection.commit()
+
+    @classmethod
+    def default_path(cls) -> str:
+        """
+        get the default path of the cache database
+        """
+        path = Path.home() / ".velorail" / "sparql_cache.db"
+        return path.as_posix()
+
+    @classmethod
+    def get_instance(cls) -> "QueryCache":
+        """
+        get the shared cache using the default path
+        """
+        if cls.instance is None:
+            cls.instance = cls()
+        return cls.instance
+
+    @staticmethod
+    def canonicalize(sparql_query: str) -> str:
+        """
+        canonicalize the given query text by removing indentation,
+        trailing whitespace and empty lines
+        """
+        lines = [line.strip() for line in sparql_query.splitlines()]
+        canonical = "\n".join(line for line in lines if line)
+        return canonical
+
+    def get_key(self, endpoint: str, sparql_query: str, param_dict: dict) -> str:
+        """
+        get the cache key for the given endpoint, query and parameters
+
+        Args:
+            endpoint (str): name of the endpoint
+            sparql_query (str): the query text
+            param_dict (dict): the parameters to be applied
+
+        Returns:
+            str: a sha256 hex digest
+        """
+        params = sorted((param_dict or {}).items())
+        key_json = json.dumps(
+            [endpoint, self.canonicalize(sparql_query), params], default=str
+        )
+        key = hashlib.sha256(key_json.encode("utf-8")).hexdigest()
+        return key
+
+    @staticmethod
+    def encode_value(value):
+        """
+        JSON encoding for the date values the SPARQL decoder produces
+        """
+        if isinstance(value, datetime.datetime):
+            return {"__datetime__": value.isoformat()}
+        if isinstance(value, datetime.date):
+            return {"__date__": value.isoformat()}
+        return str(value)
+
+    @staticmethod
+    def decode_value(obj: dict):
+        """
+        JSON object hook reverting encode_value
+        """
+        if "__datetime__" in obj:
+            return datetime.datetime.fromisoformat(obj["__datetime__"])
+        if "__date__" in obj:
+            return datetime.date.fromisoformat(obj["__date__"])
+        return obj
+
+    def count(self, counters: Dict[str, int], query_name: Optional[str]):
+        """
+        increment the counter for the given query name
+        """
+        name = query_name or "?"
+        counters[name] = counters.get(name, 0) + 1
+
+    def get(self, key: str, query_name: Optional[str] = None) -> Optional[List[dict]]:
+        """
+        get the cached result for the given key
+
+        Args:
+            key (str): the cache key
+            query_name (str): the name of the query for the hit/miss statistics
+
+        Returns:
+            list: the cached list of dicts or None if missing or expired
+        """
+        now = time.time()
+        lod = None
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT payload, expires FROM query_cache WHERE key=?", (key,)
+            ).fetchone()
+            if row is not None:
+                payload, expires = row
+                if expires < now:
+                    self.connection.execute(
+                        "DELETE FROM query_cache WHERE key=?", (key,)
+                    )
+                else:
+                    self.connection.execute(
+                        "UPDATE query_cache SET last_access=? WHERE key=?", (now, key)
+                    )
+                    lod = json.loads(
+                        zlib.decompress(payload).decode("utf-8"),
+                        object_hook=self.decode_value,
+                    )
+                self.connection.commit()
+            self.count(self.hits if lod is not None else self.misses, query_name)
+        return lod
+
+    def put(
+        self,
+        key: str,
+        lod: List[dict],
+        query_name: Optional[str] = None,
+        endpoint: Optional[str] = None,
+        ttl: Optional[float] = None,
+    ):
+        """
+        store the given result
+
+        Args:
+            key (str): the cache key
+            lod (list): the list of dicts to store
+            query_name (str): the name of the query
+            endpoint (str): the name of the endpoint
+            ttl (float): time to live in seconds - default: my default_ttl
+        """
+        if ttl is None:
+            ttl = self.default_ttl
+        if ttl <= 0:
+            return
+        payload = zlib.compress(
+            json.dumps(lod, default=self.encode_value).encode("utf-8")
+        )
+        if len(payload) > self.max_bytes:
+            return
+        now = time.time()
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO query_cache VALUES (?,?,?,?,?,?,?,?)",
+                (key, query_name, endpoint, payload, len(payload), now, now + ttl, now),
+            )
+            self.evict()
+            self.connection.commit()
+
+    def evict(self):
+        """
+        remove expired entries and then the least recently used ones
+        until the size limits are met - needs to be called with the lock held
+        """
+        self.connection.execute(
+            "DELETE FROM query_cache WHERE expires < ?", (time.time(),)
+        )
+        entries, total_bytes = self.connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size),0) FROM query_cache"
+        ).fetchone()
+        if entries <= self.max_entries and total_bytes <= self.max_bytes:
+            return
+        rows = self.connection.execute(
+            "SELECT key, size FROM query_cache ORDER BY last_access"
+        ).fetchall()
+        evict_keys = []
+        for key, size in rows:
+            if entries <= self.max_entries and total_bytes <= self.max_bytes:
+                break
+            evict_keys.append((key,))
+            entries -= 1
+            total_bytes -= size
+        self.connection.executemany("DELETE FROM query_cache WHERE key=?", evict_keys)
+
+    def clear(self):
+        """
+        remove all entries and reset the statistics
+        """
+        with self.lock:
+            self.connection.execute("DELETE FROM query_cache")
+            self.connection.commit()
+            self.hits.clear()
+            self.misses.clear()
+
+    def stats(self) -> dict:
+        """
+        get the cache statistics
+
+        Returns:
+            dict: entries, bytes and the hit/miss counters per query name
+        """
+        with self.lock:
+            entries, total_bytes = self.connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size),0) FROM query_cache"
+            ).fetchone()
+            stats = {
+                "entries": entries,
+                "bytes": total_bytes,
+                "hits": sum(self.hits.values()),
+                "misses": sum(self.misses.values()),
+                "hits_by_query": dict(self.hits),
+                "misses_by_query": dict(self.misses),
+            }
+        return stats
@@ -0,0 +1,233 @@
+"""
+Created on 2026-10-18
+
+@author: wf
+"""
+
+import bisect
+import threading
+from typing import Dict, List, Optional, Tuple
+
+
+class QueryStats:
+    """
+    counters and wall time histogram of a single query on a single endpoint
+    """
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        """
+        constructor
+
+        Args:
+            buckets (tuple): the sorted upper bounds of the histogram buckets in seconds
+        """
+        self.buckets = buckets
+        # the last count is for the +Inf bucket
+        self.bucket_counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.seconds = 0.0
+        self.rows = 0
+        self.bytes = 0
+        self.errors = 0
+        self.cache_hits = 0
+
+    def observe(self, seconds: float, rows: int, size: int):
+        """
+        observe a successful execution
+        """
+        self.bucket_counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.seconds += seconds
+        self.rows += rows
+        self.bytes += size
+
+    def as_dict(self) -> dict:
+        """
+        get my values as a JSON compatible dict
+        with cumulative bucket counts
+        """
+        cumulative = []
+        total = 0
+        for count in self.bucket_counts:
+            total += count
+            cumulative.append(total)
+        buckets = {str(le): count for le, count in zip(self.buckets, cumulative)}
+        buckets["+Inf"] = cumulative[-1]
+        record = {
+            "count": self.count,
+            "seconds": round(self.seconds, 6),
+            "avg_seconds": round(self.seconds / self.count, 6) if self.count else None,
+            "rows": self.rows,
+            "bytes": self.bytes,
+            "errors": self.errors,
+            "cache_hits": self.cache_hits,
+            "buckets": buckets,
+        }
+        return record
+
+
+class QueryMetrics:
+    """
+    process wide latency, row count and payload metrics
+    by query name and endpoint
+
+    recording is a dict lookup and a few increments under a lock
+    so that it can stay switched on in production
+    """
+
+    instance = None
+    adhoc = "adhoc"
+    default_buckets = (
+        0.005,
+        0.01,
+        0.025,
+        0.05,
+        0.1,
+        0.25,
+        0.5,
+        1.0,
+        2.5,
+        5.0,
+        10.0,
+        30.0,
+        60.0,
+    )
+
+    def __init__(self, buckets: Tuple[float, ...] = default_buckets):
+        """
+        constructor
+
+        Args:
+            buckets (tuple): the upper bounds of the wall time histogram buckets in seconds
+        """
+        self.buckets = tuple(sorted(buckets))
+        self.lock = threading.Lock()
+        self.query_stats: Dict[Tuple[str, str], QueryStats] = {}
+
+    @classmethod
+    def get_instance(cls) -> "QueryMetrics":
+        """
+        get the shared metrics
+        """
+        if cls.instance is None:
+            cls.instance = cls()
+        return cls.instance
+
+    def get_stats(self, query_name: Optional[str], endpoint: str) -> QueryStats:
+        """
+        get the stats for the given query and endpoint - the lock must be held
+        """
+        key = (query_name or self.adhoc, endpoint)
+        stats = self.query_stats.get(key)
+        if stats is None:
+            stats = QueryStats(self.buckets)
+            self.query_stats[key] = stats
+        return stats
+
+    def record(
+        self,
+        query_name: Optional[str],
+        endpoint: str,
+        seconds: float,
+        rows: int = 0,
+        size: int = 0,
+    ):
+        """
+        record a successful query execution
+
+        Args:
+            query_name (str): name of the query - None for ad hoc queries
+            endpoint (str): name of the endpoint
+            seconds (float): the wall time of the execution
+            rows (int): the number of rows returned
+            size (int): the number of bytes received
+        """
+        with self.lock:
+            self.get_stats(query_name, endpoint).observe(seconds, rows, size)
+
+    def record_error(self, query_name: Optional[str], endpoint: str):
+        """
+        record a failed query execution
+        """
+        with self.lock:
+            self.get_stats(query_name, endpoint).errors += 1
+
+    def record_cache_hit(self, query_name: Optional[str], endpoint: str):
+        """
+        record a query answered from the query cache
+        """
+        with self.lock:
+            self.get_stats(query_name, endpoint).cache_hits += 1
+
+    def clear(self):
+        """
+        reset all metrics
+        """
+        with self.lock:
+            self.query_stats.clear()
+
+    def to_json(self) -> List[dict]:
+        """
+        get the metrics as a list of records sorted by query and endpoint
+        """
+        with self.lock:
+            records = []
+            for (query_name, endpoint), stats in sorted(self.query_stats.items()):
+                record = {"query": query_name, "endpoint": endpoint}
+                record.update(stats.as_dict())
+                records.append(record)
+        return records
+
+    @staticmethod
+    def escape(label: str) -> str:
+        """
+        escape the given Prometheus label value
+        """
+        label = label.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        return label
+
+    def get_labels(self, record: dict) -> str:
+        """
+        get the Prometheus labels of the given metrics record
+        """
+        query_name = self.escape(record["query"])
+        endpoint = self.escape(record["endpoint"])
+        labels = f'query="{query_name}",endpoint="{endpoint}"'
+        return labels
+
+    def to_prometheus(self) -> str:
+        """
+        get the metrics in the Prometheus text exposition format
+        """
+        counters = [
+            ("rows", "rows returned"),
+            ("bytes", "bytes received"),
+            ("errors", "failed executions"),
+            ("cache_hits", "results served from the query cache"),
+        ]
+        records = self.to_json()
+        lines = [
+            "# HELP velorail_query_duration_seconds wall time of SPARQL query executions",
+            "# TYPE velorail_query_duration_seconds histogram",
+        ]
+        for record in records:
+            labels = self.get_labels(record)
+            for le, count in record["buckets"].items():
+                lines.append(
+                    f'velorail_query_duration_seconds_bucket{{{labels},le="{le}"}} {count}'
+                )
+            lines.append(
+                f"velorail_query_duration_seconds_sum{{{labels}}} {record['seconds']}"
+            )
+            lines.append(
+                f"velorail_query_duration_seconds_count{{{labels}}} {record['count']}"
+            )
+        for counter, help_text in counters:
+            name = f"velorail_query_{counter}_total"
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for record in records:
+                labels = self.get_labels(record)
+                lines.append(f"{name}{{{labels}}} {record[counter]}")
+        text = "\n".join(lines) + "\n"
+        return text
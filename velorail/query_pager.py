@@ -0,0 +1,268 @@
+"""
+Created on 2026-10-18
+
+@author: wf
+"""
+
+import asyncio
+import re
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from velorail.prefix_scanner import PrefixScanner
+
+
+class QueryPager:
+    """
+    rewrite a query template into LIMIT/OFFSET pages with a stable
+    ORDER BY and fetch the pages concurrently
+    """
+
+    select_pattern = re.compile(
+        r"\bSELECT\s+(?:(?:DISTINCT|REDUCED)\s+)?(?P<projection>.*?)\s*(?:\bWHERE\b|\{)",
+        re.IGNORECASE | re.DOTALL,
+    )
+    alias_pattern = re.compile(r"\bAS\s+\?(\w+)\s*\)", re.IGNORECASE)
+    var_pattern = re.compile(r"\?(\w+)")
+    order_pattern = re.compile(r"\bORDER\s+BY\b", re.IGNORECASE)
+    limit_pattern = re.compile(r"\b(LIMIT|OFFSET)\b", re.IGNORECASE)
+
+    def __init__(self, sparql_query: str):
+        """
+        constructor
+
+        Args:
+            sparql_query (str): the prefixed query template
+        """
+        self.sparql_query = sparql_query
+        self.variables: List[str] = []
+        self.body_end = len(sparql_query)
+        self.reason = self.analyze()
+
+    @property
+    def can_page(self) -> bool:
+        """
+        True if the template can be paginated
+        """
+        return self.reason is None
+
+    def get_projection(self, projection: str) -> List[str]:
+        """
+        get the names of the projected variables of the given SELECT clause
+
+        Args:
+            projection (str): the text between SELECT and WHERE
+
+        Returns:
+            list: the variable names in projection order
+        """
+        depth = 0
+        group = ""
+        plain = ""
+        for char in projection:
+            if char == "(":
+                depth += 1
+            if depth > 0:
+                group += char
+            else:
+                plain += char
+            if char == ")":
+                depth -= 1
+                if depth == 0:
+                    # expressions (... AS ?var) project their alias only
+                    if alias := self.alias_pattern.search(group):
+                        plain += f" ?{alias.group(1)} "
+                    group = ""
+        variables = []
+        for var in self.var_pattern.findall(plain):
+            if var not in variables:
+                variables.append(var)
+        return variables
+
+    def analyze(self) -> Optional[str]:
+        """
+        analyze my template
+
+        Returns:
+            str: the reason why the template can not be paginated or None
+        """
+        # comments and string literals may contain keywords and braces
+        query = PrefixScanner.mask(self.sparql_query)
+        match = self.select_pattern.search(query)
+        if not match:
+            return "query has no SELECT"
+        self.variables = self.get_projection(match.group("projection"))
+        if not self.variables:
+            return "SELECT * has no stable order"
+        # solution modifiers follow the last closing brace
+        self.body_end = query.rfind("}") + 1
+        tail = query[self.body_end :]
+        if self.limit_pattern.search(tail):
+            return "query has its own LIMIT/OFFSET"
+        return None
+
+    def ordered_query(self) -> str:
+        """
+        get my template with an ORDER BY that is stable across pages
+        by extending an existing ORDER BY with all projected variables
+        """
+        body = self.sparql_query[: self.body_end]
+        # a trailing comment would swallow the appended variables
+        tail = PrefixScanner.mask(self.sparql_query, literals=False)[self.body_end :]
+        query = f"{body}{tail.rstrip()}"
+        order_vars = " ".join(f"?{var}" for var in self.variables)
+        if self.order_pattern.search(PrefixScanner.mask(tail)):
+            ordered = f"{query} {order_vars}"
+        else:
+            ordered = f"{query}\nORDER BY {order_vars}"
+        return ordered
+
+    def page_query(self, page: int, page_size: int) -> str:
+        """
+        get the query for the given page
+
+        Args:
+            page (int): the zero based page number
+            page_size (int): the number of rows per page
+
+        Returns:
+            str: the query with ORDER BY, LIMIT and OFFSET
+        """
+        if not self.can_page:
+            raise ValueError(f"query can not be paginated: {self.reason}")
+        offset = page * page_size
+        query = f"{self.ordered_query()}\nLIMIT {page_size}\nOFFSET {offset}"
+        return query
+
+    @staticmethod
+    def join(pages: Dict[int, List[dict]], last_page: Optional[int]) -> List[dict]:
+        """
+        stitch the fetched pages together in order up to the given last page
+        """
+        lod = []
+        for page in sorted(pages):
+            if last_page is not None and page > last_page:
+                break
+            lod.extend(pages[page])
+        return lod
+
+    @classmethod
+    def fetch(
+        cls,
+        fetch_page: Callable[[int], List[dict]],
+        page_size: int,
+        parallelism: int,
+        max_pages: Optional[int] = None,
+        join: Optional[Callable[[Dict[int, List[dict]], Optional[int]], list]] = None,
+    ) -> List[dict]:
+        """
+        fetch pages with at most parallelism pages in flight
+        until a page comes back short - requests that are already
+        running are waited for so none of them outlives the call
+
+        Args:
+            fetch_page (Callable): function getting the rows of the given page number
+            page_size (int): the number of rows per page
+            parallelism (int): the maximum number of concurrent page requests
+            max_pages (int): the maximum number of pages - None for all
+            join (Callable): function(pages, last_page) stitching the pages
+                together - default: join for lists of dicts
+
+        Returns:
+            list: the rows of all pages in order
+        """
+        pages = {}
+        in_flight = {}
+        next_page = 0
+        last_page = None
+        executor = ThreadPoolExecutor(max_workers=parallelism)
+        try:
+            while True:
+                while (
+                    len(in_flight) < parallelism
+                    and last_page is None
+                    and (max_pages is None or next_page < max_pages)
+                ):
+                    in_flight[next_page] = executor.submit(fetch_page, next_page)
+                    next_page += 1
+                if not in_flight:
+                    break
+                wait(in_flight.values(), return_when=FIRST_COMPLETED)
+                for page, future in sorted(in_flight.items()):
+                    if future.done():
+                        del in_flight[page]
+                        pages[page] = future.result()
+                        if len(pages[page]) < page_size:
+                            if last_page is None or page < last_page:
+                                last_page = page
+                if last_page is not None:
+                    # pages after a short page are empty
+                    for page in [p for p in in_flight if p > last_page]:
+                        in_flight.pop(page).cancel()
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+        join = join or cls.join
+        return join(pages, last_page)
+
+    @classmethod
+    async def afetch(
+        cls,
+        fetch_page: Callable[[int], Awaitable[List[dict]]],
+        page_size: int,
+        parallelism: int,
+        max_pages: Optional[int] = None,
+        join: Optional[Callable[[Dict[int, List[dict]], Optional[int]], list]] = None,
+    ) -> List[dict]:
+        """
+        async version of fetch - pages after a short page are cancelled
+        and awaited so none of them outlives the call
+
+        Args:
+            fetch_page (Callable): coroutine function getting the rows of the given page number
+            page_size (int): the number of rows per page
+            parallelism (int): the maximum number of concurrent page requests
+            max_pages (int): the maximum number of pages - None for all
+            join (Callable): function(pages, last_page) stitching the pages
+                together - default: join for lists of dicts
+
+        Returns:
+            list: the rows of all pages in order
+        """
+        pages = {}
+        in_flight = {}
+        cancelled = []
+        next_page = 0
+        last_page = None
+        try:
+            while True:
+                while (
+                    len(in_flight) < parallelism
+                    and last_page is None
+                    and (max_pages is None or next_page < max_pages)
+                ):
+                    in_flight[next_page] = asyncio.ensure_future(fetch_page(next_page))
+                    next_page += 1
+                if not in_flight:
+                    break
+                await asyncio.wait(
+                    in_flight.values(), return_when=asyncio.FIRST_COMPLETED
+                )
+                for page, task in sorted(in_flight.items()):
+                    if task.done():
+                        del in_flight[page]
+                        pages[page] = task.result()
+                        if len(pages[page]) < page_size:
+                            if last_page is None or page < last_page:
+                                last_page = page
+                if last_page is not None:
+                    for page in [p for p in in_flight if p > last_page]:
+                        task = in_flight.pop(page)
+                        task.cancel()
+                        cancelled.append(task)
+        finally:
+            for task in in_flight.values():
+                task.cancel()
+                cancelled.append(task)
+            await asyncio.gather(*cancelled, return_exceptions=True)
+        join = join or cls.join
+        return join(pages, last_page)
@@ -0,0 +1,257 @@
+"""
+Created on 2026-10-18
+
+@author: wf
+"""
+
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from velorail.predicate_catalog import PredicateCatalog
+from velorail.querygen import GenProperty, QueryGen, VarNameTracker
+
+
+@dataclass
+class QueryPlan:
+    """
+    the execution plan of a generated query with its estimates
+    """
+
+    # the complete generated query
+    sparql_query: str
+    # the queries to execute - the complete one or its parts
+    sparql_queries: List[str] = field(default_factory=list)
+    # the variable the parts of a split query are joined on
+    main_var: Optional[str] = None
+    rows: int = 0
+    values: int = 0
+    cost: int = 0
+    refused: bool = False
+    reason: str = ""
+
+    @property
+    def summary(self) -> str:
+        """
+        a one line description of the plan e.g. for the explorer UI
+        """
+        if self.refused:
+            return f"refused: {self.reason}"
+        queries = len(self.sparql_queries)
+        summary = (
+            f"estimated {self.rows} row(s) with {self.values} value(s)"
+            f" at cost {self.cost} in {queries} quer{'y' if queries == 1 else 'ies'}"
+        )
+        return summary
+
+    def merge(self, lods: List[List[dict]]) -> List[dict]:
+        """
+        merge the results of the parts of a split query
+
+        Args:
+            lods (list): one result per executed query
+
+        Returns:
+            list: the records of the parts joined on the value of the
+            main variable - each combination of the rows of the parts
+            with the same value - rows without a partner are kept
+        """
+        merged = []
+        for index, lod in enumerate(lods):
+            if index == 0:
+                merged = [dict(record) for record in lod]
+                continue
+            records_by_key = {}
+            for record in lod:
+                key = record.get(self.main_var)
+                records_by_key.setdefault(key, []).append(record)
+            merged_keys = {row.get(self.main_var) for row in merged}
+            joined = []
+            for row in merged:
+                records = records_by_key.get(row.get(self.main_var), [])
+                if not records:
+                    joined.append(row)
+                for record in records:
+                    joined.append({**row, **record})
+            for key, records in records_by_key.items():
+                if key not in merged_keys:
+                    joined.extend(dict(record) for record in records)
+            merged = joined
+        return merged
+
+
+class QueryPlanner:
+    """
+    cost based planner for the queries of the QueryGen
+
+    the cardinality of properties without a value count is taken from
+    the PredicateCatalog of the endpoint - the cost is the number of
+    intermediate solutions the endpoint has to compute: the join of the
+    properties of the main query plus the values scanned by the sub-selects
+    """
+
+    def __init__(
+        self,
+        catalog: Optional[PredicateCatalog],
+        endpoint_name: str,
+        split_cost: int = 10000,
+        max_cost: int = 1000000,
+    ):
+        """
+        constructor
+
+        Args:
+            catalog (PredicateCatalog): the predicate statistics - None for none
+            endpoint_name (str): the name of the endpoint to plan for
+            split_cost (int): the cost above which queries are split
+            max_cost (int): the cost above which queries are refused
+        """
+        self.catalog = catalog
+        self.endpoint_name = endpoint_name
+        self.split_cost = split_cost
+        self.max_cost = max_cost
+
+    def get_counts(self, lod: List[dict]) -> List[dict]:
+        """
+        get a copy of the given property records with the missing value
+        counts estimated from the catalog
+
+        Args:
+            lod (list): the ?p records to generate a query for
+
+        Returns:
+            list: the records with a count where one is known
+        """
+        missing = [record["p"] for record in lod if "count" not in record]
+        stats = {}
+        if missing and self.catalog is not None:
+            stats = self.catalog.get_stats(self.endpoint_name, missing)
+        counted = []
+        for record in lod:
+            record = dict(record)
+            predicate_stats = stats.get(record["p"])
+            if "count" not in record and predicate_stats is not None:
+                values_per_subject = predicate_stats.values_per_subject
+                if values_per_subject is not None:
+                    record["count"] = values_per_subject
+            counted.append(record)
+        return counted
+
+    def estimate(self, properties: List[GenProperty]) -> Tuple[int, int, int]:
+        """
+        estimate the result size and cost of a generated query
+
+        Args:
+            properties (list): the properties of the generated query
+
+        Returns:
+            tuple: the number of rows, values and the cost
+        """
+        join_rows = 1
+        main_props = 0
+        sub_cost = 0
+        values = 0
+        grouped = False
+        for gen_prop in properties:
+            if gen_prop.comment:
+                continue
+            card = max(1, gen_prop.card)
+            if gen_prop.shape in (QueryGen.SINGLE, QueryGen.AGGREGATE):
+                join_rows *= card
+                main_props += 1
+                grouped = grouped or gen_prop.shape == QueryGen.AGGREGATE
+            else:
+                sub_cost += card
+            if gen_prop.shape in (QueryGen.AGGREGATE, QueryGen.SUBQUERY):
+                values += card
+            elif gen_prop.shape == QueryGen.SAMPLE:
+                values += 2
+            else:
+                values += 1
+        rows = 1 if grouped else join_rows
+        cost = join_rows * max(1, main_props) + sub_cost
+        return rows, values, cost
+
+    def get_chunks(self, properties: List[GenProperty]) -> List[List[str]]:
+        """
+        split the selected properties into chunks of at most split_cost
+
+        Args:
+            properties (list): the properties of the complete query
+
+        Returns:
+            list: the property URIs of each chunk
+        """
+        chunks = []
+        chunk = []
+        chunk_cost = 0
+        for gen_prop in properties:
+            if gen_prop.comment:
+                continue
+            prop_cost = max(1, gen_prop.card)
+            if chunk and chunk_cost + prop_cost > self.split_cost:
+                chunks.append(chunk)
+                chunk = []
+                chunk_cost = 0
+            chunk.append(gen_prop.prop)
+            chunk_cost += prop_cost
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
+    def plan(
+        self,
+        query_gen: QueryGen,
+        lod: List[dict],
+        main_var: str,
+        main_value: str,
+        **gen_kwargs,
+    ) -> QueryPlan:
+        """
+        generate the query for the given property records and plan its execution
+
+        Args:
+            query_gen (QueryGen): the query generator
+            lod (list): the ?p records with optional ?count values
+            main_var (str): the main variable of the query
+            main_value (str): the value of the main variable
+            gen_kwargs: further arguments of QueryGen.gen
+
+        Returns:
+            QueryPlan: the plan with the complete query and the queries to run
+        """
+        lod = self.get_counts(lod)
+        sparql_query = query_gen.gen(lod, main_var, main_value, **gen_kwargs)
+        properties = query_gen.properties
+        rows, values, cost = self.estimate(properties)
+        plan = QueryPlan(
+            sparql_query=sparql_query,
+            sparql_queries=[sparql_query],
+            main_var=main_var,
+            rows=rows,
+            values=values,
+            cost=cost,
+        )
+        if cost > self.split_cost:
+            chunks = self.get_chunks(properties)
+            if len(chunks) > 1:
+                records_by_prop = {record["p"]: record for record in lod}
+                # continue the variable names in the parts for merging
+                tracker = VarNameTracker()
+                plan.sparql_queries = []
+                costs = []
+                for chunk in chunks:
+                    chunk_lod = [records_by_prop[prop] for prop in chunk]
+                    chunk_query = query_gen.gen(
+                        chunk_lod, main_var, main_value, tracker=tracker
+                    )
+                    _rows, _values, chunk_cost = self.estimate(query_gen.properties)
+                    plan.sparql_queries.append(chunk_query)
+                    costs.append(chunk_cost)
+                query_gen.properties = properties
+                plan.cost = sum(costs)
+                cost = max(costs)
+        if cost > self.max_cost:
+            plan.refused = True
+            plan.reason = f"estimated cost {cost} exceeds {self.max_cost}"
+            plan.sparql_queries = []
+        return plan
@@ -0,0 +1,160 @@
+"""
+Created on 2026-10-18
+
+@author: wf
+"""
+
+import re
+from typing import Any, Dict, List, Optional
+
+from lodstorage.params import Param
+
+from velorail.npq_registry import NPQ_Registry
+from velorail.prefix_scanner import PrefixScanner
+
+
+class QueryTemplate:
+    """
+    a query compiled once into its literal parts and parameter slots
+    so that binding a parameter dict is a validated join
+    """
+
+    param_pattern = re.compile(r"{{\s*(\w+)\s*}}")
+    illegal_chars = """"[;<>&|]"'"""
+    converters = {"int": int, "float": float}
+
+    def __init__(
+        self,
+        sparql_query: str,
+        param_list: Optional[List[Param]] = None,
+        prefixes: Optional[Dict[str, str]] = None,
+    ):
+        """
+        constructor
+
+        Args:
+            sparql_query (str): the query with its merged prefix header
+                and {{param}} slots
+            param_list (list): the parameter definitions with types and defaults
+            prefixes (dict): the endpoint prefixes merged into the query
+                on demand - also for prefixed names in the bound values
+        """
+        self.sparql_query = sparql_query
+        self.param_list = param_list
+        self.prefixes = prefixes
+        self.declared = set()
+        if prefixes:
+            self.declared = set(NPQ_Registry.parse_prefixes(sparql_query)[0])
+        # the literal parts - one more than there are slots
+        self.parts: List[str] = []
+        self.slots: List[str] = []
+        pos = 0
+        for match in self.param_pattern.finditer(sparql_query):
+            self.parts.append(sparql_query[pos : match.start()])
+            self.slots.append(match.group(1))
+            pos = match.end()
+        self.parts.append(sparql_query[pos:])
+        self.param_names = list(dict.fromkeys(self.slots))
+        self.types: Dict[str, str] = {}
+        self.defaults: Dict[str, Any] = {}
+        for param in param_list or []:
+            self.types[param.name] = param.type
+            if param.default_value is not None:
+                self.defaults[param.name] = self.check(
+                    param.name, param.default_value
+                )
+
+    @property
+    def has_params(self) -> bool:
+        return len(self.slots) > 0
+
+    def check(self, name: str, value: Any) -> Any:
+        """
+        validate the given parameter value
+
+        Args:
+            name (str): the parameter name
+            value: the value to bind
+
+        Returns:
+            the value - typed if it is a default value from the param_list
+
+        Raises:
+            ValueError: for values of the wrong type or potentially malicious values
+        """
+        converter = self.converters.get(self.types.get(name))
+        if converter is not None:
+            try:
+                typed_value = converter(value)
+            except (TypeError, ValueError):
+                raise ValueError(
+                    f"Invalid value for {self.types[name]} parameter '{name}': {value!r}"
+                )
+            if isinstance(value, str) and value == str(typed_value):
+                value = typed_value
+        if isinstance(value, str):
+            for char in self.illegal_chars:
+                if char in value:
+                    raise ValueError(
+                        f"Potentially malicious value detected for parameter '{name}'"
+                    )
+        return value
+
+    def bind(self, param_dict: Optional[Dict] = None) -> str:
+        """
+        bind the given parameters
+
+        Args:
+            param_dict (dict): the parameter values overriding the defaults
+
+        Returns:
+            str: the final query
+        """
+        if not self.has_params:
+            return self.sparql_query
+        if not param_dict and not self.defaults:
+            param_names = self.param_names
+            displayed_params = ", ".join(param_names[:3])
+            if len(param_names) > 3:
+                displayed_params += ", ..."
+            plural_suffix = "s" if len(param_names) > 1 else ""
+            raise Exception(
+                f"Query needs {len(param_names)} parameter{plural_suffix}: {displayed_params}"
+            )
+        values = {}
+        for name in self.param_names:
+            if param_dict and name in param_dict:
+                value = self.check(name, param_dict[name])
+            elif name in self.defaults:
+                value = self.defaults[name]
+            else:
+                raise ValueError(f"Missing value for parameter '{name}'")
+            values[name] = str(value)
+        query_parts = [self.get_prefix_header(values), self.parts[0]]
+        for slot, part in zip(self.slots, self.parts[1:]):
+            query_parts.append(values[slot])
+            query_parts.append(part)
+        return "".join(query_parts)
+
+    def get_prefix_header(self, values: Dict[str, str]) -> str:
+        """
+        get the declarations of the endpoint prefixes used by prefixed
+        names in the given values e.g. wd:Q80 that the query does not declare
+
+        Args:
+            values (dict): the bound values by parameter name
+
+        Returns:
+            str: the PREFIX lines - empty if there are none
+        """
+        header = ""
+        if self.prefixes:
+            used = set()
+            for value in values.values():
+                if ":" in value:
+                    used.update(PrefixScanner.scan(value))
+            for prefix in sorted(used - self.declared):
+                uri = self.prefixes.get(prefix)
+                if uri is not None:
+                    header += f"PREFIX {prefix}: <{uri}>\n"
+        return header
@@ -4,6 +4,11 @@ Created on 2025-02-02
 @author: wf
 """
 
+from dataclasses import dataclass
+from typing import Any, List, Optional
+
+from velorail.prefix_index import PrefixIndex
+
 
 class VarNameTracker:
     """
@@ -25,17 +30,73 @@ class VarNameTracker:
             return base_name
 
 
+@dataclass
+class GenProperty:
+    """
+    a property of a generated query and the shape chosen for it
+    """
+
+    var_name: str
+    prop: str
+    prefixed_prop: str
+    card: int
+    # "#" if the property is commented out
+    comment: str
+    wikidata_property: Optional[Any] = None
+    shape: str = "single"
+
+    @property
+    def value_var(self) -> str:
+        """
+        the variable the values are bound to before aggregation
+        """
+        return f"{self.var_name}_value"
+
+
 class QueryGen:
     """
     Generator for SPARQL queries based on property count query results.
+
+    The shape of each property is chosen by its value count:
+    single valued properties get an OPTIONAL of their own, multi valued
+    ones are aggregated with GROUP_CONCAT and very high cardinality ones
+    are sampled and counted in a sub-select. Multi valued properties are
+    moved to sub-selects as well as soon as joining them would exceed
+    max_join_rows so that the query always returns a single row.
     """
 
-    def __init__(self, prefixes, debug: bool = False):
+    SINGLE = "single"
+    AGGREGATE = "aggregate"
+    SUBQUERY = "subquery"
+    SAMPLE = "sample"
+
+    # properties with more values are sampled and counted instead of concatenated
+    high_cardinality = 100
+    # maximum number of rows the join of the aggregated properties may produce
+    max_join_rows = 1000
+    separator = "|"
+
+    def __init__(
+        self,
+        prefixes,
+        debug: bool = False,
+        prefix_index: Optional[PrefixIndex] = None,
+    ):
         """
         Initialize the QueryGen with a dictionary of prefixes.
+
+        Args:
+            prefixes (dict): namespace URIs by prefix name
+            debug (bool): if True switch on debug mode
+            prefix_index (PrefixIndex): the prefix index of the endpoint
+                - built from the prefixes if not given
         """
         self.prefixes = prefixes
         self.debug = debug
+        if prefix_index is None:
+            prefix_index = PrefixIndex(prefixes)
+        self.prefix_index = prefix_index
+        self.properties: List[GenProperty] = []
 
     def sanitize_variable_name(self, prop):
         """
@@ -60,18 +121,97 @@ class QueryGen:
         Returns:
             str: The prefixed property if a matching prefix is found, otherwise the original URI in angle brackets.
         """
-        longest_match = None
-        for prefix, uri in self.prefixes.items():
-            if prop.startswith(uri) and (
-                longest_match is None or len(uri) > len(longest_match)
-            ):
-                longest_match = uri
-                best_prefix = prefix
+        prefixed_prop = self.prefix_index.compact_uri(prop)
+        if prefixed_prop is None:
+            prefixed_prop = f"<{prop}>"
+        return prefixed_prop
 
-        if longest_match:
-            return prop.replace(longest_match, f"{best_prefix}:")
+    def get_shapes(self, properties: List[GenProperty]):
+        """
+        choose the shape of the given properties by their cardinality
 
-        return f"<{prop}>"
+        Args:
+            properties (list): the properties to generate
+        """
+        join_rows = 1
+        multi_valued = []
+        for gen_prop in properties:
+            if gen_prop.card <= 1:
+                gen_prop.shape = self.SINGLE
+            elif gen_prop.card > self.high_cardinality:
+                gen_prop.shape = self.SAMPLE
+            else:
+                multi_valued.append(gen_prop)
+        # aggregate the smallest ones in the main query while the join is small
+        for gen_prop in sorted(multi_valued, key=lambda gen_prop: gen_prop.card):
+            rows = join_rows * gen_prop.card
+            if not gen_prop.comment and rows <= self.max_join_rows:
+                gen_prop.shape = self.AGGREGATE
+                join_rows = rows
+            else:
+                gen_prop.shape = self.SUBQUERY
+
+    def get_group_concat(self, var: str, as_var: str) -> str:
+        """
+        get the GROUP_CONCAT aggregation of the given variable
+        """
+        separator = f'separator="{self.separator}"'
+        aggregate = f"(GROUP_CONCAT(DISTINCT STR(?{var}); {separator}) AS ?{as_var})"
+        return aggregate
+
+    def get_where_lines(
+        self, gen_prop: GenProperty, main_var: str, main_value: str, grouped: bool
+    ) -> List[str]:
+        """
+        get the WHERE clause lines for the given property
+
+        Args:
+            gen_prop (GenProperty): the property
+            main_var (str): the main variable
+            main_value (str): the value of the main variable
+            grouped (bool): True if the main query is aggregated
+
+        Returns:
+            list: the lines without indentation and comment marker
+        """
+        triple = f"?{main_var} {gen_prop.prefixed_prop}"
+        if gen_prop.shape in (self.SINGLE, self.AGGREGATE):
+            var = gen_prop.value_var if grouped else gen_prop.var_name
+            return [f"OPTIONAL {{ {triple} ?{var} . }}"]
+        value_var = gen_prop.value_var
+        if gen_prop.shape == self.SUBQUERY:
+            projection = self.get_group_concat(value_var, gen_prop.var_name)
+        else:
+            projection = (
+                f"(SAMPLE(?{value_var}) AS ?{gen_prop.var_name}) "
+                f"(COUNT(?{value_var}) AS ?{gen_prop.var_name}_count)"
+            )
+        lines = [
+            "OPTIONAL {",
+            f"  SELECT ?{main_var} {projection}",
+            "  WHERE {",
+            f"    VALUES (?{main_var}) {{ ({main_value}) }}",
+            f"    {triple} ?{value_var} .",
+            "  }",
+            f"  GROUP BY ?{main_var}",
+            "}",
+        ]
+        return lines
+
+    def get_select_vars(self, gen_prop: GenProperty, grouped: bool) -> List[str]:
+        """
+        get the projection of the given property in the main query
+        """
+        var_name = gen_prop.var_name
+        if gen_prop.shape == self.SAMPLE:
+            select_vars = [f"?{var_name}", f"?{var_name}_count"]
+        elif gen_prop.shape == self.SUBQUERY or not grouped:
+            select_vars = [f"?{var_name}"]
+        elif gen_prop.shape == self.AGGREGATE:
+            select_vars = [self.get_group_concat(gen_prop.value_var, var_name)]
+        else:
+            select_vars = [f"(SAMPLE(?{gen_prop.value_var}) AS ?{var_name})"]
+        return select_vars
 
     def gen(
         self,
@@ -81,6 +221,7 @@ class QueryGen:
         max_cardinality: int = None,
         first_x: int = None,
         comment_out: bool = False,
+        tracker: Optional[VarNameTracker] = None,
     ):
         """
         Generates a SPARQL query dynamically based on the provided list of dictionaries (lod).
@@ -92,6 +233,7 @@ class QueryGen:
             max_cardinality (int, optional): Maximum allowed cardinality for properties. Defaults to a large number.
             first_x (int, optional): Number of properties to include before commenting out the rest. Defaults to a large number.
             comment_out (bool, optional): If True, comments out properties that are filter by the first_x or max cardinality condition
+            tracker (VarNameTracker, optional): the variable names to continue e.g. for the parts of a split query
 
         Returns:
             str: The generated SPARQL query as a string.
@@ -101,54 +243,69 @@ class QueryGen:
         if max_cardinality is None:
             max_cardinality = 10**16  # how much energy for the RAM to keep this?
         sparql_query = "# generated Query"
-        properties = {}
-        tracker = VarNameTracker()
-        for i, record in enumerate(lod):
+        properties: List[GenProperty] = []
+        if tracker is None:
+            tracker = VarNameTracker()
+        qnames = self.prefix_index.compact(record["p"] for record in lod)
+        for i, (record, qname) in enumerate(zip(lod, qnames)):
             prop = record["p"]
             # do we have an injected wikidata_property?
             wikidata_property = record.get("wikidata_property")
-            prefixed_prop = self.get_prefixed_property(prop)
+            prefixed_prop = qname if qname is not None else f"<{prop}>"
             base_var_name = self.sanitize_variable_name(prefixed_prop)
             var_name = tracker.get_unique_name(base_var_name)
             card = int(record.get("count", 1))
             comment = "" if i < first_x and card <= max_cardinality else "#"
-            properties[var_name] = (
-                prop,
-                prefixed_prop,
-                card,
-                comment,
-                wikidata_property,
+            if comment_out and comment:
+                continue
+            properties.append(
+                GenProperty(
+                    var_name=var_name,
+                    prop=prop,
+                    prefixed_prop=prefixed_prop,
+                    card=card,
+                    comment=comment,
+                    wikidata_property=wikidata_property,
+                )
             )
+        self.get_shapes(properties)
+        # keep the properties of the last generated query e.g. for the QueryPlanner
+        self.properties = properties
+        grouped = any(
+            gen_prop.shape == self.AGGREGATE and not gen_prop.comment
+            for gen_prop in properties
+        )
         for key, value in self.prefixes.items():
             sparql_query += f"\nPREFIX {key}: <{value}>"
 
         sparql_query += f"\nSELECT ?{main_var}"
 
-        for i, (var_name, (prop, prefixed_prop, card, comment, wdp)) in enumerate(
-            properties.items()
-        ):
-            if not (comment_out and comment):
-                sparql_query += f"\n  {comment}?{var_name}"
+        for gen_prop in properties:
+            for select_var in self.get_select_vars(gen_prop, grouped):
+                sparql_query += f"\n  {gen_prop.comment}{select_var}"
 
         sparql_query += "\nWHERE {\n"
 
         sparql_query += f"  VALUES (?{main_var}) {{ ({main_value}) }}\n"
-        sparql_query += "  OPTIONAL {\n"
-
-        for i, (var_name, (prop, prefixed_prop, card, comment, wdp)) in enumerate(
-            properties.items()
-        ):
-            if not (comment_out and comment):
-                sparql_query += f"    # {prop}\n"
-                if (
-                    wdp
-                ):  # label but not description to avoid url encoding and other issues like param length overrun
-                    sparql_query += f"    # {wdp.plabel}\n"
-                sparql_query += (
-                    f"    {comment}?{main_var} {prefixed_prop} ?{var_name} .\n"
-                )
 
-        sparql_query += "  }\n"  # Closing Optional clause
+        for gen_prop in properties:
+            sparql_query += f"  # {gen_prop.prop}\n"
+            wdp = gen_prop.wikidata_property
+            if (
+                wdp
+            ):  # label but not description to avoid url encoding and other issues like param length overrun
+                sparql_query += f"  # {wdp.plabel}\n"
+            for line in self.get_where_lines(gen_prop, main_var, main_value, grouped):
+                sparql_query += f"  {gen_prop.comment}{line}\n"
+
         sparql_query += "}"  # Closing WHERE clause
+        if grouped:
+            group_vars = [f"?{main_var}"]
+            for gen_prop in properties:
+                if gen_prop.comment:
+                    continue
+                if gen_prop.shape in (self.SUBQUERY, self.SAMPLE):
+                    group_vars.extend(self.get_select_vars(gen_prop, grouped))
+            sparql_query += f"\nGROUP BY {' '.join(group_vars)}"
 
         return sparql_query
@@ -0,0 +1,231 @@
+"""
+Created on 2026-10-18
+
+@author: wf
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import weakref
+from collections.abc import Sequence
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from velorail.query_cache import QueryCache
+
+
+class SpilledLod(Sequence):
+    """
+    read only list of dicts for results beyond the ResultBudget
+
+    the first rows are kept in memory, the others in a temporary
+    SQLite file that is removed when the result is garbage collected
+    """
+
+    def __init__(
+        self,
+        head: List[dict],
+        spill_dir: Optional[str] = None,
+        batch_size: int = 1000,
+    ):
+        """
+        constructor
+
+        Args:
+            head (list): the rows within the budget
+            spill_dir (str): directory of the temporary file - default: tempdir
+            batch_size (int): the number of rows to write/read at a time
+        """
+        self.head = head
+        self.batch_size = batch_size
+        self.spilled = 0
+        # approximate in memory size of all rows in bytes
+        self.size = 0
+        # True if rows beyond the max_total_rows of the budget were dropped
+        self.truncated = False
+        self.pending: List[tuple] = []
+        self.lock = threading.Lock()
+        fd, self.db_path = tempfile.mkstemp(
+            prefix="velorail_spill_", suffix=".db", dir=spill_dir
+        )
+        os.close(fd)
+        self.connection = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE spill (id INTEGER PRIMARY KEY, record TEXT)"
+        )
+        self.finalizer = weakref.finalize(
+            self, self.remove, self.connection, self.db_path
+        )
+
+    @staticmethod
+    def remove(connection: sqlite3.Connection, db_path: str):
+        """
+        close and delete the temporary store
+        """
+        connection.close()
+        if os.path.exists(db_path):
+            os.remove(db_path)
+
+    def close(self):
+        """
+        remove the spilled rows - only the in memory rows remain accessible
+        """
+        self.finalizer()
+
+    def append(self, record: dict):
+        """
+        spill the given row
+        """
+        record_json = json.dumps(record, default=QueryCache.encode_value)
+        self.pending.append((len(self.head) + self.spilled, record_json))
+        self.spilled += 1
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        write the pending rows
+        """
+        if self.pending:
+            with self.lock:
+                self.connection.executemany(
+                    "INSERT INTO spill VALUES (?,?)", self.pending
+                )
+                self.connection.commit()
+            self.pending = []
+
+    def decode(self, record_json: str) -> dict:
+        record = json.loads(record_json, object_hook=QueryCache.decode_value)
+        return record
+
+    def get_spilled(self, start: int, stop: int) -> List[dict]:
+        """
+        get the spilled rows with the given index range
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT record FROM spill WHERE id>=? AND id<? ORDER BY id",
+                (start, stop),
+            ).fetchall()
+        lod = [self.decode(record_json) for (record_json,) in rows]
+        return lod
+
+    def __len__(self) -> int:
+        return len(self.head) + self.spilled
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            lod = self.head[start:stop]
+            if stop > len(self.head):
+                lod.extend(self.get_spilled(max(start, len(self.head)), stop))
+            return lod
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("SpilledLod index out of range")
+        if index < len(self.head):
+            return self.head[index]
+        return self.get_spilled(index, index + 1)[0]
+
+    def __iter__(self) -> Iterator[dict]:
+        yield from self.head
+        for start in range(len(self.head), len(self), self.batch_size):
+            yield from self.get_spilled(start, start + self.batch_size)
+
+    def __repr__(self) -> str:
+        truncated = " truncated" if self.truncated else ""
+        return (
+            f"SpilledLod({len(self.head)} rows in memory,"
+            f" {self.spilled} spilled{truncated})"
+        )
+
+
+@dataclass
+class ResultBudget:
+    """
+    per query memory budget of query results
+    """
+
+    # rows and approximate bytes to keep in memory - the others are spilled
+    max_rows: int = 100000
+    max_bytes: int = 256 * 1024 * 1024
+    # rows after which the result is truncated - None for no limit
+    max_total_rows: Optional[int] = None
+    # directory of the spill files - None for the default temp directory
+    spill_dir: Optional[str] = None
+
+    @staticmethod
+    def get_size(record: dict) -> int:
+        """
+        get the approximate number of bytes of the given row
+        """
+        size = sys.getsizeof(record) + sum(
+            sys.getsizeof(value) for value in record.values()
+        )
+        return size
+
+    def collect(self, records: Iterable[dict]) -> List[dict]:
+        """
+        collect the given rows within my budget
+
+        Args:
+            records (Iterable): the rows e.g. as streamed by SparqlClient.iter_query
+                - generators are closed on truncation to stop receiving
+
+        Returns:
+            list: the rows as list - a SpilledLod if the budget was exceeded
+        """
+        lod = []
+        size = 0
+        spilled = None
+        truncated = False
+        for record in records:
+            rows = len(lod) if spilled is None else len(spilled)
+            if self.max_total_rows is not None and rows >= self.max_total_rows:
+                truncated = True
+                if hasattr(records, "close"):
+                    records.close()
+                break
+            size += self.get_size(record)
+            if spilled is None:
+                if len(lod) < self.max_rows and size <= self.max_bytes:
+                    lod.append(record)
+                    continue
+                spilled = SpilledLod(lod, self.spill_dir)
+            spilled.append(record)
+        if truncated and spilled is None:
+            spilled = SpilledLod(lod, self.spill_dir)
+        if spilled is not None:
+            spilled.flush()
+            spilled.size = size
+            spilled.truncated = truncated
+            lod = spilled
+        return lod
+
+    def join(
+        self, pages: Dict[int, List[dict]], last_page: Optional[int]
+    ) -> List[dict]:
+        """
+        stitch the given result pages together in order up to the given
+        last page within my budget - see QueryPager.join
+
+        pages are released as soon as their rows are collected - spilled
+        pages are not closed since concurrent identical queries share them
+        """
+
+        def records() -> Iterator[dict]:
+            for page in sorted(pages):
+                lod = pages.pop(page)
+                if last_page is not None and page > last_page:
+                    continue
+                yield from lod
+
+        lod = self.collect(records())
+        return lod
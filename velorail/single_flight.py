@@ -0,0 +1,156 @@
+"""
+Created on 2026-10-18
+
+@author: wf
+"""
+
+import asyncio
+import threading
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+import pandas as pd
+
+
+class Flight:
+    """
+    a single in-flight call that other threads may wait for
+    """
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """
+    deduplication of concurrent identical calls
+
+    concurrent callers with the same key share the result of
+    the one call in flight - threads and asyncio tasks are
+    deduplicated separately
+
+    the result of a shared call is never handed out - every
+    caller gets its own copy to modify
+    """
+
+    instance = None
+
+    def __init__(self):
+        """
+        constructor
+        """
+        self.lock = threading.Lock()
+        self.flights: Dict[Hashable, Flight] = {}
+        # in-flight tasks by key per event loop
+        self.tasks = weakref.WeakKeyDictionary()
+        self.calls = 0
+        self.shared = 0
+
+    @classmethod
+    def get_instance(cls) -> "SingleFlight":
+        """
+        get the shared single flight layer
+        """
+        if cls.instance is None:
+            cls.instance = cls()
+        return cls.instance
+
+    @staticmethod
+    def copy(result: Any) -> Any:
+        """
+        copy a shared list of dicts or DataFrame result so that
+        callers can not modify each others records
+        """
+        if isinstance(result, list):
+            result = [dict(row) if isinstance(row, dict) else row for row in result]
+        elif isinstance(result, pd.DataFrame):
+            result = result.copy()
+        return result
+
+    def do(self, key: Hashable, call: Callable[[], Any]) -> Any:
+        """
+        run the given call unless an identical call is in flight
+        in which case its result is awaited and shared
+
+        Args:
+            key (Hashable): the key identifying identical calls
+            call (Callable): the call to run
+
+        Returns:
+            the result of the call
+        """
+        with self.lock:
+            flight = self.flights.get(key)
+            if flight is None:
+                flight = Flight()
+                self.flights[key] = flight
+                leader = True
+                self.calls += 1
+            else:
+                leader = False
+                flight.followers += 1
+                self.shared += 1
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return self.copy(flight.result)
+        try:
+            flight.result = call()
+        except Exception as ex:
+            flight.error = ex
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+                followers = flight.followers
+            flight.event.set()
+        # no one else can get the result once the flight is removed
+        result = self.copy(flight.result) if followers else flight.result
+        return result
+
+    async def ado(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        async version of do - the shared call keeps running
+        for the other callers if one of them is cancelled
+
+        Args:
+            key (Hashable): the key identifying identical calls
+            call (Callable): the coroutine function to run
+
+        Returns:
+            the result of the call
+        """
+        loop = asyncio.get_running_loop()
+        with self.lock:
+            tasks = self.tasks.get(loop)
+            if tasks is None:
+                tasks = {}
+                self.tasks[loop] = tasks
+            task = tasks.get(key)
+            leader = task is None
+            if leader:
+                task = asyncio.ensure_future(call())
+                tasks[key] = task
+                task.add_done_callback(lambda _task: tasks.pop(key, None))
+                self.calls += 1
+            else:
+                self.shared += 1
+        result = await asyncio.shield(task)
+        # the leader might resume after the followers joined
+        return self.copy(result)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        get the number of calls made and calls answered by a shared call
+        """
+        with self.lock:
+            stats = {
+                "calls": self.calls,
+                "shared": self.shared,
+                "in_flight": len(self.flights),
+            }
+        return stats
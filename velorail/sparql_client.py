@@ -0,0 +1,698 @@
+"""
+Created on 2026-10-18
+
+@author: wf
+"""
+
+import asyncio
+import datetime
+import json
+import threading
+import weakref
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+import pandas as pd
+import requests
+from lodstorage.query import Endpoint
+from lodstorage.sparql import SPARQL
+from requests.adapters import HTTPAdapter
+from requests.auth import HTTPDigestAuth
+
+from velorail.concurrency_window import ConcurrencyWindow
+from velorail.result_spill import ResultBudget
+from velorail.sparql_columns import SparqlColumnDecoder
+from velorail.sparql_stream import SparqlJsonStream
+from velorail.sparql_tsv import SparqlTsvDecoder
+from velorail.version import Version
+
+
+class SparqlHttpError(Exception):
+    """
+    a SPARQL endpoint answered with an HTTP error status
+    """
+
+    def __init__(self, msg: str, status_code: int, retry_after: Optional[float] = None):
+        super().__init__(msg)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class SparqlClient:
+    """
+    keep-alive HTTP client for a single SPARQL endpoint
+    """
+
+    XSD = "http://www.w3.org/2001/XMLSchema#"
+    JSON = "application/sparql-results+json"
+    TSV = "text/tab-separated-values"
+    # databases that serve the much more compact TSV results
+    tsv_databases = {"qlever"}
+    # status codes of endpoints throttling us
+    throttle_status_codes = {429, 503}
+
+    def __init__(
+        self,
+        endpoint_conf: Endpoint,
+        max_connections: int = 10,
+        timeout: float = 60,
+        window: Optional[ConcurrencyWindow] = None,
+    ):
+        """
+        constructor
+
+        Args:
+            endpoint_conf (Endpoint): the endpoint configuration from endpoints.yaml
+            max_connections (int): maximum number of pooled connections per host
+            timeout (float): request timeout in seconds
+            window (ConcurrencyWindow): the adaptive concurrency limit
+                of the endpoint - None for no limit
+        """
+        self.endpoint_conf = endpoint_conf
+        self.window = window
+        self.url = endpoint_conf.endpoint
+        self.method = (endpoint_conf.method or "POST").upper()
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.lock = threading.Lock()
+        self.active = 0
+        self.requests = 0
+        self.session = requests.Session()
+        self.adapter = HTTPAdapter(
+            pool_connections=max_connections, pool_maxsize=max_connections
+        )
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+        version = Version()
+        self.accept = self.get_accept(endpoint_conf)
+        self.session.headers.update(
+            {
+                "Accept": self.accept,
+                "User-Agent": f"{version.name}/{version.version}",
+            }
+        )
+        if endpoint_conf.user and endpoint_conf.password:
+            if endpoint_conf.auth == "DIGEST":
+                self.session.auth = HTTPDigestAuth(
+                    endpoint_conf.user, endpoint_conf.password
+                )
+            else:
+                self.session.auth = (endpoint_conf.user, endpoint_conf.password)
+
+    def close(self):
+        """
+        close my pooled connections
+        """
+        self.session.close()
+
+    def post_or_get(self, sparql_query: str, stream: bool = False) -> requests.Response:
+        """
+        send the given query using my http method
+
+        Args:
+            sparql_query (str): the final query with all parameters applied
+            stream (bool): if True do not read the body yet
+
+        Returns:
+            requests.Response: the checked response
+        """
+        if self.window:
+            self.window.acquire()
+        with self.lock:
+            self.active += 1
+            self.requests += 1
+        outcome = ConcurrencyWindow.ERROR
+        retry_after = None
+        try:
+            if self.method == "GET":
+                response = self.session.get(
+                    self.url,
+                    params={"query": sparql_query},
+                    timeout=self.timeout,
+                    stream=stream,
+                )
+            else:
+                response = self.session.post(
+                    self.url,
+                    data={"query": sparql_query},
+                    timeout=self.timeout,
+                    stream=stream,
+                )
+            outcome, retry_after = self.get_outcome(
+                response.status_code, response.headers
+            )
+        except requests.Timeout:
+            outcome = ConcurrencyWindow.TIMEOUT
+            raise
+        finally:
+            with self.lock:
+                self.active -= 1
+            if self.window:
+                self.window.release(outcome, retry_after)
+        if response.status_code != 200:
+            msg = f"{self.endpoint_conf.name} HTTP {response.status_code}: {response.text[:500]}"
+            response.close()
+            raise SparqlHttpError(msg, response.status_code, retry_after)
+        return response
+
+    @classmethod
+    def get_outcome(cls, status_code: int, headers) -> Tuple[str, Optional[float]]:
+        """
+        classify the given response for the concurrency window
+
+        Args:
+            status_code (int): the HTTP status code
+            headers: the response headers
+
+        Returns:
+            tuple: the ConcurrencyWindow outcome and the Retry-After delay if any
+        """
+        retry_after = ConcurrencyWindow.parse_retry_after(headers.get("Retry-After"))
+        if status_code == 200:
+            outcome = ConcurrencyWindow.SUCCESS
+        elif status_code in cls.throttle_status_codes or retry_after:
+            outcome = ConcurrencyWindow.THROTTLE
+        else:
+            outcome = ConcurrencyWindow.ERROR
+        return outcome, retry_after
+
+    def query(self, sparql_query: str) -> List[dict]:
+        """
+        run the given query
+
+        Args:
+            sparql_query (str): the final query with all parameters applied
+
+        Returns:
+            list: List of dictionaries with query results.
+        """
+        lod, _size = self.query_with_size(sparql_query)
+        return lod
+
+    def query_with_size(self, sparql_query: str) -> Tuple[List[dict], int]:
+        """
+        run the given query
+
+        Args:
+            sparql_query (str): the final query with all parameters applied
+
+        Returns:
+            tuple: List of dictionaries with query results
+            and the number of bytes received
+        """
+        response = self.post_or_get(sparql_query)
+        size = len(response.content)
+        lod = self.decode(response.headers.get("Content-Type", ""), response.content)
+        return lod, size
+
+    def query_df(self, sparql_query: str) -> Tuple[pd.DataFrame, int]:
+        """
+        run the given query and decode the result straight into typed columns
+
+        Args:
+            sparql_query (str): the final query with all parameters applied
+
+        Returns:
+            tuple: the DataFrame with one typed column per variable
+            and the number of bytes received
+        """
+        response = self.post_or_get(sparql_query)
+        size = len(response.content)
+        decoder = SparqlColumnDecoder(self.convert)
+        if self.is_tsv(response.headers.get("Content-Type", "")):
+            decoder.add_tsv(response.content.decode("utf-8"))
+        else:
+            decoder.add_json(json.loads(response.content))
+        df = decoder.to_df()
+        return df, size
+
+    def query_budgeted(
+        self, sparql_query: str, budget: ResultBudget
+    ) -> Tuple[List[dict], int]:
+        """
+        run the given query streaming the result into the given budget
+
+        Args:
+            sparql_query (str): the final query with all parameters applied
+            budget (ResultBudget): the rows and bytes to keep in memory
+
+        Returns:
+            tuple: the rows - a SpilledLod if the budget was exceeded -
+            and the number of bytes received
+        """
+        sizes = []
+        lod = budget.collect(self.iter_query(sparql_query, on_done=sizes.append))
+        # truncated results are not received completely
+        size = sizes[0] if sizes else getattr(lod, "size", 0)
+        return lod, size
+
+    def iter_query(
+        self,
+        sparql_query: str,
+        chunk_size: int = 65536,
+        on_done: Optional[Callable[[int], None]] = None,
+    ) -> Iterator[dict]:
+        """
+        run the given query and yield the result rows while
+        the response is still being received
+
+        Args:
+            sparql_query (str): the final query with all parameters applied
+            chunk_size (int): the number of bytes to read at a time
+            on_done (Callable): optional callback getting the number
+                of bytes received when the result is complete
+
+        Yields:
+            dict: the next result row
+        """
+        response = self.post_or_get(sparql_query, stream=True)
+        with response:
+            chunks = response.iter_content(chunk_size=chunk_size)
+            if self.is_tsv(response.headers.get("Content-Type", "")):
+                stream = SparqlTsvDecoder(self.convert)
+                yield from stream.iter_records(stream.iter_lines(chunks))
+            else:
+                stream = SparqlJsonStream(chunks)
+                for row in stream:
+                    record = {
+                        key: self.to_value(binding) for key, binding in row.items()
+                    }
+                    yield record
+        if on_done:
+            on_done(stream.size)
+
+    @classmethod
+    def get_accept(cls, endpoint_conf: Endpoint) -> str:
+        """
+        get the Accept header for the given endpoint - TSV is preferred
+        where the database supports it with SPARQL JSON as fallback
+        """
+        if endpoint_conf.database in cls.tsv_databases:
+            accept = f"{cls.TSV}, {cls.JSON};q=0.9"
+        else:
+            accept = cls.JSON
+        return accept
+
+    @classmethod
+    def is_tsv(cls, content_type: str) -> bool:
+        """
+        check whether the given content type is the TSV result format
+        """
+        return content_type.split(";")[0].strip().lower() == cls.TSV
+
+    @classmethod
+    def decode(cls, content_type: str, content: bytes) -> List[dict]:
+        """
+        decode a SPARQL TSV or JSON result to a list of dicts
+
+        Args:
+            content_type (str): the Content-Type of the response
+            content (bytes): the response body
+
+        Returns:
+            list: List of dictionaries with query results.
+        """
+        if cls.is_tsv(content_type):
+            decoder = SparqlTsvDecoder(cls.convert)
+            lod = decoder.to_lod(content.decode("utf-8"))
+        else:
+            lod = cls.to_lod(json.loads(content))
+        return lod
+
+    @classmethod
+    def to_value(cls, binding: dict):
+        """
+        convert a single SPARQL JSON binding to a python value
+        the same way lodstorage does
+
+        Args:
+            binding (dict): a binding with type, value and optional datatype
+        """
+        value = binding["value"]
+        datatype = binding.get("datatype")
+        if datatype:
+            value = cls.convert(value, datatype)
+        return value
+
+    @classmethod
+    def convert(cls, value: str, datatype: str):
+        """
+        convert the lexical value of a typed literal to a python value
+
+        Args:
+            value (str): the lexical value
+            datatype (str): the datatype IRI
+        """
+        if datatype.startswith(cls.XSD):
+            xsd_type = datatype[len(cls.XSD) :]
+            if xsd_type == "integer":
+                value = int(value)
+            elif xsd_type == "decimal":
+                value = float(value)
+            elif xsd_type == "boolean":
+                value = value in ["TRUE", "true"]
+            elif xsd_type == "date":
+                value = datetime.datetime.strptime(value, "%Y-%m-%d").date()
+            elif xsd_type == "dateTime":
+                value = SPARQL.strToDatetime(value)
+        return value
+
+    @classmethod
+    def to_lod(cls, json_result: dict) -> List[dict]:
+        """
+        convert a SPARQL JSON result to a list of dicts
+
+        Args:
+            json_result (dict): the parsed application/sparql-results+json document
+
+        Returns:
+            list: List of dictionaries with query results.
+        """
+        lod = []
+        for row in json_result["results"]["bindings"]:
+            record = {}
+            for key, binding in row.items():
+                record[key] = cls.to_value(binding)
+            lod.append(record)
+        return lod
+
+    def stats(self) -> Dict[str, int]:
+        """
+        get my connection statistics
+
+        Returns:
+            dict: active requests, idle connections,
+            requests served by reused connections
+        """
+        connections = 0
+        pool_requests = 0
+        idle = 0
+        pools = self.adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            connections += pool.num_connections
+            pool_requests += pool.num_requests
+            idle += sum(1 for conn in list(pool.pool.queue) if conn is not None)
+        stats = {
+            "active": self.active,
+            "idle": idle,
+            "connections": connections,
+            "requests": self.requests,
+            "reused": max(0, pool_requests - connections),
+            "max_connections": self.max_connections,
+        }
+        return stats
+
+
+class AsyncSparqlClient:
+    """
+    asyncio HTTP client for a single SPARQL endpoint with
+    a concurrency limit - bound to the event loop it was created in
+    """
+
+    def __init__(
+        self,
+        endpoint_conf: Endpoint,
+        max_connections: int = 10,
+        max_concurrency: int = 4,
+        timeout: float = 60,
+        window: Optional[ConcurrencyWindow] = None,
+    ):
+        """
+        constructor
+
+        Args:
+            endpoint_conf (Endpoint): the endpoint configuration from endpoints.yaml
+            max_connections (int): maximum number of pooled connections per host
+            max_concurrency (int): maximum number of concurrent requests
+                if there is no shared window
+            timeout (float): request timeout in seconds
+            window (ConcurrencyWindow): the adaptive concurrency limit
+                of the endpoint shared with other clients
+        """
+        self.endpoint_conf = endpoint_conf
+        self.url = endpoint_conf.endpoint
+        self.method = (endpoint_conf.method or "POST").upper()
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        if window is None:
+            window = ConcurrencyWindow(
+                max_window=max_concurrency, initial_window=max_concurrency
+            )
+        self.window = window
+        self.active = 0
+        self.requests = 0
+        auth = None
+        if endpoint_conf.user and endpoint_conf.password:
+            if endpoint_conf.auth == "DIGEST":
+                auth = httpx.DigestAuth(endpoint_conf.user, endpoint_conf.password)
+            else:
+                auth = (endpoint_conf.user, endpoint_conf.password)
+        version = Version()
+        self.client = httpx.AsyncClient(
+            headers={
+                "Accept": SparqlClient.get_accept(endpoint_conf),
+                "User-Agent": f"{version.name}/{version.version}",
+            },
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+            auth=auth,
+        )
+
+    async def aclose(self):
+        """
+        close my pooled connections
+        """
+        await self.client.aclose()
+
+    async def post_or_get(self, sparql_query: str) -> httpx.Response:
+        """
+        send the given query using my http method
+        waiting for a free concurrency slot first
+
+        Args:
+            sparql_query (str): the final query with all parameters applied
+
+        Returns:
+            httpx.Response: the checked response
+        """
+        await self.window.aacquire()
+        self.active += 1
+        self.requests += 1
+        outcome = ConcurrencyWindow.ERROR
+        retry_after = None
+        try:
+            if self.method == "GET":
+                response = await self.client.get(
+                    self.url, params={"query": sparql_query}
+                )
+            else:
+                response = await self.client.post(
+                    self.url, data={"query": sparql_query}
+                )
+            outcome, retry_after = SparqlClient.get_outcome(
+                response.status_code, response.headers
+            )
+        except httpx.TimeoutException:
+            outcome = ConcurrencyWindow.TIMEOUT
+            raise
+        finally:
+            self.active -= 1
+            self.window.release(outcome, retry_after)
+        if response.status_code != 200:
+            msg = f"{self.endpoint_conf.name} HTTP {response.status_code}: {response.text[:500]}"
+            raise SparqlHttpError(msg, response.status_code, retry_after)
+        return response
+
+    async def query(self, sparql_query: str) -> List[dict]:
+        """
+        run the given query
+
+        Args:
+            sparql_query (str): the final query with all parameters applied
+
+        Returns:
+            list: List of dictionaries with query results.
+        """
+        lod, _size = await self.query_with_size(sparql_query)
+        return lod
+
+    async def query_with_size(self, sparql_query: str) -> Tuple[List[dict], int]:
+        """
+        run the given query
+
+        Args:
+            sparql_query (str): the final query with all parameters applied
+
+        Returns:
+            tuple: List of dictionaries with query results
+            and the number of bytes received
+        """
+        response = await self.post_or_get(sparql_query)
+        size = len(response.content)
+        content_type = response.headers.get("Content-Type", "")
+        lod = SparqlClient.decode(content_type, response.content)
+        return lod, size
+
+    def stats(self) -> Dict[str, int]:
+        """
+        get my request statistics
+        """
+        stats = {
+            "active": self.active,
+            "requests": self.requests,
+            "max_concurrency": self.max_concurrency,
+        }
+        return stats
+
+
+class SparqlClientPool:
+    """
+    process wide pool of SparqlClients keyed by endpoint name
+    """
+
+    instance = None
+
+    def __init__(
+        self, max_connections: int = 10, max_concurrency: int = 4, timeout: float = 60
+    ):
+        """
+        constructor
+
+        Args:
+            max_connections (int): maximum number of pooled connections per host
+            max_concurrency (int): upper bound of the adaptive concurrency window per endpoint
+            timeout (float): request timeout in seconds
+        """
+        self.max_connections = max_connections
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.clients: Dict[str, SparqlClient] = {}
+        # adaptive concurrency windows by endpoint name
+        self.windows: Dict[str, ConcurrencyWindow] = {}
+        # async clients by event loop and endpoint name
+        self.async_clients = weakref.WeakKeyDictionary()
+        # closing tasks of replaced async clients
+        self.closing = set()
+        self.lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls) -> "SparqlClientPool":
+        """
+        get the shared pool
+        """
+        if cls.instance is None:
+            cls.instance = cls()
+        return cls.instance
+
+    def get_window(self, endpoint_name: str) -> ConcurrencyWindow:
+        """
+        get the concurrency window of the given endpoint shared by the
+        sync and async clients - the lock must be held
+
+        Args:
+            endpoint_name (str): name of the endpoint in endpoints.yaml
+
+        Returns:
+            ConcurrencyWindow: the window growing up to max_concurrency
+        """
+        window = self.windows.get(endpoint_name)
+        if window is None or window.max_window != self.max_concurrency:
+            window = ConcurrencyWindow(max_window=self.max_concurrency)
+            self.windows[endpoint_name] = window
+        return window
+
+    def get_client(self, endpoint_name: str, endpoint_conf: Endpoint) -> SparqlClient:
+        """
+        get the client for the given endpoint creating it on first use
+
+        Args:
+            endpoint_name (str): name of the endpoint in endpoints.yaml
+            endpoint_conf (Endpoint): the endpoint configuration
+
+        Returns:
+            SparqlClient: the shared client
+        """
+        replaced = None
+        with self.lock:
+            client = self.clients.get(endpoint_name)
+            if client is None or client.url != endpoint_conf.endpoint:
+                replaced = client
+                client = SparqlClient(
+                    endpoint_conf,
+                    max_connections=self.max_connections,
+                    timeout=self.timeout,
+                    window=self.get_window(endpoint_name),
+                )
+                self.clients[endpoint_name] = client
+        if replaced is not None:
+            # the endpoint url changed
+            replaced.close()
+        return client
+
+    def get_async_client(
+        self, endpoint_name: str, endpoint_conf: Endpoint
+    ) -> AsyncSparqlClient:
+        """
+        get the async client for the given endpoint and the running event loop
+        creating it on first use
+
+        Args:
+            endpoint_name (str): name of the endpoint in endpoints.yaml
+            endpoint_conf (Endpoint): the endpoint configuration
+
+        Returns:
+            AsyncSparqlClient: the shared client
+        """
+        loop = asyncio.get_running_loop()
+        replaced = None
+        with self.lock:
+            loop_clients = self.async_clients.setdefault(loop, {})
+            client = loop_clients.get(endpoint_name)
+            if client is None or client.url != endpoint_conf.endpoint:
+                replaced = client
+                client = AsyncSparqlClient(
+                    endpoint_conf,
+                    max_connections=self.max_connections,
+                    max_concurrency=self.max_concurrency,
+                    timeout=self.timeout,
+                    window=self.get_window(endpoint_name),
+                )
+                loop_clients[endpoint_name] = client
+        if replaced is not None:
+            # the endpoint url changed
+            task = loop.create_task(replaced.aclose())
+            self.closing.add(task)
+            task.add_done_callback(self.closing.discard)
+        return client
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        get the statistics of all clients
+
+        Returns:
+            dict: client statistics by endpoint name
+        """
+        with self.lock:
+            clients = dict(self.clients)
+            windows = dict(self.windows)
+            async_clients = [
+                client
+                for loop_clients in self.async_clients.values()
+                for client in loop_clients.items()
+            ]
+        stats = {name: client.stats() for name, client in clients.items()}
+        for name, client in async_clients:
+            async_stats = stats.setdefault(name, {}).setdefault(
+                "async", {"active": 0, "requests": 0}
+            )
+            for key in ("active", "requests"):
+                async_stats[key] += client.stats()[key]
+        for name, window in windows.items():
+            stats.setdefault(name, {})["window"] = window.stats()
+        return stats
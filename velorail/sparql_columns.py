@@ -0,0 +1,242 @@
+"""
+Created on 2026-10-18
+
+@author: wf
+"""
+
+from typing import Callable, Dict, List, Optional, Set
+
+import numpy as np
+import pandas as pd
+
+from velorail.sparql_tsv import SparqlTsvDecoder
+
+
+class SparqlColumnDecoder:
+    """
+    decoder of SPARQL JSON and TSV results straight into typed columns
+
+    the lexical values are collected per variable together with their
+    datatypes and converted column by column - numbers in bulk by numpy,
+    dates by pandas - without a record dict or python value per cell
+    """
+
+    XSD = SparqlTsvDecoder.XSD
+    float_types = {"double", "float", "decimal"}
+    integer_types = {
+        "integer",
+        "int",
+        "long",
+        "short",
+        "byte",
+        "nonNegativeInteger",
+        "positiveInteger",
+        "negativeInteger",
+        "nonPositiveInteger",
+        "unsignedLong",
+        "unsignedInt",
+        "unsignedShort",
+        "unsignedByte",
+    }
+    date_types = {"date", "dateTime", "dateTimeStamp"}
+    # marks IRIs, blank nodes and plain literals
+    PLAIN = ""
+
+    def __init__(self, convert: Callable[[str, str], object]):
+        """
+        constructor
+
+        Args:
+            convert (Callable): function(value, datatype) converting a typed
+                literal to its python value for columns that can not be
+                converted in bulk e.g. SparqlClient.convert
+        """
+        self.convert = convert
+        self.variables: List[str] = []
+        self.values: Dict[str, list] = {}
+        self.datatypes: Dict[str, Set[str]] = {}
+        self.rows = 0
+
+    def set_vars(self, variables: List[str]):
+        """
+        set the variables of the result
+        """
+        self.variables = variables
+        self.values = {var: [] for var in variables}
+        self.datatypes = {var: set() for var in variables}
+
+    def get_xsd_type(self, datatype: Optional[str]) -> str:
+        """
+        get the local name of the given XSD datatype - PLAIN for other terms
+        """
+        xsd_type = self.PLAIN
+        if datatype and datatype.startswith(self.XSD):
+            xsd_type = datatype[len(self.XSD) :]
+        elif datatype:
+            xsd_type = datatype
+        return xsd_type
+
+    def add_json(self, json_result: dict):
+        """
+        add the rows of the given SPARQL JSON result
+
+        Args:
+            json_result (dict): the parsed application/sparql-results+json document
+        """
+        self.set_vars(json_result["head"]["vars"])
+        columns = [
+            (var, self.values[var], self.datatypes[var]) for var in self.variables
+        ]
+        bindings = json_result["results"]["bindings"]
+        for row in bindings:
+            for var, values, datatypes in columns:
+                binding = row.get(var)
+                if binding is None:
+                    values.append(None)
+                else:
+                    values.append(binding["value"])
+                    if binding["type"] == "uri":
+                        datatypes.add(self.PLAIN)
+                    else:
+                        datatypes.add(self.get_xsd_type(binding.get("datatype")))
+        self.rows += len(bindings)
+
+    def add_tsv(self, text: str):
+        """
+        add the rows of the given SPARQL TSV result
+
+        Args:
+            text (str): the text/tab-separated-values document
+        """
+        tsv_decoder = SparqlTsvDecoder(self.convert)
+        lines = tsv_decoder.split_lines(text)
+        if not lines:
+            return
+        self.set_vars(tsv_decoder.get_vars(lines[0].rstrip("\r")))
+        columns = [
+            (var, self.values[var], self.datatypes[var]) for var in self.variables
+        ]
+        for line in lines[1:]:
+            terms = line.rstrip("\r").split("\t")
+            for i, (var, values, datatypes) in enumerate(columns):
+                term = terms[i] if i < len(terms) else ""
+                if not term:
+                    values.append(None)
+                else:
+                    value, datatype = tsv_decoder.parse_term(term)
+                    values.append(value)
+                    datatypes.add(self.get_xsd_type(datatype))
+        self.rows += len(lines) - 1
+
+    def to_column(self, var: str) -> pd.Series:
+        """
+        convert the lexical values of the given variable to a typed column
+
+        Args:
+            var (str): the variable name
+
+        Returns:
+            pd.Series: float64, int64/Int64, bool/boolean, datetime64
+            or object column - missing values are NaN/NA/NaT/None
+        """
+        values = self.values[var]
+        datatypes = self.datatypes[var]
+        lexical = np.array(values, dtype=object)
+        missing = lexical == None  # noqa: E711 - element wise comparison
+        column = None
+        try:
+            if not datatypes or self.PLAIN in datatypes:
+                pass
+            elif datatypes <= self.integer_types:
+                lexical[missing] = "0"
+                ints = lexical.astype(np.int64)
+                if missing.any():
+                    column = pd.Series(pd.arrays.IntegerArray(ints, missing))
+                else:
+                    column = pd.Series(ints)
+            elif datatypes <= self.integer_types | self.float_types:
+                lexical[missing] = "nan"
+                column = pd.Series(lexical.astype(np.float64))
+            elif datatypes == {"boolean"}:
+                bools = np.isin(lexical, ["true", "1", "TRUE"])
+                if missing.any():
+                    column = pd.Series(pd.arrays.BooleanArray(bools, missing))
+                else:
+                    column = pd.Series(bools)
+            elif datatypes <= self.date_types:
+                utc = any(value and value.endswith("Z") for value in values)
+                column = pd.Series(pd.to_datetime(values, utc=utc, format="ISO8601"))
+        except (ValueError, OverflowError, pd.errors.OutOfBoundsDatetime):
+            # e.g. big integers or dates before 1677 - decoded one by one
+            column = self.to_object_column(var)
+        if column is None:
+            column = pd.Series(values, dtype=object)
+        return column
+
+    def to_object_column(self, var: str) -> pd.Series:
+        """
+        convert the given variable value by value
+        """
+        values = self.values[var]
+        datatypes = self.datatypes[var]
+        datatype = None
+        if len(datatypes) == 1:
+            xsd_type = next(iter(datatypes))
+            datatype = xsd_type if ":" in xsd_type else f"{self.XSD}{xsd_type}"
+        column = pd.Series(
+            [
+                self.convert(value, datatype) if value and datatype else value
+                for value in values
+            ],
+            dtype=object,
+        )
+        return column
+
+    def to_columns(self) -> Dict[str, pd.Series]:
+        """
+        get the typed columns of all variables
+
+        Returns:
+            dict: the typed columns by variable name
+        """
+        columns = {var: self.to_column(var) for var in self.variables}
+        return columns
+
+    def to_df(self) -> pd.DataFrame:
+        """
+        get the typed columns as a DataFrame
+        """
+        df = pd.DataFrame(self.to_columns(), columns=self.variables)
+        return df
+
+    @staticmethod
+    def to_payload(df: pd.DataFrame) -> dict:
+        """
+        get a JSON serializable form of the given typed columns
+        e.g. for the QueryCache - missing values become None
+
+        Args:
+            df (pd.DataFrame): the typed columns
+
+        Returns:
+            dict: the values and the dtype names by column
+        """
+        payload = {"columns": {}, "dtypes": {}}
+        for var in df.columns:
+            column = df[var]
+            values = column.astype(object).where(column.notna(), None).tolist()
+            payload["columns"][var] = values
+            payload["dtypes"][var] = str(column.dtype)
+        return payload
+
+    @staticmethod
+    def from_payload(payload: dict) -> pd.DataFrame:
+        """
+        restore the typed columns from the given payload of to_payload
+        """
+        columns = {
+            var: pd.Series(values, dtype=payload["dtypes"][var])
+            for var, values in payload["columns"].items()
+        }
+        df = pd.DataFrame(columns, columns=list(payload["columns"]))
+        return df
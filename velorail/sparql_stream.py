@@ -0,0 +1,111 @@
+"""
+Created on 2026-10-18
+
+@author: wf
+"""
+
+import codecs
+import json
+import re
+from typing import Iterable, Iterator, List
+
+
+class SparqlJsonStream:
+    """
+    incremental parser for application/sparql-results+json documents
+
+    only the current binding and one chunk of the response are held
+    in memory - each binding is decoded as soon as it is complete
+    """
+
+    bindings_pattern = re.compile(r'"bindings"\s*:\s*\[')
+    skip_pattern = re.compile(r"[\s,]*")
+
+    def __init__(self, chunks: Iterable[bytes]):
+        """
+        constructor
+
+        Args:
+            chunks (Iterable[bytes]): the raw response body chunks
+        """
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.json_decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        # number of bytes received so far
+        self.size = 0
+
+    def read(self) -> bool:
+        """
+        append the next chunk to my buffer dropping the consumed part
+
+        Returns:
+            bool: False if there is no more data
+        """
+        if self.eof:
+            return False
+        try:
+            chunk = next(self.chunks)
+            self.size += len(chunk)
+            text = self.decoder.decode(chunk)
+        except StopIteration:
+            self.eof = True
+            text = self.decoder.decode(b"", final=True)
+        self.buffer = self.buffer[self.pos :] + text
+        self.pos = 0
+        return True
+
+    def __iter__(self) -> Iterator[dict]:
+        """
+        iterate over the raw bindings of the result
+
+        Yields:
+            dict: a binding row mapping variable names to
+            SPARQL JSON term dicts
+        """
+        while not (match := self.bindings_pattern.search(self.buffer)):
+            if not self.read():
+                raise ValueError("no results.bindings in SPARQL JSON result")
+        self.pos = match.end()
+        while True:
+            self.pos = self.skip_pattern.match(self.buffer, self.pos).end()
+            if self.pos >= len(self.buffer):
+                if not self.read():
+                    raise ValueError("unterminated SPARQL JSON result")
+                continue
+            if self.buffer[self.pos] == "]":
+                return
+            try:
+                binding, end = self.json_decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # the binding is incomplete - get more data
+                if not self.read():
+                    raise
+                continue
+            self.pos = end
+            yield binding
+
+    @staticmethod
+    def iter_chunks(rows: Iterable[dict], chunk_size: int = 10000) -> Iterator[List[dict]]:
+        """
+        group the given rows into lists of at most chunk_size rows
+        e.g. for chunked pandas construction with
+        pd.concat(pd.DataFrame.from_records(chunk) for chunk in chunks)
+
+        Args:
+            rows (Iterable[dict]): the rows
+            chunk_size (int): the maximum number of rows per chunk
+
+        Yields:
+            list: the next chunk of rows
+        """
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
@@ -0,0 +1,165 @@
+"""
+Created on 2026-10-18
+
+@author: wf
+"""
+
+import codecs
+import re
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+class SparqlTsvDecoder:
+    """
+    fast typed decoder for text/tab-separated-values SPARQL results
+
+    the terms are RDF terms in turtle syntax - they are converted
+    to the same python values as the SPARQL JSON results
+    """
+
+    XSD = "http://www.w3.org/2001/XMLSchema#"
+    escape_pattern = re.compile(r"\\(u[0-9A-Fa-f]{4}|U[0-9A-Fa-f]{8}|.)")
+    escapes = {
+        "t": "\t",
+        "n": "\n",
+        "r": "\r",
+        "b": "\b",
+        "f": "\f",
+        '"': '"',
+        "'": "'",
+        "\\": "\\",
+    }
+    integer_pattern = re.compile(r"[+-]?\d+$")
+    decimal_pattern = re.compile(r"[+-]?\d*\.\d+$")
+
+    def __init__(self, convert: Callable[[str, str], object]):
+        """
+        constructor
+
+        Args:
+            convert (Callable): function(value, datatype) converting a typed
+                literal to its python value e.g. SparqlClient.convert
+        """
+        self.convert = convert
+        # number of bytes received by iter_lines
+        self.size = 0
+
+    @classmethod
+    def unescape(cls, text: str) -> str:
+        """
+        resolve the turtle string escapes of the given text
+        """
+        if "\\" not in text:
+            return text
+
+        def replace(match):
+            escape = match.group(1)
+            if escape[0] in "uU" and len(escape) > 1:
+                return chr(int(escape[1:], 16))
+            return cls.escapes.get(escape, escape)
+
+        return cls.escape_pattern.sub(replace, text)
+
+    def parse_term(self, term: str) -> Tuple[str, Optional[str]]:
+        """
+        parse a single RDF term
+
+        Args:
+            term (str): the term in turtle syntax
+
+        Returns:
+            tuple: the lexical value and the datatype IRI or None
+        """
+        first = term[0]
+        if first == "<":
+            return term[1:-1], None
+        if first == '"':
+            end = term.rfind('"')
+            value = self.unescape(term[1:end])
+            suffix = term[end + 1 :]
+            datatype = suffix[3:-1] if suffix.startswith("^^<") else None
+            return value, datatype
+        if term.startswith("_:"):
+            return term[2:], None
+        if term in ("true", "false"):
+            return term, f"{self.XSD}boolean"
+        if self.integer_pattern.match(term):
+            return term, f"{self.XSD}integer"
+        if self.decimal_pattern.match(term):
+            return term, f"{self.XSD}decimal"
+        if "e" in term or "E" in term:
+            return term, f"{self.XSD}double"
+        return term, None
+
+    def to_value(self, term: str):
+        """
+        convert the given term to its python value
+        """
+        value, datatype = self.parse_term(term)
+        if datatype:
+            value = self.convert(value, datatype)
+        return value
+
+    @staticmethod
+    def get_vars(header: str) -> List[str]:
+        """
+        get the variable names of the given header line
+        """
+        variables = [var.strip().lstrip("?$") for var in header.split("\t")]
+        return variables
+
+    def iter_lines(self, chunks: Iterable[bytes]) -> Iterator[str]:
+        """
+        split the given utf-8 chunks into lines counting the bytes received
+        """
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        rest = ""
+        for chunk in chunks:
+            self.size += len(chunk)
+            lines = (rest + decoder.decode(chunk)).split("\n")
+            rest = lines.pop()
+            yield from lines
+        rest += decoder.decode(b"", final=True)
+        if rest:
+            yield rest
+
+    def iter_records(self, lines: Iterable[str]) -> Iterator[Dict]:
+        """
+        iterate over the records of the given result lines
+
+        Args:
+            lines (Iterable[str]): the header line followed by the rows
+
+        Yields:
+            dict: the next record - unbound variables are left out
+        """
+        lines = iter(lines)
+        header = next(lines, None)
+        if header is None:
+            return
+        variables = self.get_vars(header.rstrip("\r"))
+        for line in lines:
+            line = line.rstrip("\r")
+            record = {}
+            for var, term in zip(variables, line.split("\t")):
+                if term:
+                    record[var] = self.to_value(term)
+            yield record
+
+    @staticmethod
+    def split_lines(text: str) -> List[str]:
+        """
+        split the given text into lines - an empty line is a row
+        with all variables unbound so only the final newline is dropped
+        """
+        if text.endswith("\n"):
+            text = text[:-1]
+        lines = text.split("\n") if text else []
+        return lines
+
+    def to_lod(self, text: str) -> List[Dict]:
+        """
+        decode the given TSV result to a list of dicts
+        """
+        lod = list(self.iter_records(self.split_lines(text)))
+        return lod
@@ -0,0 +1,331 @@
+"""
+Created on 2026-10-18
+
+@author: wf
+"""
+
+import math
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+class SpatialIndex:
+    """
+    grid index of points on the earth for radius and k-nearest queries
+
+    the points are sorted by the row major id of their lat/lon grid cell so
+    that the candidates of a query are a few contiguous slices - one or two
+    per grid row of the bounding box of the query circle - which are then
+    checked with the exact haversine distance
+    """
+
+    EARTH_RADIUS_KM = 6371.0
+
+    def __init__(self, lat: np.ndarray, lon: np.ndarray, cell_size: float = 0.5):
+        """
+        constructor
+
+        Args:
+            lat (np.ndarray): the latitudes in degrees - NaN for unknown
+            lon (np.ndarray): the longitudes in degrees - NaN for unknown
+            cell_size (float): the size of the grid cells in degrees
+        """
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        self.size = len(lat)
+        self.cell_size = cell_size
+        self.rows = math.ceil(180 / cell_size)
+        self.cols = math.ceil(360 / cell_size)
+        valid = np.flatnonzero(np.isfinite(lat) & np.isfinite(lon))
+        cell_ids = self.get_cell_ids(lat[valid], lon[valid])
+        order = np.argsort(cell_ids, kind="stable")
+        # the original positions of the points in cell order
+        self.positions = valid[order]
+        self.cell_ids = cell_ids[order]
+        self.lat_rad = np.radians(lat[self.positions])
+        self.lon_rad = np.radians(lon[self.positions])
+        self.cos_lat = np.cos(self.lat_rad)
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def get_cell_ids(self, lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+        """
+        get the row major grid cell ids of the given coordinates
+        """
+        rows = np.clip(
+            np.floor((lat + 90) / self.cell_size).astype(np.int64), 0, self.rows - 1
+        )
+        cols = np.floor((lon + 180) / self.cell_size).astype(np.int64) % self.cols
+        cell_ids = rows * self.cols + cols
+        return cell_ids
+
+    def get_distances(self, lat, lon, candidates: np.ndarray) -> np.ndarray:
+        """
+        get the haversine distances of the given candidates
+
+        Args:
+            lat: the latitude in degrees of the query point or of the
+                query point of each candidate
+            lon: the longitude in degrees of the query point or of the
+                query point of each candidate
+            candidates (np.ndarray): positions in the cell order
+
+        Returns:
+            np.ndarray: the distances in km
+        """
+        lat1, lon1 = np.radians(lat), np.radians(lon)
+        dlat = self.lat_rad[candidates] - lat1
+        dlon = self.lon_rad[candidates] - lon1
+        a = (
+            np.sin(dlat / 2) ** 2
+            + np.cos(lat1) * self.cos_lat[candidates] * np.sin(dlon / 2) ** 2
+        )
+        distances = 2 * self.EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+        return distances
+
+    def get_cell_km(self) -> float:
+        """
+        get the height of a grid cell in km
+        """
+        cell_km = math.radians(self.cell_size) * self.EARTH_RADIUS_KM
+        return cell_km
+
+    def get_max_radius(self, radius_km: Optional[float] = None) -> float:
+        """
+        get the largest useful search radius in km
+        """
+        max_radius = math.pi * self.EARTH_RADIUS_KM
+        if radius_km is not None:
+            max_radius = min(radius_km, max_radius)
+        return max_radius
+
+    def get_ranges(
+        self, lat: np.ndarray, lon: np.ndarray, radius_km: float
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        get the cell id ranges of the bounding boxes of the circles with
+        the given radius around the given query points
+
+        each grid row of a bounding box is one range - or two if the box
+        crosses the antimeridian - and boxes that reach a pole or cover
+        all longitudes span whole rows
+
+        Args:
+            lat (np.ndarray): the latitudes of the query points in degrees
+            lon (np.ndarray): the longitudes of the query points in degrees
+            radius_km (float): the radius in km
+
+        Returns:
+            tuple: the query point, first and last cell id of each range
+        """
+        angle = radius_km / self.EARTH_RADIUS_KM
+        dlat = math.degrees(angle)
+        row_min = np.floor((lat - dlat + 90) / self.cell_size).astype(np.int64)
+        row_max = np.floor((lat + dlat + 90) / self.cell_size).astype(np.int64)
+        row_min = np.clip(row_min, 0, self.rows - 1)
+        row_max = np.clip(row_max, 0, self.rows - 1)
+        # longitude extent of the circle - see Matuschek's bounding box
+        with np.errstate(divide="ignore"):
+            ratio = math.sin(angle) / np.cos(np.radians(lat))
+        full_width = (lat - dlat <= -90) | (lat + dlat >= 90) | (ratio >= 1)
+        if angle >= math.pi / 2:
+            full_width[:] = True
+        dlon = np.degrees(np.arcsin(np.clip(ratio, 0.0, 1.0)))
+        col_min = np.floor((lon - dlon + 180) / self.cell_size).astype(np.int64)
+        col_max = np.floor((lon + dlon + 180) / self.cell_size).astype(np.int64)
+        full_width |= col_max - col_min + 1 >= self.cols
+        col_min %= self.cols
+        col_max %= self.cols
+        wrap = ~full_width & (col_min > col_max)
+        # first range of each row - from the antimeridian if the box crosses it
+        first_min = np.where(full_width | wrap, 0, col_min)
+        first_max = np.where(full_width, self.cols - 1, col_max)
+        # second range of each row - empty unless the box crosses the antimeridian
+        second_min = np.where(wrap, col_min, 1)
+        second_max = np.where(wrap, self.cols - 1, 0)
+        row_counts = row_max - row_min + 1
+        points = np.repeat(np.arange(len(lat)), row_counts)
+        rows = row_min[points] + self.expand(np.zeros_like(row_counts), row_counts)
+        bases = rows * self.cols
+        firsts = np.concatenate([bases + first_min[points], bases + second_min[points]])
+        lasts = np.concatenate([bases + first_max[points], bases + second_max[points]])
+        points = np.concatenate([points, points])
+        return points, firsts, lasts
+
+    @staticmethod
+    def expand(starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+        """
+        concatenate the ranges with the given starts and lengths
+        """
+        total = int(lengths.sum())
+        offsets = np.cumsum(lengths) - lengths
+        values = np.repeat(starts - offsets, lengths) + np.arange(total)
+        return values
+
+    def get_candidates(
+        self, lat: np.ndarray, lon: np.ndarray, radius_km: float
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        get the positions in cell order of the points in the grid cells
+        of the bounding boxes of the circles around the given query points
+
+        Returns:
+            tuple: the query point and candidate of each pair
+        """
+        points, firsts, lasts = self.get_ranges(lat, lon, radius_km)
+        starts = np.searchsorted(self.cell_ids, firsts, side="left")
+        ends = np.searchsorted(self.cell_ids, lasts, side="right")
+        lengths = np.maximum(ends - starts, 0)
+        candidates = self.expand(starts, lengths)
+        points = np.repeat(points, lengths)
+        return points, candidates
+
+    def query_radius(
+        self, lat: float, lon: float, radius_km: float
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        get the points within the given radius
+
+        Args:
+            lat (float): the latitude of the query point in degrees
+            lon (float): the longitude of the query point in degrees
+            radius_km (float): the radius in km
+
+        Returns:
+            tuple: the original positions of the points and their
+            distances in km ordered by distance
+        """
+        _points, candidates = self.get_candidates(
+            np.array([lat], dtype=np.float64),
+            np.array([lon], dtype=np.float64),
+            radius_km,
+        )
+        distances = self.get_distances(lat, lon, candidates)
+        within = distances <= radius_km
+        candidates, distances = candidates[within], distances[within]
+        order = np.argsort(distances, kind="stable")
+        return self.positions[candidates[order]], distances[order]
+
+    def query_knn(
+        self, lat: float, lon: float, k: int, radius_km: Optional[float] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        get the k nearest points
+
+        the search radius starts at the size of a grid cell and doubles
+        until k points are found - the points within a radius are exact
+        so the k nearest of them are the k nearest overall
+
+        Args:
+            lat (float): the latitude of the query point in degrees
+            lon (float): the longitude of the query point in degrees
+            k (int): the number of points
+            radius_km (float): the maximum distance - None for no limit
+
+        Returns:
+            tuple: the original positions of at most k points and their
+            distances in km ordered by distance
+        """
+        max_radius = self.get_max_radius(radius_km)
+        search_radius = min(max_radius, self.get_cell_km())
+        while True:
+            positions, distances = self.query_radius(lat, lon, search_radius)
+            if len(positions) >= k or search_radius >= max_radius:
+                break
+            search_radius = min(max_radius, search_radius * 2)
+        return positions[:k], distances[:k]
+
+    def query_knn_batch(
+        self,
+        lat: np.ndarray,
+        lon: np.ndarray,
+        k: int,
+        radius_km: Optional[float] = None,
+        chunk_size: int = 4096,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        get the k nearest points of each of the given query points
+
+        all query points are searched together - the candidate pairs of
+        all points are sorted by point and distance at once and the points
+        with fewer than k results within the search radius are searched
+        again with twice the radius
+
+        Args:
+            lat (np.ndarray): the latitudes of the query points in degrees
+            lon (np.ndarray): the longitudes of the query points in degrees
+            k (int): the number of points per query point
+            radius_km (float): the maximum distance - None for no limit
+            chunk_size (int): the maximum number of query points searched at once
+
+        Returns:
+            tuple: the original positions and the distances in km as
+            arrays of shape (n, k) ordered by distance - padded with -1
+            and inf where there are fewer than k points
+        """
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        positions = np.full((len(lat), k), -1, dtype=np.int64)
+        distances = np.full((len(lat), k), np.inf)
+        max_radius = self.get_max_radius(radius_km)
+        search_radius = min(max_radius, self.get_cell_km() / 2)
+        pending = np.flatnonzero(np.isfinite(lat) & np.isfinite(lon))
+        while len(pending) > 0:
+            done = np.zeros(len(pending), dtype=bool)
+            for start in range(0, len(pending), chunk_size):
+                chunk = pending[start : start + chunk_size]
+                done[start : start + chunk_size] = self.knn_chunk(
+                    chunk, lat, lon, k, search_radius, max_radius, positions, distances
+                )
+            pending = pending[~done]
+            search_radius = min(max_radius, search_radius * 2)
+        return positions, distances
+
+    def knn_chunk(
+        self,
+        chunk: np.ndarray,
+        lat: np.ndarray,
+        lon: np.ndarray,
+        k: int,
+        search_radius: float,
+        max_radius: float,
+        positions: np.ndarray,
+        distances: np.ndarray,
+    ) -> np.ndarray:
+        """
+        search the k nearest points of the given query points within
+        the given search radius
+
+        Returns:
+            np.ndarray: mask of the query points whose results are final
+            and stored in positions and distances
+        """
+        points, candidates = self.get_candidates(lat[chunk], lon[chunk], search_radius)
+        pair_distances = self.get_distances(
+            lat[chunk][points], lon[chunk][points], candidates
+        )
+        # the pairs within the search radius contain all points within it
+        # so a query point with k of them has its exact k nearest points
+        within = pair_distances <= search_radius
+        points = points[within]
+        candidates = candidates[within]
+        pair_distances = pair_distances[within]
+        order = np.lexsort((pair_distances, points))
+        points = points[order]
+        candidates = candidates[order]
+        pair_distances = pair_distances[order]
+        # rank of each pair within its query point
+        counts = np.bincount(points, minlength=len(chunk))
+        firsts = np.cumsum(counts) - counts
+        ranks = np.arange(len(points)) - firsts[points]
+        nearest = ranks < k
+        done = counts >= k
+        if search_radius >= max_radius:
+            done[:] = True
+        nearest &= done[points]
+        rows = chunk[points[nearest]]
+        positions[rows, ranks[nearest]] = self.positions[candidates[nearest]]
+        distances[rows, ranks[nearest]] = pair_distances[nearest]
+        return done
@@ -0,0 +1,300 @@
+"""
+Created on 2026-10-18
+
+@author: wf
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import time
+from collections.abc import Sequence
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on windows
+    fcntl = None
+
+import numpy as np
+import pandas as pd
+
+
+class StringColumn(Sequence):
+    """
+    read only column of strings as utf-8 bytes and offsets
+
+    both arrays may be memory mapped - strings are only decoded when
+    accessed and the empty string stands for a missing value
+    """
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray):
+        """
+        constructor
+
+        Args:
+            data (np.ndarray): the concatenated utf-8 bytes as uint8
+            offsets (np.ndarray): the start of each string and the end of the last
+        """
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, values: Iterable[Optional[str]]) -> "StringColumn":
+        """
+        create a column from the given strings
+        """
+        encoded = [
+            value.encode("utf-8") if isinstance(value, str) else b"" for value in values
+        ]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return cls(data, offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("StringColumn index out of range")
+        start, end = self.offsets[index], self.offsets[index + 1]
+        value = self.data[start:end].tobytes().decode("utf-8") or None
+        return value
+
+    def take(self, positions: Iterable[int]) -> List[Optional[str]]:
+        """
+        get the strings at the given positions
+        """
+        values = [self[int(position)] for position in positions]
+        return values
+
+
+class StationSnapshot:
+    """
+    columnar snapshot of the AllTrainStations query result
+
+    saved snapshots are opened memory mapped so that the processes
+    of a web server share the pages of the OS cache - each snapshot
+    version is a directory of .npy files and current.json points to
+    the current one
+    """
+
+    # the columns of the AllTrainStations query
+    columns = ("item", "itemLabel", "lat", "long")
+    # the .npy files of a snapshot version
+    array_names = ("items", "items_offsets", "labels", "labels_offsets", "lat", "lon")
+
+    def __init__(
+        self,
+        items: StringColumn,
+        labels: StringColumn,
+        lat: np.ndarray,
+        lon: np.ndarray,
+        version: str,
+        checked_at: Optional[float] = None,
+    ):
+        """
+        constructor
+
+        Args:
+            items (StringColumn): the station item URIs
+            labels (StringColumn): the station labels
+            lat (np.ndarray): the latitudes in degrees
+            lon (np.ndarray): the longitudes in degrees
+            version (str): the fingerprint of the query result
+            checked_at (float): epoch seconds the result was last fetched
+        """
+        self.items = items
+        self.labels = labels
+        self.lat = lat
+        self.lon = lon
+        self.version = version
+        self.checked_at = time.time() if checked_at is None else checked_at
+
+    def __len__(self) -> int:
+        return len(self.lat)
+
+    @classmethod
+    def default_path(cls) -> str:
+        """
+        get the default directory of the snapshots
+        """
+        path = Path.home() / ".velorail" / "stations"
+        return path.as_posix()
+
+    @classmethod
+    def from_df(cls, df: pd.DataFrame, version: str) -> "StationSnapshot":
+        """
+        create an in memory snapshot of the given query result
+        """
+        item, label, lat, lon = cls.columns
+        snapshot = cls(
+            items=StringColumn.from_strings(df[item]),
+            labels=StringColumn.from_strings(df[label]),
+            lat=df[lat].to_numpy(dtype=np.float64, na_value=np.nan),
+            lon=df[lon].to_numpy(dtype=np.float64, na_value=np.nan),
+            version=version,
+        )
+        return snapshot
+
+    def to_df(self, positions: np.ndarray) -> pd.DataFrame:
+        """
+        get the stations at the given positions as DataFrame
+        """
+        item, label, lat, lon = self.columns
+        df = pd.DataFrame(
+            {
+                item: self.items.take(positions),
+                label: self.labels.take(positions),
+                lat: self.lat[positions],
+                lon: self.lon[positions],
+            },
+            index=positions,
+        )
+        return df
+
+    def get_arrays(self) -> dict:
+        """
+        get the arrays to save by file name
+        """
+        arrays = {
+            "items": self.items.data,
+            "items_offsets": self.items.offsets,
+            "labels": self.labels.data,
+            "labels_offsets": self.labels.offsets,
+            "lat": self.lat,
+            "lon": self.lon,
+        }
+        return arrays
+
+    def save(self, path: str) -> "StationSnapshot":
+        """
+        save me as the current snapshot in the given directory
+
+        the version directory is written under a temporary name and
+        renamed so readers never see a partial snapshot - older versions
+        are removed which does not affect processes that still map them
+
+        Args:
+            path (str): the snapshot directory
+
+        Returns:
+            StationSnapshot: the saved snapshot opened memory mapped
+        """
+        snapshot_dir = Path(path)
+        snapshot_dir.mkdir(parents=True, exist_ok=True)
+        tmp_dir = Path(tempfile.mkdtemp(prefix=".tmp_", dir=snapshot_dir))
+        for name, array in self.get_arrays().items():
+            np.save(tmp_dir / f"{name}.npy", np.ascontiguousarray(array))
+        # concurrent writers of different versions take turns so that
+        # none of them removes the version current.json points to
+        with self.locked(snapshot_dir):
+            version_dir = snapshot_dir / self.version
+            if version_dir.exists():
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+            else:
+                os.rename(tmp_dir, version_dir)
+            self.write_current(snapshot_dir, self.version, self.checked_at)
+            for other_dir in snapshot_dir.iterdir():
+                # temporary directories may belong to concurrent writers
+                if (
+                    other_dir.is_dir()
+                    and other_dir.name != self.version
+                    and not other_dir.name.startswith(".")
+                ):
+                    shutil.rmtree(other_dir, ignore_errors=True)
+            snapshot = self.load(path)
+        return snapshot
+
+    @staticmethod
+    @contextmanager
+    def locked(snapshot_dir: Path):
+        """
+        hold the exclusive lock of the given snapshot directory
+        - a no-op where file locks are not available
+        """
+        with open(snapshot_dir / ".lock", "w") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def write_current(snapshot_dir: Path, version: str, checked_at: float):
+        """
+        atomically point current.json of the given directory to the given version
+        """
+        fd, tmp_path = tempfile.mkstemp(
+            prefix=".tmp_", suffix=".json", dir=snapshot_dir
+        )
+        with os.fdopen(fd, "w") as json_file:
+            json.dump({"version": version, "checked_at": checked_at}, json_file)
+        os.replace(tmp_path, snapshot_dir / "current.json")
+
+    def touch(self, path: str):
+        """
+        record that the saved snapshot was confirmed by a fresh query result
+        """
+        self.checked_at = time.time()
+        snapshot_dir = Path(path)
+        with self.locked(snapshot_dir):
+            current = self.read_current(snapshot_dir)
+            # a concurrent writer may have saved a newer version meanwhile
+            if current is not None and current.get("version") == self.version:
+                self.write_current(snapshot_dir, self.version, self.checked_at)
+
+    @staticmethod
+    def read_current(snapshot_dir: Path) -> Optional[dict]:
+        """
+        read current.json of the given directory - None if there is none
+        """
+        try:
+            with open(snapshot_dir / "current.json") as json_file:
+                current = json.load(json_file)
+        except (OSError, ValueError):
+            current = None
+        return current
+
+    @classmethod
+    def load(cls, path: str) -> Optional["StationSnapshot"]:
+        """
+        open the current snapshot of the given directory memory mapped
+
+        Args:
+            path (str): the snapshot directory
+
+        Returns:
+            StationSnapshot: the snapshot or None if there is none
+        """
+        snapshot_dir = Path(path)
+        current = cls.read_current(snapshot_dir)
+        if current is None:
+            return None
+        try:
+            version_dir = snapshot_dir / current["version"]
+            arrays = {
+                name: np.load(version_dir / f"{name}.npy", mmap_mode="r")
+                for name in cls.array_names
+            }
+        except (OSError, ValueError, KeyError):
+            return None
+        snapshot = cls(
+            items=StringColumn(arrays["items"], arrays["items_offsets"]),
+            labels=StringColumn(arrays["labels"], arrays["labels_offsets"]),
+            lat=arrays["lat"],
+            lon=arrays["lon"],
+            version=current["version"],
+            checked_at=current["checked_at"],
+        )
+        return snapshot
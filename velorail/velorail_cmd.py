@@ -10,7 +10,11 @@ from argparse import ArgumentParser
 from lodstorage.query import EndpointManager
 from ngwidgets.cmd import WebserverCmd
 
+from velorail.cassette import Cassette
 from velorail.gpxviewer import GPXViewer
+from velorail.predicate_catalog import PredicateCatalog
+from velorail.query_cache import QueryCache
+from velorail.station_snapshot import StationSnapshot
 from velorail.webserver import VeloRailWebServer
 
 
@@ -47,6 +51,95 @@ class VeloRailCmd(WebserverCmd):
             default=VeloRailWebServer.examples_path(),
             help="path to velorail files [default: %(default)s]",
         )
+        parser.add_argument(
+            "--no_cache",
+            action="store_true",
+            help="do not cache SPARQL query results",
+        )
+        parser.add_argument(
+            "--cache_db",
+            default=QueryCache.default_path(),
+            help="path of the SPARQL query result cache [default: %(default)s]",
+        )
+        parser.add_argument(
+            "--stations_dir",
+            default=StationSnapshot.default_path(),
+            help="directory of the memory mapped train station snapshot [default: %(default)s]",
+        )
+        parser.add_argument(
+            "--catalog_db",
+            default=PredicateCatalog.default_path(),
+            help="path of the predicate statistics catalog of the explorer [default: %(default)s]",
+        )
+        parser.add_argument(
+            "--compact_results",
+            action="store_true",
+            help="keep SPARQL query results with interned namespaces to save memory",
+        )
+        parser.add_argument(
+            "--max_result_rows",
+            type=int,
+            required=False,
+            help="rows of a SPARQL query result to keep in memory before spilling to disk - default: no budget",
+        )
+        parser.add_argument(
+            "--max_result_mb",
+            type=int,
+            required=False,
+            help="megabytes of a SPARQL query result to keep in memory before spilling to disk - default: no budget",
+        )
+        parser.add_argument(
+            "--max_total_rows",
+            type=int,
+            required=False,
+            help="rows after which SPARQL query results are truncated - default: no limit",
+        )
+        parser.add_argument(
+            "--route_endpoints",
+            action="store_true",
+            help="route named queries to the fastest healthy mirror of their endpoint",
+        )
+        parser.add_argument(
+            "--probe_interval",
+            type=float,
+            default=60,
+            help="seconds between health probes of the SPARQL endpoints when routing [default: %(default)s]",
+        )
+        parser.add_argument(
+            "--max_connections",
+            type=int,
+            default=10,
+            help="maximum number of pooled connections per SPARQL endpoint [default: %(default)s]",
+        )
+        parser.add_argument(
+            "--max_concurrency",
+            type=int,
+            default=4,
+            help="upper bound of the adaptive concurrency window per SPARQL endpoint [default: %(default)s]",
+        )
+        parser.add_argument(
+            "--query_timeout",
+            type=float,
+            default=60,
+            help="SPARQL query timeout in seconds [default: %(default)s]",
+        )
+        parser.add_argument(
+            "--cassette",
+            required=False,
+            help="directory to record SPARQL query results to or replay them from",
+        )
+        parser.add_argument(
+            "--cassette_mode",
+            choices=Cassette.modes,
+            default="replay",
+            help="cassette mode [default: %(default)s]",
+        )
+        parser.add_argument(
+            "--cassette_latency",
+            type=float,
+            default=0.0,
+            help="synthetic latency in seconds for replayed queries [default: %(default)s]",
+        )
         parser.add_argument("--gpx", required=False, help="URL or path to GPX file")
         parser.add_argument(
             "--token", required=False, help="Authentication token for GPX access"
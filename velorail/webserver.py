@@ -6,17 +6,29 @@ Created on 2025-02-01
 
 import os
 import re
+from typing import Optional
 
 from ez_wikidata.wdproperty import WikidataPropertyManager
+from fastapi.responses import PlainTextResponse
 from ngwidgets.input_webserver import InputWebserver, InputWebSolution
 from ngwidgets.webserver import WebserverConfig
 from ngwidgets.widgets import Lang, Link
 from nicegui import Client, app, ui
 
+from velorail.cassette import Cassette
+from velorail.endpoint_health import EndpointHealth, HealthProber
 from velorail.explore import Explorer, TriplePos
 from velorail.explore_view import ExplorerView
 from velorail.gpxviewer import GPXViewer
+from velorail.hedging import Hedger
 from velorail.locfind import LocFinder
+from velorail.npq import NPQ_Handler
+from velorail.predicate_catalog import PredicateCatalog
+from velorail.query_cache import QueryCache
+from velorail.query_metrics import QueryMetrics
+from velorail.result_spill import ResultBudget, SpilledLod
+from velorail.single_flight import SingleFlight
+from velorail.sparql_client import SparqlClientPool
 from ngwidgets.sso_users_solution import SsoSolution
 from velorail.version import Version
 from velorail.wditem_search import WikidataItemSearch
@@ -71,12 +83,12 @@ class VeloRailSolution(InputWebSolution):
         Args:
             qid(str): the Wikidata id of the item to analyze
         """
-        def show():
+        async def show():
             viewer = self.viewer
             # Create LocFinder and get coordinates
             locfinder = LocFinder()
             center = None
-            wd_item = locfinder.get_wikidata_geo(qid)
+            wd_item = await locfinder.aget_wikidata_geo(qid)
             if wd_item:
                 wd_link = wd_item.as_wd_link()
                 wd_maps = wd_item.get_map_links(zoom=self.viewer.zoom)
@@ -244,6 +256,8 @@ class VeloRailWebServer(InputWebserver):
 
         # Initialize property manager instance
         self.wpm = WikidataPropertyManager.get_instance()
+        # background endpoint health prober when routing is active
+        self.prober = None
 
         @ui.page("/explore/{node_id}")
         async def explorer_page(
@@ -304,6 +318,9 @@ class VeloRailWebServer(InputWebserver):
             prefix: str = "osmrel",
             endpoint_name: str = "osm-qlever",
             summary: bool = False,
+            compact: bool = False,
+            offset: int = 0,
+            limit: Optional[int] = None,
         ):
             """
             SPARQL explorer REST API endpoint
@@ -313,21 +330,80 @@ class VeloRailWebServer(InputWebserver):
                 prefix: prefix to use e.g. wd:
                 endpoint_name: name of the endpoint to use
                 summary: if True show summary
+                compact: if True return URIs as prefixed names where possible
+                offset: index of the first record to return
+                limit: maximum number of records to return - None for all
+                    records of results within the memory budget and the
+                    in memory part of larger ones
 
             Returns:
-                dict: JSON response with exploration results
+                dict: JSON response with exploration results, the total
+                number of records, the offset of the next page if any and
+                whether the result was truncated
             """
             explorer = Explorer(endpoint_name)
 
             start_node = explorer.get_node(prefix=prefix, node_id=node_id)
             try:
-                lod = explorer.explore_node(
+                lod = await explorer.aexplore_node(
                     start_node, triple_pos=TriplePos.SUBJECT, summary=summary
                 )
-                return {"status": "ok", "records": lod}
+                total = len(lod)
+                if limit is None and isinstance(lod, SpilledLod):
+                    limit = len(lod.head)
+                end = total if limit is None else min(total, offset + limit)
+                records = lod[offset:end]
+                if compact:
+                    records = explorer.compact_records(records)
+                return {
+                    "status": "ok",
+                    "records": records,
+                    "total": total,
+                    "next_offset": end if end < total else None,
+                    "truncated": getattr(lod, "truncated", False),
+                }
             except Exception as ex:
                 return {"status": "error", "message": str(ex)}
 
+        @app.get("/api/stats")
+        async def stats_api():
+            """
+            SPARQL connection pool and query cache statistics
+
+            Returns:
+                dict: JSON response with the pool statistics by endpoint
+                and the cache statistics if caching is active
+            """
+            stats = {
+                "pool": SparqlClientPool.get_instance().stats(),
+                "hedging": Hedger.get_instance().stats(),
+                "single_flight": SingleFlight.get_instance().stats(),
+                "health": EndpointHealth.get_instance().stats(),
+            }
+            if NPQ_Handler.query_cache is not None:
+                stats["cache"] = NPQ_Handler.query_cache.stats()
+            if Explorer.predicate_catalog is not None:
+                stats["catalog"] = Explorer.predicate_catalog.stats()
+            return stats
+
+        @app.get("/api/metrics")
+        async def metrics_api(format: str = "prometheus"):
+            """
+            per named query latency, row count and payload metrics
+
+            Args:
+                format (str): "prometheus" for the text exposition format or "json"
+
+            Returns:
+                the metrics by query name and endpoint
+            """
+            metrics = QueryMetrics.get_instance()
+            if format == "json":
+                return {"queries": metrics.to_json()}
+            return PlainTextResponse(
+                metrics.to_prometheus(), media_type="text/plain; version=0.0.4"
+            )
+
     def configure_run(self):
         root_path = (
             self.args.root_path
@@ -335,6 +411,37 @@ class VeloRailWebServer(InputWebserver):
             else VeloRailWebServer.examples_path()
         )
         self.root_path = os.path.abspath(root_path)
+        if not self.args.no_cache:
+            NPQ_Handler.query_cache = QueryCache(self.args.cache_db)
+        LocFinder.station_snapshot_dir = self.args.stations_dir
+        Explorer.predicate_catalog = PredicateCatalog(self.args.catalog_db)
+        NPQ_Handler.compact_results = self.args.compact_results
+        # budgeted queries are streamed by the sync clients
+        # so the budget is only active if asked for
+        budget = {}
+        if self.args.max_result_rows is not None:
+            budget["max_rows"] = self.args.max_result_rows
+        if self.args.max_result_mb is not None:
+            budget["max_bytes"] = self.args.max_result_mb * 1024 * 1024
+        if self.args.max_total_rows is not None:
+            budget["max_total_rows"] = self.args.max_total_rows
+        if budget:
+            NPQ_Handler.result_budget = ResultBudget(**budget)
+        if self.args.cassette:
+            NPQ_Handler.cassette = Cassette(
+                self.args.cassette,
+                mode=self.args.cassette_mode,
+                latency=self.args.cassette_latency,
+            )
+        if self.args.route_endpoints:
+            NPQ_Handler.route_endpoints = True
+            endpoints = NPQ_Handler("locations.yaml").endpoints
+            self.prober = HealthProber(endpoints, interval=self.args.probe_interval)
+            self.prober.start()
+        pool = SparqlClientPool.get_instance()
+        pool.max_connections = self.args.max_connections
+        pool.max_concurrency = self.args.max_concurrency
+        pool.timeout = self.args.query_timeout
         self.allowed_urls = [
             "https://raw.githubusercontent.com/WolfgangFahl/velorail/main/velorail_examples/",
             self.examples_path(),